@@ -0,0 +1,103 @@
+# Порівнює повне перечитування таблиці з поступовою синхронізацією через журнал змін:
+# клієнт, що вже має копію таблиці, запитує лише зміни після свого курсора.
+#
+#   python benchmarks/changes.py --rows 100000,1000000 --changes 100,1000
+#
+# Для кожного розміру таблиці вимірюється час побудови відповіді /rows (значення всіх рядків,
+# серіалізовані в JSON) і відповіді /changes після --changes змінених рядків: редагувань,
+# додавань і видалень порівну. Час повного перечитування росте з розміром таблиці, час
+# відповіді зі змінами — лише з їхньою кількістю.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from report import run_meta
+from suite import DEFAULT_COLUMNS, build_table, generate_rows, parse_columns
+from dbclasses import Database, Storage
+
+
+def full_pull(table):
+    return json.dumps({"columns": list(table.columns),
+                       "rows": [{"values": table.row_values(row), "id": str(row.id)} for row in table.iter_rows()]})
+
+
+def changes_pull(table, cursor):
+    changes = []
+    for row_id, seq in table.journal.since(cursor):
+        row = table.rows.get(row_id)
+        if row is None:
+            changes.append({"op": "delete", "id": str(row_id)})
+        else:
+            changes.append({"op": "upsert", "id": str(row_id), "values": table.row_values(row)})
+    return json.dumps({"cursor": table.journal.cursor(), "changes": changes})
+
+
+def mutate(table, count, columns, rng):
+    row_ids = rng.sample(list(table.rows), count)
+    for i, row_id in enumerate(row_ids):
+        if i % 3 == 0:
+            table.edit_row(row_id, generate_rows(columns, 1, rng)[0])
+        elif i % 3 == 1:
+            table.delete_row(row_id)
+        else:
+            table.add_row(generate_rows(columns, 1, rng)[0])
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Повне перечитування таблиці проти запиту змін за курсором.")
+    parser.add_argument("--rows", default="100000", help="розміри таблиці через кому")
+    parser.add_argument("--changes", default="100,1000", help="кількості змінених рядків через кому")
+    parser.add_argument("--columns", default=DEFAULT_COLUMNS, help="набір колонок у вигляді тип:кількість через кому")
+    parser.add_argument("--storage", choices=["row", "columnar"], default="row")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="файл для збереження результатів у форматі JSON")
+    args = parser.parse_args()
+
+    columns = parse_columns(args.columns)
+    rng = random.Random(args.seed)
+    results = []
+    for rows in (int(value) for value in args.rows.split(',')):
+        table = build_table(Database("bench"), "main", Storage(args.storage), columns,
+                            generate_rows(columns, rows, rng))
+        full_seconds, full_bytes = timed(lambda: full_pull(table), args.repeat)
+        for changes in (int(value) for value in args.changes.split(',')):
+            cursor = table.journal.cursor()
+            mutate(table, changes, columns, rng)
+            delta_seconds, delta_bytes = timed(lambda: changes_pull(table, cursor), args.repeat)
+            result = {"rows": rows, "changes": changes,
+                      "full_ms": round(full_seconds * 1000, 3), "full_bytes": full_bytes,
+                      "changes_ms": round(delta_seconds * 1000, 3), "changes_bytes": delta_bytes,
+                      "speedup": round(full_seconds / delta_seconds, 1)}
+            results.append(result)
+            print(f"rows {rows:>9,}  changes {changes:>6,}  full {result['full_ms']:>10.1f} ms "
+                  f"{full_bytes / 2 ** 20:>8.1f} MiB  changes {result['changes_ms']:>8.2f} ms "
+                  f"{delta_bytes / 2 ** 10:>8.1f} KiB  x{result['speedup']}")
+
+    if args.output:
+        report = {
+            "meta": run_meta(
+                columns=args.columns,
+                storage=args.storage,
+                repeat=args.repeat,
+            ),
+            "results": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
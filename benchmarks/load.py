@@ -0,0 +1,158 @@
+# Навантажувальний тест: --clients одночасних клієнтів (типово 1000), кожен зі своїм
+# з'єднанням, протягом --duration секунд надсилають суміш запитів до запущеного uvicorn.
+#
+#   python benchmarks/load.py --clients 1000 --duration 15 --workers 1
+#   python benchmarks/load.py --url http://127.0.0.1:8000 --clients 1000
+#
+# Без --url сервер запускається у тимчасовій теці (див. benchmarks/workers.py) і заповнюється
+# --rows рядками. Окремий зонд кожні 100 мс запитує головну сторінку, що віддається з пам'яті:
+# його затримка показує, чи не зупиняється цикл подій сервера під навантаженням. У звіті —
+# пропускна здатність, перцентилі затримок, кількість помилок і найбільша досягнута кількість
+# одночасних запитів. Клієнт — один процес asyncio, тож на слабкій машині він сам може стати
+# вузьким місцем; у такому разі запускайте його на окремій машині з --url.
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from report import run_meta
+from workers import DATABASE, TABLE, prepare, start_server
+
+
+def raise_fd_limit(needed):
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+    return {"p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000, 3)}
+
+
+async def load(url, row_ids, args):
+    state = {"in_flight": 0, "peak": 0, "errors": 0}
+    latencies = []
+    probe = []
+    limits = httpx.Limits(max_connections=args.clients + 1, max_keepalive_connections=args.clients + 1)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        deadline = time.monotonic() + args.duration
+
+        async def run_client(seed):
+            rng = random.Random(seed)
+            while time.monotonic() < deadline:
+                choice = rng.random()
+                if choice < args.write_ratio:
+                    request = ("POST", f"/{DATABASE}/{TABLE}/add_row",
+                               {"values": {"number": str(rng.randint(0, 10 ** 6)), "label": "load"}})
+                elif choice < 0.5:
+                    request = ("GET", f"/{DATABASE}/{TABLE}/row/{rng.choice(row_ids)}", None)
+                elif choice < 0.8:
+                    request = ("GET", f"/{DATABASE}/{TABLE}/rows?limit=50", None)
+                else:
+                    request = ("GET", f"/{DATABASE}", None)
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+                begin = time.perf_counter()
+                try:
+                    response = await client.request(request[0], request[1], json=request[2])
+                    if response.status_code >= 400:
+                        state["errors"] += 1
+                except httpx.HTTPError:
+                    state["errors"] += 1
+                finally:
+                    state["in_flight"] -= 1
+                latencies.append(time.perf_counter() - begin)
+
+        async def run_probe():
+            while time.monotonic() < deadline:
+                begin = time.perf_counter()
+                await client.get("/")
+                probe.append(time.perf_counter() - begin)
+                await asyncio.sleep(0.1)
+
+        start = time.perf_counter()
+        await asyncio.gather(run_probe(), *(run_client(args.seed + i) for i in range(args.clients)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "clients": args.clients,
+        "requests": len(latencies),
+        "errors": state["errors"],
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "peak_in_flight": state["peak"],
+        **percentiles(latencies),
+        "probe": percentiles(probe),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Навантажувальний тест HTTP API з великою кількістю одночасних клієнтів.")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--workers", type=int, default=1, help="кількість воркерів uvicorn, якщо сервер запускає тест")
+    parser.add_argument("--url", help="адреса вже запущеного сервера з базою, створеною цим тестом раніше")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="файл для збереження результатів у форматі JSON")
+    args = parser.parse_args()
+
+    raise_fd_limit(args.clients * 2 + 256)
+    with tempfile.TemporaryDirectory() as folder:
+        process = None
+        url = args.url
+        if url is None:
+            process, url = start_server(folder, args.workers, args.port)
+        try:
+            if args.url is None or httpx.get(f"{url}/{DATABASE}/tables").status_code == 404:
+                row_ids = prepare(url, args.rows, args.seed)
+            else:
+                row_ids = [row["id"] for row in httpx.get(f"{url}/{DATABASE}/{TABLE}/rows?limit=1000").json()["rows"]]
+            result = asyncio.run(load(url, row_ids, args))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    print(f"clients {result['clients']}  peak in flight {result['peak_in_flight']}  "
+          f"{result['requests_per_sec']:,.1f} req/s  errors {result['errors']}")
+    print(f"latency p50 {result.get('p50_ms')} ms  p99 {result.get('p99_ms')} ms  max {result.get('max_ms')} ms")
+    print(f"event loop probe p50 {result['probe'].get('p50_ms')} ms  p99 {result['probe'].get('p99_ms')} ms  "
+          f"max {result['probe'].get('max_ms')} ms")
+    if args.output:
+        report = {
+            "meta": run_meta(
+                cpus=os.cpu_count(),
+                workers=args.workers if args.url is None else None,
+                duration=args.duration,
+                rows=args.rows,
+                write_ratio=args.write_ratio,
+            ),
+            "results": result,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Порівнює пам'ять, яку займає рядок таблиці: попереднє представлення (об'єкт з __dict__ і
+# власним словником значень) проти компактного Row зі __slots__ і кортежем значень за схемою
+# таблиці.
+#
+#   python benchmarks/memory.py --rows 1000000
+#
+# Вимірювання виконує tracemalloc. Ідентифікатори рядків і значення комірок створюються заздалегідь
+# і спільні для всіх варіантів, тож у результат потрапляють лише структури, що їх утримують:
+# об'єкт рядка, контейнер значень і запис у словнику рядків таблиці.
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from report import run_meta
+from suite import DEFAULT_COLUMNS, parse_columns, random_value
+from dbclasses import VALIDATORS, Row, Table
+
+
+class LegacyRow:
+    def __init__(self, row_id, values, column_types):
+        self.id = row_id
+        self.values = values
+        self.column_types = column_types
+
+
+def generate(columns, count, seed):
+    rng = random.Random(seed)
+    ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(count)]
+    cells = [[VALIDATORS[col_type](random_value(rng, col_type)) for col_type in columns.values()] for _ in range(count)]
+    return ids, cells
+
+
+def build_legacy(columns, ids, cells):
+    names = list(columns)
+    return {row_id: LegacyRow(row_id, dict(zip(names, values)), columns) for row_id, values in zip(ids, cells)}
+
+
+def build_compact(columns, ids, cells):
+    table = Table("main")
+    for col_name, col_type in columns.items():
+        table.add_column(col_name, col_type)
+    for row_id, values in zip(ids, cells):
+        table.rows[row_id] = Row(table.schema, tuple(values), row_id)
+    return table
+
+
+def measure(build, columns, ids, cells):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(columns, ids, cells)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    return {"bytes": size, "bytes_per_row": round(size / len(ids), 1), "build_seconds": round(elapsed, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пам'ять на рядок для різних представлень рядків таблиці.")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--columns", default=DEFAULT_COLUMNS, help="набір колонок у вигляді тип:кількість через кому")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="файл для збереження результатів у форматі JSON")
+    args = parser.parse_args()
+
+    columns = parse_columns(args.columns)
+    ids, cells = generate(columns, args.rows, args.seed)
+    results = {}
+    for label, build in (("legacy_row", build_legacy), ("compact_row", build_compact)):
+        results[label] = measure(build, columns, ids, cells)
+        print(f"{label:<12} {results[label]['bytes_per_row']:>10,.1f} B/row  "
+              f"{results[label]['bytes'] / 2 ** 20:>10,.1f} MiB  ({results[label]['build_seconds']:.2f} s)")
+    print(f"compact_row / legacy_row: x{results['compact_row']['bytes'] / results['legacy_row']['bytes']:.2f}")
+
+    if args.output:
+        report = {
+            "meta": run_meta(
+                rows=args.rows,
+                columns=args.columns,
+                seed=args.seed,
+            ),
+            "results": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Вимірює холодний запуск на теці з багатьма базами: попереднє завантаження всіх баз
+# (DatabaseRegistry.preload) з різною кількістю процесів і запис знімків усіх баз з різною
+# кількістю потоків.
+#
+#   python benchmarks/startup.py --databases 8 --rows 50000 --format binary_zlib --processes 1,2,4
+#
+# Процеси допомагають там, де є що робити поза побудовою таблиць: розпакувати стиснений знімок
+# (binary_zlib) або розібрати й перевірити знімок JSON (json). Нестиснений двійковий знімок
+# читається напряму з пам'яті, і для нього кількість процесів майже не впливає на час.
+# Запис знімків масштабується з кількістю потоків лише для стиснених знімків.
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from report import run_meta
+from suite import DEFAULT_COLUMNS, build_table, generate_rows, parse_columns
+from dbclasses import Database, DatabaseRegistry, Storage
+
+
+def create_databases(folder, args):
+    columns = parse_columns(args.columns)
+    rng = random.Random(args.seed)
+    rows = generate_rows(columns, args.rows, rng)
+    suffix = ".json" if args.format == "json" else ".wdb"
+    for i in range(args.databases):
+        database = Database(f"db{i}")
+        build_table(database, "main", Storage.row, columns, rows)
+        database.save_to_file(os.path.join(folder, f"db{i}{suffix}"), args.format == "binary_zlib")
+
+
+def measure_load(folder, processes, compress):
+    registry = DatabaseRegistry(folder, compress=compress)
+    registry.scan()
+    start = time.perf_counter()
+    if processes > 1:
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+            loaded = registry.preload(executor)
+    else:
+        loaded = registry.preload()
+    return time.perf_counter() - start, len(loaded), registry
+
+
+def measure_save(registry, threads, compress):
+    items = registry.loaded_items()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(lambda item: item[1].save_to_file(registry.snapshot_path(item[0]), compress), items))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Паралельне завантаження і збереження знімків баз даних.")
+    parser.add_argument("--databases", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=50000, help="кількість рядків у кожній базі")
+    parser.add_argument("--columns", default=DEFAULT_COLUMNS, help="набір колонок у вигляді тип:кількість через кому")
+    parser.add_argument("--format", choices=["binary", "binary_zlib", "json"], default="binary_zlib")
+    parser.add_argument("--processes", default="1,2,4", help="кількості процесів для завантаження через кому")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="файл для збереження результатів у форматі JSON")
+    args = parser.parse_args()
+
+    compress = args.format == "binary_zlib"
+    results = []
+    with tempfile.TemporaryDirectory() as source:
+        create_databases(source, args)
+        for processes in (int(value) for value in args.processes.split(',')):
+            with tempfile.TemporaryDirectory() as folder:
+                # Знімки JSON під час завантаження переписуються у двійкові, тож кожен прогін отримує свою копію.
+                shutil.copytree(source, folder, dirs_exist_ok=True)
+                load_seconds, loaded, registry = measure_load(folder, processes, compress)
+                save_seconds = measure_save(registry, processes, compress)
+                for _, database in registry.loaded_items():
+                    database.detach_log()
+            result = {"processes": processes, "databases": loaded,
+                      "load_seconds": round(load_seconds, 3), "save_seconds": round(save_seconds, 3)}
+            if results:
+                result["load_speedup"] = round(results[0]["load_seconds"] / load_seconds, 2)
+                result["save_speedup"] = round(results[0]["save_seconds"] / save_seconds, 2)
+            results.append(result)
+            print(f"processes={processes:<3} load {load_seconds:8.3f} s  x{result.get('load_speedup', 1.0):.2f}  "
+                  f"save ({processes} threads) {save_seconds:8.3f} s  x{result.get('save_speedup', 1.0):.2f}  "
+                  f"databases {loaded}")
+
+    if args.output:
+        report = {
+            "meta": run_meta(
+                cpus=os.cpu_count(),
+                databases=args.databases,
+                rows=args.rows,
+                columns=args.columns,
+                format=args.format,
+            ),
+            "results": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
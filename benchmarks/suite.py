@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from dbclasses import Database, Storage, Type
+from report import run_meta
+
+DEFAULT_COLUMNS = "integer:2,real:1,char:1,string:2,time:1,timeInvl:1"
+
+
+def parse_columns(spec):
+    columns = {}
+    for part in spec.split(','):
+        type_name, _, count = part.partition(':')
+        col_type = Type(type_name.strip())
+        for i in range(int(count or 1)):
+            columns[f"{col_type.value}_{i}"] = col_type
+    return columns
+
+
+def random_time(rng):
+    return f"{rng.randint(0, 99)}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+
+
+def random_value(rng, col_type):
+    if col_type == Type.integer:
+        return str(rng.randint(-10 ** 6, 10 ** 6))
+    if col_type == Type.real:
+        return str(round(rng.uniform(-10 ** 6, 10 ** 6), 3))
+    if col_type == Type.char:
+        return rng.choice("abcdefghijklmnopqrstuvwxyz")
+    if col_type == Type.string:
+        return "value-" + str(rng.randint(0, 10 ** 6))
+    if col_type == Type.time:
+        return random_time(rng)
+    start, end = sorted((random_time(rng), random_time(rng)), key=lambda t: tuple(map(int, t.split(':'))))
+    return f"{start}-{end}"
+
+
+def generate_rows(columns, count, rng):
+    return [{name: random_value(rng, col_type) for name, col_type in columns.items()} for _ in range(count)]
+
+
+def build_table(database, name, storage, columns, rows):
+    database.create_table(name, storage)
+    table = database.tables[name]
+    for col_name, col_type in columns.items():
+        table.add_column(col_name, col_type)
+    for data in rows:
+        table.add_row(dict(data))
+    return table
+
+
+def rate(count, elapsed, **extra):
+    return {"ops": count, "seconds": round(elapsed, 6), "ops_per_sec": round(count / elapsed, 1) if elapsed else None,
+            **extra}
+
+
+def percentiles(latencies):
+    ordered = sorted(latencies)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+    return {"p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000, 3)}
+
+
+def bench_core(columns, rows, storage, rng, folder):
+    results = {}
+    database = Database("bench")
+
+    start = time.perf_counter()
+    table = build_table(database, "main", storage, columns, rows)
+    results["add_row"] = rate(len(rows), time.perf_counter() - start)
+
+    row_ids = list(table.rows)
+    edits = generate_rows(columns, len(row_ids), rng)
+    start = time.perf_counter()
+    for row_id, data in zip(row_ids, edits):
+        table.edit_row(row_id, data)
+    results["edit_row"] = rate(len(row_ids), time.perf_counter() - start)
+
+    half = len(rows) // 2
+    other = build_table(database, "other", storage, columns, edits[:half] + generate_rows(columns, len(rows) - half, rng))
+    start = time.perf_counter()
+    different = sum(1 for _ in table.table_difference(other))
+    results["table_difference"] = rate(len(rows), time.perf_counter() - start, result_rows=different)
+
+    for label, file_name, compress in (("binary", "bench.wdb", False), ("binary_zlib", "bench.wdb", True),
+                                       ("json", "bench.json", False)):
+        path = os.path.join(folder, file_name)
+        start = time.perf_counter()
+        database.save_to_file(path, compress)
+        saved = time.perf_counter() - start
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        Database("bench").load_from_file(path)
+        loaded = time.perf_counter() - start
+        results[f"save_{label}"] = rate(len(rows) * 2, saved, bytes=size)
+        results[f"load_{label}"] = rate(len(rows) * 2, loaded, bytes=size)
+        os.remove(path)
+
+    # Блокування не дає фоновому завданню прибирання працювати паралельно з вимірюванням.
+    with database.lock.write():
+        column = next(iter(columns))
+        start = time.perf_counter()
+        table.delete_column(column)
+        results["delete_column"] = rate(1, time.perf_counter() - start)
+        start = time.perf_counter()
+        table.cleanup_rows(list(table.rows))
+        table.finish_cleanup()
+        results["delete_column_cleanup"] = rate(len(rows), time.perf_counter() - start)
+    return results
+
+
+def bench_api(columns, rows, storage, rng, folder, requests):
+    os.chdir(ROOT)
+    import main
+    from fastapi.testclient import TestClient
+
+    main.DATABASE_FOLDER = Path(folder)
+    main.databases.folder = folder
+    results = {}
+    with TestClient(main.app) as client:
+        client.post("/bench/create")
+        client.post(f"/bench/main/create?storage={storage.value}")
+        client.post(f"/bench/other/create?storage={storage.value}")
+        for table_name in ("main", "other"):
+            for col_name, col_type in columns.items():
+                client.post(f"/bench/{table_name}/add_column?column_name={col_name}&column_type={col_type.value}")
+
+        def measure(name, calls):
+            latencies = []
+            start = time.perf_counter()
+            for method, url, body in calls:
+                begin = time.perf_counter()
+                response = client.request(method, url, json=body)
+                latencies.append(time.perf_counter() - begin)
+                if response.status_code >= 400:
+                    raise RuntimeError(f"{method} {url}: {response.status_code} {response.text[:200]}")
+            results[name] = rate(len(latencies), time.perf_counter() - start, **percentiles(latencies))
+
+        measure("api_add_row", [("POST", "/bench/main/add_row", {"values": data}) for data in rows[:requests]])
+        batches = [rows[i:i + 100] for i in range(0, len(rows), 100)]
+        measure("api_batch_100", [("POST", "/bench/batch",
+                                   {"operations": [{"op": "add_row", "table": "other", "values": data} for data in batch]})
+                                  for batch in batches[:max(1, requests // 10)]])
+        row_ids = [row["id"] for row in client.get(f"/bench/main/rows?limit={requests}").json()["rows"]]
+        measure("api_get_row", [("GET", f"/bench/main/row/{row_id}", None) for row_id in row_ids])
+        measure("api_rows_page_100", [("GET", "/bench/other/rows?limit=100", None)] * requests)
+        integer_column = next((name for name, col_type in columns.items() if col_type == Type.integer), None)
+        if integer_column is not None:
+            measure("api_query_top10", [("POST", "/bench/other/query",
+                                         {"where": {"column": integer_column, "op": "gt", "value": "0"},
+                                          "order_by": [{"column": integer_column, "desc": True}], "limit": 10})]
+                    * max(1, requests // 10))
+        measure("api_compare", [("GET", "/bench/main/compare/other", None)] * max(1, requests // 50))
+        client.delete("/bench/delete")
+    return results
+
+
+def print_results(results, baseline=None):
+    for name, metrics in results.items():
+        line = f"{name:<36} {metrics['ops_per_sec'] or 0:>14,.1f} ops/s"
+        if "p50_ms" in metrics:
+            line += f"  p50 {metrics['p50_ms']:.2f} ms  p99 {metrics['p99_ms']:.2f} ms"
+        if "bytes" in metrics:
+            line += f"  {metrics['bytes']:,} B"
+        previous = (baseline or {}).get(name)
+        if previous and previous.get("ops_per_sec") and metrics["ops_per_sec"]:
+            line += f"  x{metrics['ops_per_sec'] / previous['ops_per_sec']:.2f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Набір тестів продуктивності dbclasses та HTTP API.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--columns", default=DEFAULT_COLUMNS,
+                        help="набір колонок у вигляді тип:кількість через кому")
+    parser.add_argument("--storage", choices=["row", "columnar", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=500, help="кількість запитів у кожному тесті API")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--output", help="файл для збереження результатів у форматі JSON")
+    parser.add_argument("--compare", help="файл з попередніми результатами для порівняння")
+    args = parser.parse_args()
+
+    columns = parse_columns(args.columns)
+    rng = random.Random(args.seed)
+    rows = generate_rows(columns, args.rows, rng)
+    storages = [Storage.row, Storage.columnar] if args.storage == "both" else [Storage(args.storage)]
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for storage in storages:
+            suite = bench_core(columns, rows, storage, random.Random(args.seed + 1), folder)
+            if not args.skip_api:
+                suite.update(bench_api(columns, rows, storage, random.Random(args.seed + 2), folder, args.requests))
+            results.update({f"{storage.value}.{name}": metrics for name, metrics in suite.items()})
+
+    print_results(results, baseline)
+    if args.output:
+        report = {
+            "meta": run_meta(
+                rows=args.rows,
+                columns=args.columns,
+                requests=args.requests,
+                seed=args.seed,
+            ),
+            "results": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Порівнює запити за колонками time і timeInvl без індексів (повний перебір рядків) та з
+# індексами: sorted для time і interval для timeInvl.
+#
+#   python benchmarks/time_queries.py --rows 200000 --storage row --repeat 20
+#
+# Інтервали короткі (до --max-duration секунд) і розкидані по тижню, тож умови overlaps і
+# contains відбирають невелику частку рядків. Для кожного запиту наводиться середній час,
+# кількість знайдених рядків і прискорення з індексом; page — перша сторінка з --limit рядків,
+# відсортованих за колонкою, deep_page — сторінка з курсором посередині таблиці.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from report import run_meta
+from suite import rate
+from dbclasses import Database, FilterOp, IndexKind, Storage, Type, seconds_to_time
+
+WEEK = 7 * 24 * 3600
+
+
+def build(args, rng):
+    database = Database("bench")
+    database.create_table("main", Storage(args.storage))
+    table = database.tables["main"]
+    table.add_column("at", Type.time)
+    table.add_column("span", Type.timeInvl)
+    table.add_column("label", Type.string)
+    for i in range(args.rows):
+        start = rng.randrange(WEEK)
+        end = start + rng.randrange(args.max_duration)
+        table.add_row({"at": seconds_to_time(start), "span": f"{seconds_to_time(start)}-{seconds_to_time(end)}",
+                       "label": f"row-{i}"})
+    return table
+
+
+def queries(table, args, rng):
+    points = [rng.randrange(WEEK) for _ in range(args.repeat)]
+    middle = sorted(table.rows, key=lambda row_id: table.sort_key(table.rows[row_id], "span"))[len(table.rows) // 2]
+    window = args.max_duration // 2
+
+    def filtered(column, op, value, value2=None):
+        return lambda i: sum(1 for _ in table.filter_rows(column, op, value(i), value2(i) if value2 else None))
+
+    return {
+        "overlaps": filtered("span", FilterOp.overlaps,
+                             lambda i: f"{seconds_to_time(points[i])}-{seconds_to_time(points[i] + window)}"),
+        "contains_point": filtered("span", FilterOp.contains, lambda i: seconds_to_time(points[i])),
+        "contains_range": filtered("span", FilterOp.contains,
+                                   lambda i: f"{seconds_to_time(points[i])}-{seconds_to_time(points[i] + 60)}"),
+        "time_between": filtered("at", FilterOp.between, lambda i: seconds_to_time(points[i]),
+                                 lambda i: seconds_to_time(points[i] + window)),
+        "page_by_span": lambda i: sum(1 for _ in table.page_rows(args.limit, None, "span")),
+        "deep_page_by_span": lambda i: sum(1 for _ in table.page_rows(args.limit, middle, "span")),
+        "page_by_at": lambda i: sum(1 for _ in table.page_rows(args.limit, None, "at")),
+    }
+
+
+def measure(table, args, seed):
+    results = {}
+    for name, run in queries(table, args, random.Random(seed)).items():
+        found = 0
+        start = time.perf_counter()
+        for i in range(args.repeat):
+            found += run(i)
+        elapsed = time.perf_counter() - start
+        results[name] = rate(args.repeat, elapsed, avg_ms=round(elapsed / args.repeat * 1000, 3),
+                             avg_rows=round(found / args.repeat, 1))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Запити за часом та інтервалами з індексами і без них.")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--storage", choices=["row", "columnar"], default="row")
+    parser.add_argument("--max-duration", type=int, default=7200, help="найбільша тривалість інтервалу в секундах")
+    parser.add_argument("--limit", type=int, default=50, help="розмір сторінки для відсортованого переліку")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="файл для збереження результатів у форматі JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    table = build(args, rng)
+    results = {"scan": measure(table, args, args.seed)}
+    start = time.perf_counter()
+    table.create_index("at", IndexKind.sorted)
+    table.create_index("span", IndexKind.interval)
+    index_seconds = time.perf_counter() - start
+    results["indexed"] = measure(table, args, args.seed)
+
+    print(f"rows {args.rows}  storage {args.storage}  index build {index_seconds:.3f} s")
+    for name, scan in results["scan"].items():
+        indexed = results["indexed"][name]
+        speedup = scan["avg_ms"] / indexed["avg_ms"] if indexed["avg_ms"] else float('inf')
+        indexed["speedup"] = round(speedup, 1)
+        print(f"{name:<18} scan {scan['avg_ms']:>10.3f} ms  indexed {indexed['avg_ms']:>8.3f} ms  "
+              f"x{speedup:>8.1f}  rows {indexed['avg_rows']}")
+
+    if args.output:
+        report = {
+            "meta": run_meta(
+                rows=args.rows,
+                storage=args.storage,
+                max_duration=args.max_duration,
+                limit=args.limit,
+                repeat=args.repeat,
+                index_build_seconds=round(index_seconds, 3),
+            ),
+            "results": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dbclasses import Row, Schema, Type, compile_validators, convert_column
+from suite import generate_rows
+
+
+def legacy_validate_cell(value, col_type):
+    # Реалізація Row.validate_cell до компільованих валідаторів, для порівняння.
+    def is_valid_time_format(time_str):
+        pattern = r'^\d{1,3}:\d{2}:\d{2}$'
+        match = re.match(pattern, time_str)
+        if not match:
+            raise ValueError
+        hours, minutes, seconds = map(int, time_str.split(':'))
+        if 0 <= minutes < 60 and 0 <= seconds < 60:
+            return value
+        raise ValueError
+
+    def time_to_seconds(time_str):
+        hours, minutes, seconds = map(int, time_str.split(':'))
+        return hours * 3600 + minutes * 60 + seconds
+
+    if value is None:
+        return value
+
+    if col_type == Type.integer:
+        return int(value)
+    elif col_type == Type.real:
+        return float(value)
+    elif col_type == Type.char:
+        if len(value) != 1:
+            raise ValueError
+    elif col_type == Type.time:
+        if not is_valid_time_format(value):
+            raise ValueError
+    elif col_type == Type.timeInvl:
+        value = str(value)
+        values = value.split('-')
+        if not is_valid_time_format(values[0]) or not is_valid_time_format(values[1]):
+            raise ValueError
+        if time_to_seconds(values[1]) - time_to_seconds(values[0]) < 0:
+            raise ValueError
+    elif col_type == Type.string:
+        value = str(value)
+    return value
+
+
+def measure(label, cells, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {cells / elapsed:>14,.0f} cells/s  ({elapsed:.3f} s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Порівняння швидкості валідації комірок.")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    columns = {col_type.value: col_type for col_type in Type}
+    rows = generate_rows(columns, args.rows, random.Random(args.seed))
+    cells = args.rows * len(columns)
+    validators = compile_validators(columns)
+
+    def legacy():
+        for data in rows:
+            for key, value in data.items():
+                legacy_validate_cell(value, columns[key])
+
+    def compiled():
+        schema = Schema(columns)
+        for name in columns:
+            schema.add(name)
+        row = Row(schema)
+        for data in rows:
+            row.values = dict(data)
+            row.validate_row(validators)
+
+    def bulk():
+        for name, col_type in columns.items():
+            convert_column([data[name] for data in rows], col_type)
+
+    measure("legacy validate_cell", cells, legacy)
+    measure("compiled validate_row", cells, compiled)
+    measure("bulk convert_column", cells, bulk)
+
+
+if __name__ == "__main__":
+    main()
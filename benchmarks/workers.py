@@ -0,0 +1,170 @@
+# Вимірює пропускну здатність HTTP API залежно від кількості процесів-воркерів uvicorn,
+# що обслуговують одну теку баз у спільному режимі (WEBDBMS_SHARED_STORAGE=1).
+#
+#   python benchmarks/workers.py --workers 1,2,4 --clients 8 --duration 10 --write-ratio 0.1
+#
+# Для кожної кількості воркерів запускається окремий сервер у тимчасовій теці, база
+# заповнюється --rows рядками, після чого --clients процесів-клієнтів протягом --duration
+# секунд надсилають суміш запитів: частка --write-ratio додає рядки, решта читає сторінку
+# з 100 рядків або один рядок. Результат містить кількість запитів за секунду, затримки
+# p50/p99 і прискорення відносно першої кількості воркерів у списку. Читання масштабуються
+# майже лінійно з кількістю ядер; записи серіалізуються файловим блокуванням бази, тож
+# для навантаження з великою часткою записів приріст менший.
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from report import ROOT, run_meta
+
+DATABASE = "bench"
+TABLE = "main"
+
+
+def start_server(folder, workers, port):
+    os.symlink(ROOT / "static", os.path.join(folder, "static"))
+    env = dict(os.environ, WEBDBMS_SHARED_STORAGE="1")
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(ROOT),
+                                "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+                               cwd=folder, env=env)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Сервер завершився під час запуску.")
+        try:
+            if httpx.get(url + "/all_databases").status_code == 200:
+                return process, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Сервер не відповів за 30 секунд.")
+
+
+def prepare(url, rows, seed):
+    rng = random.Random(seed)
+    with httpx.Client(base_url=url, timeout=60) as client:
+        client.post(f"/{DATABASE}/create").raise_for_status()
+        client.post(f"/{DATABASE}/{TABLE}/create").raise_for_status()
+        for name, col_type in (("number", "integer"), ("label", "string")):
+            client.post(f"/{DATABASE}/{TABLE}/add_column?column_name={name}&column_type={col_type}").raise_for_status()
+        for start in range(0, rows, 1000):
+            operations = [{"op": "add_row", "table": TABLE,
+                           "values": {"number": str(rng.randint(0, 10 ** 6)), "label": f"row-{i}"}}
+                          for i in range(start, min(rows, start + 1000))]
+            client.post(f"/{DATABASE}/batch", json={"operations": operations}).raise_for_status()
+        return [row["id"] for row in client.get(f"/{DATABASE}/{TABLE}/rows?limit=1000").json()["rows"]]
+
+
+def client_loop(url, row_ids, duration, write_ratio, seed, results):
+    rng = random.Random(seed)
+    latencies = {"read": [], "write": []}
+    errors = 0
+    with httpx.Client(base_url=url, timeout=60) as client:
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            if rng.random() < write_ratio:
+                kind = "write"
+                request = ("POST", f"/{DATABASE}/{TABLE}/add_row",
+                           {"values": {"number": str(rng.randint(0, 10 ** 6)), "label": "added"}})
+            elif rng.random() < 0.5:
+                kind = "read"
+                request = ("GET", f"/{DATABASE}/{TABLE}/rows?limit=100", None)
+            else:
+                kind = "read"
+                request = ("GET", f"/{DATABASE}/{TABLE}/row/{rng.choice(row_ids)}", None)
+            begin = time.perf_counter()
+            response = client.request(request[0], request[1], json=request[2])
+            latencies[kind].append(time.perf_counter() - begin)
+            if response.status_code >= 400:
+                errors += 1
+    results.put((latencies, errors))
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+
+def run(workers, args, port):
+    with tempfile.TemporaryDirectory() as folder:
+        process, url = start_server(folder, workers, port)
+        try:
+            row_ids = prepare(url, args.rows, args.seed)
+            results = multiprocessing.Queue()
+            clients = [multiprocessing.Process(target=client_loop,
+                                               args=(url, row_ids, args.duration, args.write_ratio,
+                                                     args.seed + i, results))
+                       for i in range(args.clients)]
+            for client in clients:
+                client.start()
+            collected = [results.get() for _ in clients]
+            for client in clients:
+                client.join()
+        finally:
+            process.terminate()
+            process.wait()
+
+    reads = [value for latencies, _ in collected for value in latencies["read"]]
+    writes = [value for latencies, _ in collected for value in latencies["write"]]
+    total = len(reads) + len(writes)
+    return {
+        "workers": workers,
+        "requests": total,
+        "errors": sum(errors for _, errors in collected),
+        "requests_per_sec": round(total / args.duration, 1),
+        "read_p50_ms": percentile(reads, 0.5),
+        "read_p99_ms": percentile(reads, 0.99),
+        "write_p50_ms": percentile(writes, 0.5),
+        "write_p99_ms": percentile(writes, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Масштабування пропускної здатності API з кількістю воркерів.")
+    parser.add_argument("--workers", default="1,2,4", help="кількості воркерів через кому")
+    parser.add_argument("--clients", type=int, default=8, help="кількість процесів-клієнтів")
+    parser.add_argument("--duration", type=float, default=10.0, help="тривалість кожного прогону в секундах")
+    parser.add_argument("--rows", type=int, default=10000, help="кількість рядків у таблиці перед прогоном")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="частка запитів на запис")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="файл для збереження результатів у форматі JSON")
+    args = parser.parse_args()
+
+    results = []
+    for i, workers in enumerate(int(value) for value in args.workers.split(',')):
+        result = run(workers, args, args.port + i)
+        result["speedup"] = round(result["requests_per_sec"] / results[0]["requests_per_sec"], 2) if results else 1.0
+        results.append(result)
+        print(f"workers={workers:<3} {result['requests_per_sec']:>10,.1f} req/s  x{result['speedup']:.2f}  "
+              f"read p50 {result['read_p50_ms']} ms  p99 {result['read_p99_ms']} ms  "
+              f"write p50 {result['write_p50_ms']} ms  p99 {result['write_p99_ms']} ms  errors {result['errors']}")
+
+    if args.output:
+        report = {
+            "meta": run_meta(
+                cpus=os.cpu_count(),
+                clients=args.clients,
+                duration=args.duration,
+                rows=args.rows,
+                write_ratio=args.write_ratio,
+            ),
+            "results": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,36 @@
+import bisect
+import heapq
+import itertools
 import json
+import logging
+import mmap
+import os
+import queue
+import random
 import re
+import struct
+import sys
+import threading
+import time
 import uuid
+import weakref
+import zlib
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
 from enum import Enum
-from typing import Any, List
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from metrics import LOG_BYTES, ROWS_VALIDATED, SNAPSHOT_BYTES, SNAPSHOT_DURATION
+
+logger = logging.getLogger(__name__)
 
 
 class Type(Enum):
@@ -14,6 +42,11 @@ class Type(Enum):
     timeInvl = "timeInvl"
 
 
+class Storage(Enum):
+    row = "row"
+    columnar = "columnar"
+
+
 class ValidError(Exception):
     def __init__(self, invalid_columns, message=None):
         self.invalid_columns = invalid_columns
@@ -23,21 +56,152 @@ class ValidError(Exception):
         super().__init__(self.message)
 
 
+class BatchError(Exception):
+    def __init__(self, position: int, error: Exception):
+        self.position = position
+        self.error = error
+        super().__init__(f"Операція №{position}: {error}")
+
+
+class LogWriteError(Exception):
+    def __init__(self, file_path: str, error: Exception):
+        self.file_path = file_path
+        self.error = error
+        super().__init__(f"Не вдалося записати журнал змін '{file_path}': {error}. "
+                         f"До перезапуску сервера база доступна лише для читання.")
+
+
+def time_to_seconds(time_str: str) -> int:
+    hours, minutes, seconds = map(int, time_str.split(':'))
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def normalize_cell(value: Any, col_type: Type) -> Any:
+    if value is None:
+        return None
+    if col_type == Type.time:
+        return time_to_seconds(value)
+    if col_type == Type.timeInvl:
+        start, end = value.split('-')
+        return time_to_seconds(start), time_to_seconds(end)
+    return value
+
+
+TIME_PATTERN = re.compile(r'^(\d{1,3}):(\d{2}):(\d{2})$')
+
+
+def parse_time(time_str: str) -> int:
+    match = TIME_PATTERN.match(time_str)
+    if not match:
+        raise ValueError
+    hours, minutes, seconds = map(int, match.groups())
+    if minutes >= 60 or seconds >= 60:
+        raise ValueError
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def validate_char(value: Any) -> str:
+    if not isinstance(value, str) or len(value) != 1:
+        raise ValueError
+    return value
+
+
+def validate_time(value: Any) -> int:
+    if not isinstance(value, str):
+        raise ValueError
+    return parse_time(value)
+
+
+def validate_interval(value: Any) -> tuple[int, int]:
+    start, end = str(value).split('-')
+    start, end = parse_time(start), parse_time(end)
+    if end < start:
+        raise ValueError
+    return start, end
+
+
+VALIDATORS: dict[Type, Callable[[Any], Any]] = {
+    Type.integer: int,
+    Type.real: float,
+    Type.char: validate_char,
+    Type.string: str,
+    Type.time: validate_time,
+    Type.timeInvl: validate_interval,
+}
+
+
+def compile_validators(columns: dict[str, Type]) -> dict[str, Callable[[Any], Any]]:
+    return {col_name: VALIDATORS[col_type] for col_name, col_type in columns.items()}
+
+
+class Schema:
+    # Розкладка колонок, спільна для всіх рядків таблиці: рядок зберігає лише кортеж значень,
+    # а позицію кожної колонки в ньому визначає схема. Позиції не залежать від порядку колонок;
+    # позиція видаленої колонки звільняється лише після того, як її значення прибрано з рядків.
+    __slots__ = ('columns', 'positions', 'dropped', 'free', 'width')
+
+    def __init__(self, columns: dict[str, Type]):
+        self.columns = columns
+        self.positions: dict[str, int] = {}
+        self.dropped: dict[str, int] = {}
+        self.free: List[int] = []
+        self.width = 0
+
+    def add(self, column: str) -> int:
+        if self.free:
+            position = self.free.pop()
+        else:
+            position = self.width
+            self.width += 1
+        self.positions[sys.intern(column)] = position
+        return position
+
+    def drop(self, column: str) -> None:
+        self.dropped[column] = self.positions.pop(column)
+
+    def restore(self, column: str) -> None:
+        self.positions[column] = self.dropped.pop(column)
+
+    def release(self, column: str) -> int:
+        position = self.dropped.pop(column)
+        self.free.append(position)
+        return position
+
+    def pack(self, values: dict[str, Any]) -> tuple:
+        cells = [None] * self.width
+        positions = self.positions
+        for key, value in values.items():
+            cells[positions[key]] = value
+        return tuple(cells)
+
+
 class Row:
-    def __init__(self):
-        self.id = uuid.uuid4()
-        self.values: dict[str, Any] = {}
-        self.column_types: dict[str, Type] = {}
+    __slots__ = ('id', 'schema', 'cells')
 
-    def edit_row(self, data: dict[str, Any]) -> bool:
-        demo_row = Row()
-        demo_row.column_types = self.column_types
+    def __init__(self, schema: Schema, cells: tuple = (), row_id: Optional[uuid.UUID] = None):
+        self.id = uuid.uuid4() if row_id is None else row_id
+        self.schema = schema
+        self.cells = cells
+
+    @property
+    def values(self) -> dict[str, Any]:
+        return {column: self.value(column) for column in self.schema.columns}
+
+    @values.setter
+    def values(self, values: dict[str, Any]) -> None:
+        self.cells = self.schema.pack(values)
+
+    @property
+    def column_types(self) -> dict[str, Type]:
+        return self.schema.columns
+
+    def edit_row(self, data: dict[str, Any],
+                 validators: Optional[dict[str, Callable[[Any], Any]]] = None) -> bool:
         new_valid_dict = {}
-        demo_row.values = new_valid_dict
 
         is_all_none = True
         for key, value in data.items():
-            if value is not None:
+            if isinstance(value, str):
                 value = value.strip()
             if key not in self.column_types:
                 print(f"Колонка '{key}' не знайдена у таблиці.")
@@ -47,95 +211,1212 @@ class Row:
                     both_val = value.split('-')
                     if both_val[0] != "" or both_val[1] != "":
                         is_all_none = False
-                        demo_row.values[key] = value
+                        new_valid_dict[key] = value
                     else:
-                        demo_row.values[key] = None
+                        new_valid_dict[key] = None
                 else:
-                    demo_row.values[key] = None
+                    new_valid_dict[key] = None
             elif self.column_types[key] == Type.string:
                 if value == "":
-                    demo_row.values[key] = None
+                    new_valid_dict[key] = None
                 else:
                     if value is not None:
                         is_all_none = False
-                    demo_row.values[key] = value
+                    new_valid_dict[key] = value
             else:
                 if value is not None:
                     is_all_none = False
-                demo_row.values[key] = value
+                new_valid_dict[key] = value
         if is_all_none:
             raise ValueError("Усі поля порожні. Введіть, будь ласка, дані.")
 
-        invalid_columns = demo_row.validate_row()
-        if invalid_columns:
-            raise ValidError(invalid_columns)
+        demo_row = Row(self.schema, self.schema.pack(new_valid_dict), self.id)
+        invalid_columns = demo_row.validate_row(validators)
+        if invalid_columns:
+            raise ValidError(invalid_columns)
+
+        self.assign(demo_row)
+        return True
+
+    def assign(self, row: 'Row') -> None:
+        self.cells = row.cells
+
+    def value(self, column: str) -> Any:
+        key = self.key(column)
+        if key is None:
+            return None
+        decode = CELL_DECODERS.get(self.schema.columns[column])
+        return key if decode is None else decode(key)
+
+    def key(self, column: str) -> Any:
+        # Значення в тому вигляді, в якому його зберігає рядок: час — секунди, інтервал — пара секунд.
+        try:
+            return self.cells[self.schema.positions[column]]
+        except (KeyError, IndexError):
+            return None
+
+    def set_cell(self, position: int, value: Any) -> None:
+        cells = self.cells
+        if position < len(cells):
+            self.cells = cells[:position] + (value,) + cells[position + 1:]
+        elif value is not None:
+            self.cells = cells + (None,) * (position - len(cells)) + (value,)
+
+    def validate_cell(self, value: Any, col_type: Type) -> Any:
+        if value is None:
+            return value
+        return VALIDATORS[col_type](value)
+
+    def validate_row(self, validators: Optional[dict[str, Callable[[Any], Any]]] = None) -> List[str]:
+        if validators is None:
+            validators = compile_validators(self.column_types)
+        invalid_col_values = []
+        cells = list(self.cells)
+        size = len(cells)
+        for key, position in self.schema.positions.items():
+            if position >= size or (value := cells[position]) is None:
+                continue
+            try:
+                cells[position] = validators[key](value)
+            except (ValueError, TypeError):
+                invalid_col_values.append(key)
+        self.cells = tuple(cells)
+        return invalid_col_values
+
+
+INVALID = object()
+
+
+def prepare_cell(value: Any, col_type: Type) -> Any:
+    if isinstance(value, str):
+        value = value.strip()
+        if value == "" or (col_type == Type.timeInvl and value == "-"):
+            return None
+    return value
+
+
+def convert_column(values: List[Any], col_type: Type) -> List[Any]:
+    validator = VALIDATORS[col_type]
+    values = [prepare_cell(value, col_type) for value in values]
+    try:
+        return [None if value is None else validator(value) for value in values]
+    except (ValueError, TypeError):
+        pass
+
+    converted = []
+    for value in values:
+        try:
+            converted.append(None if value is None else validator(value))
+        except (ValueError, TypeError):
+            converted.append(INVALID)
+    return converted
+
+
+def seconds_to_time(total: int) -> str:
+    hours, rest = divmod(total, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def format_interval(key: tuple[int, int]) -> str:
+    return f"{seconds_to_time(key[0])}-{seconds_to_time(key[1])}"
+
+
+CELL_DECODERS: dict[Type, Callable[[Any], Any]] = {
+    Type.time: seconds_to_time,
+    Type.timeInvl: format_interval,
+}
+
+
+class ColumnBuffer:
+    fields = ('nulls',)
+
+    def __init__(self, size: int = 0):
+        self.size = 0
+        self.nulls = bytearray()
+        self.resize(size)
+
+    def resize(self, size: int) -> None:
+        self.nulls.extend(b'\xff' * ((size + 7) // 8 - len(self.nulls)))
+        self._extend(size - self.size)
+        self.size = size
+
+    def is_null(self, slot: int) -> bool:
+        return slot >= self.size or bool(self.nulls[slot >> 3] >> (slot & 7) & 1)
+
+    def get(self, slot: int) -> Any:
+        if self.is_null(slot):
+            return None
+        return self.decode(self._get(slot))
+
+    def key(self, slot: int) -> Any:
+        return self.get(slot)
+
+    def set(self, slot: int, encoded: Any) -> None:
+        # Буфер росте лише під час запису значення: слоти за його межами вважаються порожніми,
+        # тому нова колонка не потребує заповнення для вже наявних рядків.
+        if slot >= self.size:
+            if encoded is None:
+                return
+            self.resize(slot + 1)
+        if encoded is None:
+            self.nulls[slot >> 3] |= 1 << (slot & 7)
+            self._clear(slot)
+        else:
+            self.nulls[slot >> 3] &= ~(1 << (slot & 7)) & 0xff
+            self._set(slot, encoded)
+
+    def encode(self, value: Any) -> Any:
+        return value
+
+    def decode(self, encoded: Any) -> Any:
+        return encoded
+
+    def nbytes(self) -> int:
+        return len(self.nulls)
+
+    def _extend(self, count: int) -> None:
+        raise NotImplementedError
+
+    def _get(self, slot: int) -> Any:
+        raise NotImplementedError
+
+    def _set(self, slot: int, encoded: Any) -> None:
+        raise NotImplementedError
+
+    def _clear(self, slot: int) -> None:
+        pass
+
+    def _length(self) -> int:
+        raise NotImplementedError
+
+    def write_snapshot(self, writer: 'SnapshotWriter') -> None:
+        for field in self.fields:
+            writer.part(getattr(self, field))
+
+    def read_snapshot(self, reader: 'SnapshotReader', size: int) -> None:
+        for field in self.fields:
+            setattr(self, field, reader.part(getattr(self, field)))
+        self.size = min(size, self._length())
+
+
+class ArrayColumn(ColumnBuffer):
+    typecode = 'q'
+    fields = ('nulls', 'data')
+
+    def __init__(self, size: int = 0):
+        self.data = array(self.typecode)
+        super().__init__(size)
+
+    def nbytes(self) -> int:
+        return super().nbytes() + self.data.itemsize * len(self.data)
+
+    def _extend(self, count: int) -> None:
+        self.data.extend(array(self.typecode, [0]) * count)
+
+    def _get(self, slot: int) -> Any:
+        return self.data[slot]
+
+    def _set(self, slot: int, encoded: Any) -> None:
+        self.data[slot] = encoded
+
+    def _length(self) -> int:
+        return len(self.data)
+
+
+class IntegerColumn(ArrayColumn):
+    typecode = 'q'
+
+    def encode(self, value: Any) -> Any:
+        if not -2 ** 63 <= value < 2 ** 63:
+            raise OverflowError
+        return value
+
+
+class RealColumn(ArrayColumn):
+    typecode = 'd'
+
+
+class TimeColumn(ArrayColumn):
+    typecode = 'q'
+
+    def encode(self, value: Any) -> Any:
+        return time_to_seconds(value) if isinstance(value, str) else value
+
+    def decode(self, encoded: Any) -> Any:
+        return seconds_to_time(encoded)
+
+    def key(self, slot: int) -> Any:
+        return None if self.is_null(slot) else self._get(slot)
+
+
+class IntervalColumn(ColumnBuffer):
+    fields = ('nulls', 'starts', 'ends')
+
+    def __init__(self, size: int = 0):
+        self.starts = array('q')
+        self.ends = array('q')
+        super().__init__(size)
+
+    def encode(self, value: Any) -> Any:
+        if not isinstance(value, str):
+            return value
+        start, end = value.split('-')
+        return time_to_seconds(start), time_to_seconds(end)
+
+    def decode(self, encoded: Any) -> Any:
+        return format_interval(encoded)
+
+    def key(self, slot: int) -> Any:
+        return None if self.is_null(slot) else self._get(slot)
+
+    def nbytes(self) -> int:
+        return super().nbytes() + 8 * (len(self.starts) + len(self.ends))
+
+    def _extend(self, count: int) -> None:
+        self.starts.extend(array('q', [0]) * count)
+        self.ends.extend(array('q', [0]) * count)
+
+    def _get(self, slot: int) -> Any:
+        return self.starts[slot], self.ends[slot]
+
+    def _set(self, slot: int, encoded: Any) -> None:
+        self.starts[slot], self.ends[slot] = encoded
+
+    def _length(self) -> int:
+        return len(self.starts)
+
+
+class StringColumn(ColumnBuffer):
+    fields = ('nulls', 'blob', 'offsets', 'lengths')
+
+    def __init__(self, size: int = 0):
+        self.blob = bytearray()
+        self.offsets = array('Q')
+        self.lengths = array('L')
+        self.garbage = 0
+        super().__init__(size)
+
+    def encode(self, value: Any) -> Any:
+        return str(value).encode('utf-8')
+
+    def decode(self, encoded: Any) -> Any:
+        return encoded.decode('utf-8')
+
+    def nbytes(self) -> int:
+        return super().nbytes() + len(self.blob) + 8 * len(self.offsets) + 4 * len(self.lengths)
+
+    def _extend(self, count: int) -> None:
+        self.offsets.extend(array('Q', [0]) * count)
+        self.lengths.extend(array('L', [0]) * count)
+
+    def _get(self, slot: int) -> Any:
+        offset = self.offsets[slot]
+        return bytes(self.blob[offset:offset + self.lengths[slot]])
+
+    def _set(self, slot: int, encoded: Any) -> None:
+        self._clear(slot)
+        self.offsets[slot] = len(self.blob)
+        self.lengths[slot] = len(encoded)
+        self.blob.extend(encoded)
+
+    def _clear(self, slot: int) -> None:
+        self.garbage += self.lengths[slot]
+        self.lengths[slot] = 0
+        if self.garbage > len(self.blob) // 2:
+            self.compact()
+
+    def _length(self) -> int:
+        return len(self.offsets)
+
+    def compact(self) -> None:
+        blob = bytearray()
+        for slot in range(self.size):
+            offset, length = self.offsets[slot], self.lengths[slot]
+            self.offsets[slot] = len(blob)
+            blob.extend(self.blob[offset:offset + length])
+        self.blob = blob
+        self.garbage = 0
+
+    def read_snapshot(self, reader: 'SnapshotReader', size: int) -> None:
+        super().read_snapshot(reader, size)
+        self.garbage = len(self.blob) - sum(self.lengths)
+
+
+COLUMN_BUFFERS = {
+    Type.integer: IntegerColumn,
+    Type.real: RealColumn,
+    Type.char: StringColumn,
+    Type.string: StringColumn,
+    Type.time: TimeColumn,
+    Type.timeInvl: IntervalColumn,
+}
+
+
+class ColumnarRow(Row):
+    __slots__ = ('store', 'slot')
+
+    def __init__(self, store: 'ColumnStore', row_id: uuid.UUID, slot: int):
+        self.store = store
+        self.id = row_id
+        self.slot = slot
+        self.schema = store.schema
+
+    @property
+    def values(self) -> dict[str, Any]:
+        return self.store.read(self.slot)
+
+    @values.setter
+    def values(self, values: dict[str, Any]) -> None:
+        self.store.write(self.slot, values)
+
+    @property
+    def column_types(self) -> dict[str, Type]:
+        return self.store.column_types
+
+    def assign(self, row: Row) -> None:
+        self.store.write(self.slot, {name: row.key(name) for name in self.store.buffers})
+
+    def value(self, column: str) -> Any:
+        return self.store.buffers[column].get(self.slot)
+
+    def key(self, column: str) -> Any:
+        return self.store.buffers[column].key(self.slot)
+
+
+class ColumnStore(MutableMapping):
+    def __init__(self, schema: Schema):
+        self.schema = schema
+        self.column_types = schema.columns
+        self.buffers: dict[str, ColumnBuffer] = {name: COLUMN_BUFFERS[col_type]() for name, col_type in self.column_types.items()}
+        self.slots: dict[uuid.UUID, int] = {}
+        self.slot_ids: List[Optional[uuid.UUID]] = []
+        self.free_slots: List[int] = []
+
+    def __getitem__(self, row_id: uuid.UUID) -> ColumnarRow:
+        return ColumnarRow(self, row_id, self.slots[row_id])
+
+    def __setitem__(self, row_id: uuid.UUID, row: Row) -> None:
+        values = {name: row.key(name) for name in self.buffers}
+        if row_id in self.slots:
+            self.write(self.slots[row_id], values)
+            return
+        slot = self._allocate()
+        try:
+            self.write(slot, values)
+        except ValidError:
+            self.free_slots.append(slot)
+            raise
+        self.slots[row_id] = slot
+        self.slot_ids[slot] = row_id
+
+    def __delitem__(self, row_id: uuid.UUID) -> None:
+        slot = self.slots.pop(row_id)
+        self.slot_ids[slot] = None
+        for buffer in self.buffers.values():
+            buffer.set(slot, None)
+        self.free_slots.append(slot)
+
+    def __iter__(self) -> Iterator[uuid.UUID]:
+        return iter(self.slots)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, row_id: object) -> bool:
+        return row_id in self.slots
+
+    def restore_slot(self, row_id: uuid.UUID, slot: int, values: dict[str, Any]) -> None:
+        # Повертає видалений рядок у його колишній слот: значення видалених колонок, які ще не прибрано,
+        # лишаються у відкладених буферах саме за цим слотом.
+        if row_id not in self.slots:
+            self.free_slots.remove(slot)
+            self.slots[row_id] = slot
+            self.slot_ids[slot] = row_id
+        self.write(slot, values)
+
+    def _allocate(self) -> int:
+        if self.free_slots:
+            return self.free_slots.pop()
+        self.slot_ids.append(None)
+        return len(self.slot_ids) - 1
+
+    def read(self, slot: int) -> dict[str, Any]:
+        return {name: buffer.get(slot) for name, buffer in self.buffers.items()}
+
+    def write(self, slot: int, values: dict[str, Any]) -> None:
+        encoded = {}
+        for name, buffer in self.buffers.items():
+            value = values.get(name)
+            try:
+                encoded[name] = None if value is None else buffer.encode(value)
+            except (OverflowError, ValueError):
+                raise ValidError([name])
+        for name, buffer in self.buffers.items():
+            buffer.set(slot, encoded[name])
+
+    def add_column(self, column_name: str, column_type: Type) -> None:
+        self.buffers[column_name] = COLUMN_BUFFERS[column_type]()
+
+    def delete_column(self, column_name: str) -> ColumnBuffer:
+        return self.buffers.pop(column_name)
+
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes() for buffer in self.buffers.values())
+
+    def write_snapshot(self, writer: 'SnapshotWriter') -> None:
+        writer.u64(len(self.slot_ids))
+        writer.raw(b''.join(NIL_UUID if row_id is None else row_id.bytes for row_id in self.slot_ids))
+        for name in self.column_types:
+            writer.u8(COLUMN_BUFFERED)
+            self.buffers[name].write_snapshot(writer)
+
+    def restore(self, slot_ids: List[Optional[uuid.UUID]], buffers: dict[str, ColumnBuffer]) -> None:
+        self.buffers = {name: buffers[name] for name in self.column_types}
+        self.slot_ids = slot_ids
+        self.slots = {row_id: slot for slot, row_id in enumerate(slot_ids) if row_id is not None}
+        self.free_slots = [slot for slot, row_id in enumerate(slot_ids) if row_id is None]
+
+
+class IndexKind(Enum):
+    hash = "hash"
+    sorted = "sorted"
+    interval = "interval"
+
+
+class FilterOp(Enum):
+    eq = "eq"
+    ne = "ne"
+    lt = "lt"
+    le = "le"
+    gt = "gt"
+    ge = "ge"
+    between = "between"
+    overlaps = "overlaps"
+    contains = "contains"
+
+
+class HashIndex:
+    def __init__(self):
+        self.entries: dict[Any, set[uuid.UUID]] = {}
+
+    def insert(self, row_id: uuid.UUID, key: Any) -> None:
+        self.entries.setdefault(key, set()).add(row_id)
+
+    def remove(self, row_id: uuid.UUID, key: Any) -> None:
+        row_ids = self.entries.get(key)
+        if row_ids is not None:
+            row_ids.discard(row_id)
+            if not row_ids:
+                del self.entries[key]
+
+    def lookup(self, key: Any) -> List[uuid.UUID]:
+        return list(self.entries.get(key, ()))
+
+    def load(self, items: Iterable[tuple[uuid.UUID, Any]]) -> None:
+        for row_id, key in items:
+            self.insert(row_id, key)
+
+
+MAX_UUID = uuid.UUID(int=(1 << 128) - 1)
+
+
+class SortedIndex:
+    def __init__(self):
+        self.entries: List[tuple[Any, uuid.UUID]] = []
+
+    def insert(self, row_id: uuid.UUID, key: Any) -> None:
+        bisect.insort(self.entries, (key, row_id))
+
+    def load(self, items: Iterable[tuple[uuid.UUID, Any]]) -> None:
+        self.entries = sorted((key, row_id) for row_id, key in items)
+
+    def remove(self, row_id: uuid.UUID, key: Any) -> None:
+        i = bisect.bisect_left(self.entries, (key, row_id))
+        if i < len(self.entries) and self.entries[i] == (key, row_id):
+            del self.entries[i]
+
+    def range(self, low: Any = None, high: Any = None,
+              low_inclusive: bool = True, high_inclusive: bool = True) -> List[uuid.UUID]:
+        lo = 0
+        if low is not None:
+            lo = bisect.bisect_left(self.entries, (low,) if low_inclusive else (low, MAX_UUID))
+        hi = len(self.entries)
+        if high is not None:
+            hi = bisect.bisect_right(self.entries, (high, MAX_UUID) if high_inclusive else (high,))
+        return [row_id for _, row_id in self.entries[lo:hi]]
+
+    def after(self, key: Any = None, row_id: Optional[uuid.UUID] = None) -> Iterator[uuid.UUID]:
+        i = 0 if row_id is None else bisect.bisect_right(self.entries, (key, row_id))
+        while i < len(self.entries):
+            yield self.entries[i][1]
+            i += 1
+
+
+class IntervalNode:
+    __slots__ = ("key", "priority", "max_end", "left", "right")
+
+    def __init__(self, key: tuple):
+        self.key = key
+        self.priority = random.random()
+        self.max_end = key[1]
+        self.left: Optional[IntervalNode] = None
+        self.right: Optional[IntervalNode] = None
+
+    def update(self) -> None:
+        self.max_end = self.key[1]
+        if self.left is not None and self.left.max_end > self.max_end:
+            self.max_end = self.left.max_end
+        if self.right is not None and self.right.max_end > self.max_end:
+            self.max_end = self.right.max_end
+
+
+class IntervalIndex:
+    # Дерамида (treap), впорядкована за початком інтервалу, з максимумом кінця в піддереві.
+    def __init__(self):
+        self.root: Optional[IntervalNode] = None
+
+    def insert(self, row_id: uuid.UUID, key: tuple[int, int]) -> None:
+        left, right = self._split(self.root, (key[0], key[1], row_id))
+        self.root = self._merge(self._merge(left, IntervalNode((key[0], key[1], row_id))), right)
+
+    def remove(self, row_id: uuid.UUID, key: tuple[int, int]) -> None:
+        self.root = self._remove(self.root, (key[0], key[1], row_id))
+
+    def load(self, items: Iterable[tuple[uuid.UUID, tuple[int, int]]]) -> None:
+        # Дерамида з відсортованих ключів будується за один прохід: стек тримає правий край дерева,
+        # а вузол, що покидає його, вже має обидва піддерева й може порахувати максимум кінця.
+        stack: List[IntervalNode] = []
+        for key in sorted((key[0], key[1], row_id) for row_id, key in items):
+            node = IntervalNode(key)
+            last = None
+            while stack and stack[-1].priority < node.priority:
+                last = stack.pop()
+                last.update()
+            node.left = last
+            if stack:
+                stack[-1].right = node
+            stack.append(node)
+        for node in reversed(stack):
+            node.update()
+        self.root = stack[0] if stack else None
+
+    def overlapping(self, start: int, end: int) -> List[uuid.UUID]:
+        return self._search(end, start)
+
+    def containing(self, start: int, end: int) -> List[uuid.UUID]:
+        return self._search(start, end)
+
+    def after(self, key: Optional[tuple[int, int]] = None, row_id: Optional[uuid.UUID] = None) -> Iterator[uuid.UUID]:
+        # Обхід у порядку (початок, кінець, id) — у тому ж, у якому page_rows сортує рядки за інтервалом.
+        bound = None if row_id is None else (key[0], key[1], row_id)
+        stack = []
+        node = self.root
+        while node is not None:
+            if bound is None or node.key > bound:
+                stack.append(node)
+                node = node.left
+            else:
+                node = node.right
+        while stack:
+            node = stack.pop()
+            yield node.key[2]
+            node = node.right
+            while node is not None:
+                stack.append(node)
+                node = node.left
+
+    def _search(self, max_start: int, min_end: int) -> List[uuid.UUID]:
+        # Інтервали з початком не пізніше max_start і кінцем не раніше min_end. Піддерево
+        # відкидається за максимумом кінця, праві піддерева — за початком вузла.
+        result = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None or node.max_end < min_end:
+                continue
+            if node.key[0] <= max_start:
+                if node.key[1] >= min_end:
+                    result.append(node.key[2])
+                stack.append(node.right)
+            stack.append(node.left)
+        return result
+
+    def _split(self, node: Optional[IntervalNode], key: tuple) -> tuple:
+        if node is None:
+            return None, None
+        if node.key < key:
+            node.right, right = self._split(node.right, key)
+            node.update()
+            return node, right
+        left, node.left = self._split(node.left, key)
+        node.update()
+        return left, node
+
+    def _merge(self, left: Optional[IntervalNode], right: Optional[IntervalNode]) -> Optional[IntervalNode]:
+        if left is None:
+            return right
+        if right is None:
+            return left
+        if left.priority > right.priority:
+            left.right = self._merge(left.right, right)
+            left.update()
+            return left
+        right.left = self._merge(left, right.left)
+        right.update()
+        return right
+
+    def _remove(self, node: Optional[IntervalNode], key: tuple) -> Optional[IntervalNode]:
+        if node is None:
+            return None
+        if node.key == key:
+            return self._merge(node.left, node.right)
+        if key < node.key:
+            node.left = self._remove(node.left, key)
+        else:
+            node.right = self._remove(node.right, key)
+        node.update()
+        return node
+
+
+INDEX_CLASSES = {
+    IndexKind.hash: HashIndex,
+    IndexKind.sorted: SortedIndex,
+    IndexKind.interval: IntervalIndex,
+}
+
+INDEX_COLUMN_TYPES = {
+    IndexKind.hash: set(Type),
+    IndexKind.sorted: {Type.integer, Type.real, Type.time},
+    IndexKind.interval: {Type.timeInvl},
+}
+
+FILTER_PREDICATES = {
+    FilterOp.eq: lambda key, low, high: key == low,
+    FilterOp.ne: lambda key, low, high: key != low,
+    FilterOp.lt: lambda key, low, high: key < low,
+    FilterOp.le: lambda key, low, high: key <= low,
+    FilterOp.gt: lambda key, low, high: key > low,
+    FilterOp.ge: lambda key, low, high: key >= low,
+    FilterOp.between: lambda key, low, high: low <= key <= high,
+    FilterOp.overlaps: lambda key, low, high: key[0] <= high[1] and key[1] >= low[0],
+    FilterOp.contains: lambda key, low, high: key[0] <= low[0] and key[1] >= high[1],
+}
+
+
+class ReadWriteLock:
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer: Optional[int] = None
+        self.write_depth = 0
+        self.waiting_writers = 0
+
+    def acquire_read(self) -> None:
+        with self.condition:
+            if self.writer != threading.get_ident():
+                while self.writer is not None or self.waiting_writers:
+                    self.condition.wait()
+            self.readers += 1
+
+    def release_read(self) -> None:
+        with self.condition:
+            self.readers -= 1
+            if not self.readers:
+                self.condition.notify_all()
+
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        with self.condition:
+            if self.writer == me:
+                self.write_depth += 1
+                return
+            self.waiting_writers += 1
+            while self.writer is not None or self.readers:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writer = me
+            self.write_depth = 1
+
+    def release_write(self) -> None:
+        with self.condition:
+            self.write_depth -= 1
+            if not self.write_depth:
+                self.writer = None
+                self.condition.notify_all()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class LogWriter:
+    def __init__(self):
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def submit(self, log: 'WriteAheadLog', item: Any) -> None:
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name="wal-writer", daemon=True)
+                    self.thread.start()
+        self.queue.put((log, item))
+
+    def run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            pending: dict[WriteAheadLog, List[str]] = {}
+            for log, item in batch:
+                if isinstance(item, str):
+                    pending.setdefault(log, []).append(item)
+                    continue
+                self._write(log, pending.pop(log, None))
+                try:
+                    if isinstance(item, threading.Event):
+                        item.set()
+                    else:
+                        log.compact(item)
+                except Exception:
+                    logger.exception("Помилка при стисненні журналу '%s'", log.file_path)
+            for log, lines in pending.items():
+                self._write(log, lines)
+
+    def _write(self, log: 'WriteAheadLog', lines: Optional[List[str]]) -> None:
+        # Після невдалого запису наступні записи не дописуються: журнал із пропуском
+        # відтворив би пізніші зміни без попередніх.
+        if not lines or log.error is not None:
+            return
+        try:
+            data = ''.join(lines)
+            log.file.write(data)
+            log.file.flush()
+            LOG_BYTES.inc(len(data.encode('utf-8')))
+            if log.sync:
+                os.fsync(log.file.fileno())
+        except Exception as e:
+            log.error = LogWriteError(log.file_path, e)
+            logger.exception("Помилка при записі журналу '%s'", log.file_path)
+
+
+LOG_WRITER = LogWriter()
+
+
+class WriteAheadLog:
+    def __init__(self, file_path: str, seq: int = 0, sync: bool = False):
+        self.file_path = file_path
+        self.seq = seq
+        self.sync = sync
+        self.entries = 0
+        self.error: Optional[LogWriteError] = None
+        self.file = open(file_path, 'a', encoding='utf-8')
+
+    def append(self, entry: dict[str, Any]) -> int:
+        if self.error is not None:
+            raise self.error
+        self.seq += 1
+        entry["seq"] = self.seq
+        LOG_WRITER.submit(self, json.dumps(entry, ensure_ascii=False) + "\n")
+        self.entries += 1
+        return self.seq
+
+    def truncate(self, upto_seq: Optional[int] = None) -> None:
+        if upto_seq is None:
+            upto_seq = self.seq
+        self.entries = self.seq - upto_seq
+        LOG_WRITER.submit(self, upto_seq)
+
+    def flush(self) -> None:
+        done = threading.Event()
+        LOG_WRITER.submit(self, done)
+        done.wait()
+        if self.error is not None:
+            raise self.error
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        except LogWriteError:
+            # Помилку вже записано в лог сервера під час невдалого запису.
+            pass
+        finally:
+            self.file.close()
+
+    def reopen(self) -> None:
+        self.file.close()
+        self.file = open(self.file_path, 'a', encoding='utf-8')
+
+    def compact(self, upto_seq: int) -> None:
+        self.file.close()
+        kept = [json.dumps(entry, ensure_ascii=False) + "\n"
+                for entry in self.read(self.file_path) if entry["seq"] > upto_seq]
+        tmp_path = self.file_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(kept)
+        os.replace(tmp_path, self.file_path)
+        self.file = open(self.file_path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def read(file_path: str) -> Iterator[dict[str, Any]]:
+        if not os.path.exists(file_path):
+            return
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Обірваний останній запис після аварійного завершення.
+                    break
+
+
+def log_path_for(file_path: str) -> str:
+    return os.path.splitext(file_path)[0] + ".wal"
+
+
+SHARED_VERSION = struct.Struct('<QQ')
+
+
+class SharedState:
+    # Файли, через які кілька процесів-воркерів працюють з однією базою: .lock захоплюється
+    # на час запису, а .ver містить номер останнього записаного в журнал запису і номер,
+    # до якого журнал було стиснено після знімка.
+    def __init__(self, file_path: str):
+        if fcntl is None:
+            raise RuntimeError("Спільний доступ кількох процесів до бази підтримується лише в POSIX-системах.")
+        self.file_path = file_path
+        base = os.path.splitext(file_path)[0]
+        self.lock_file = open(base + ".lock", 'a+b')
+        with open(base + ".ver", 'a+b') as f:
+            if os.fstat(f.fileno()).st_size < SHARED_VERSION.size:
+                f.truncate(SHARED_VERSION.size)
+            self.version = mmap.mmap(f.fileno(), SHARED_VERSION.size)
+
+    def acquire(self) -> None:
+        fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX)
+
+    def release(self) -> None:
+        fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def read_version(self) -> tuple[int, int]:
+        return SHARED_VERSION.unpack_from(self.version)
+
+    def write_version(self, base: int, seq: int) -> None:
+        SHARED_VERSION.pack_into(self.version, 0, base, seq)
+
+
+class SharedLock(ReadWriteLock):
+    # Найзовнішніше захоплення на запис додатково бере файлове блокування і підтягує
+    # зміни інших процесів, а звільнення дописує журнал і публікує нову версію.
+    def __init__(self, database: 'Database'):
+        super().__init__()
+        self.database = database
+        self.shared = False
+
+    def acquire_write(self, shared: bool = True) -> None:
+        super().acquire_write()
+        if shared and self.write_depth == 1:
+            try:
+                self.database.enter_shared_write()
+            except BaseException:
+                super().release_write()
+                raise
+            self.shared = True
+
+    def release_write(self) -> None:
+        if self.write_depth == 1 and self.shared:
+            self.shared = False
+            try:
+                self.database.exit_shared_write()
+            finally:
+                super().release_write()
+        else:
+            super().release_write()
+
+    @contextmanager
+    def local_write(self) -> Iterator[None]:
+        self.acquire_write(shared=False)
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+SNAPSHOT_SUFFIX = ".wdb"
+SNAPSHOT_MAGIC = b"WDBS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<4sBB')
+SNAPSHOT_COMPRESSED = 1
+SNAPSHOT_BIG_ENDIAN = 2
+SNAPSHOT_NEEDS_CLEANUP = 0x80
+SNAPSHOT_TYPES = (Type.integer, Type.real, Type.char, Type.string, Type.time, Type.timeInvl)
+SNAPSHOT_STORAGES = (Storage.row, Storage.columnar)
+SNAPSHOT_INDEX_KINDS = (IndexKind.hash, IndexKind.sorted, IndexKind.interval)
+ARRAY_FAMILIES = ('bhilq', 'BHILQ', 'fd')
+NIL_UUID = bytes(16)
+COLUMN_BUFFERED = 0
+COLUMN_JSON = 1
+
+
+def is_binary_snapshot(file_path: str) -> bool:
+    return file_path.endswith(SNAPSHOT_SUFFIX)
+
+
+def load_array(typecode: str, stored_typecode: str, itemsize: int, data: Any, swap: bool) -> array:
+    stored = array(stored_typecode)
+    if stored.itemsize != itemsize:
+        # Розмір 'l'/'L' залежить від платформи: беремо код того ж роду з потрібним розміром.
+        family = next(family for family in ARRAY_FAMILIES if stored_typecode in family)
+        stored = array(next(code for code in family if array(code).itemsize == itemsize))
+    stored.frombytes(data)
+    if swap:
+        stored.byteswap()
+    return stored if stored.typecode == typecode else array(typecode, stored)
+
+
+def pack_column(values: List[Any], col_type: Type) -> Optional[ColumnBuffer]:
+    buffer = COLUMN_BUFFERS[col_type](len(values))
+    try:
+        for slot, value in enumerate(values):
+            if value is not None:
+                buffer.set(slot, buffer.encode(value))
+    except (OverflowError, ValueError, TypeError, AttributeError):
+        return None
+    return buffer
+
+
+class SnapshotWriter:
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def u8(self, value: int) -> None:
+        self.chunks.append(struct.pack('<B', value))
+
+    def u32(self, value: int) -> None:
+        self.chunks.append(struct.pack('<I', value))
+
+    def u64(self, value: int) -> None:
+        self.chunks.append(struct.pack('<Q', value))
+
+    def raw(self, data: bytes) -> None:
+        self.chunks.append(data)
+
+    def text(self, value: str) -> None:
+        data = value.encode('utf-8')
+        self.u32(len(data))
+        self.raw(data)
+
+    def part(self, data: Any) -> None:
+        if isinstance(data, array):
+            typecode, itemsize, data = data.typecode, data.itemsize, data.tobytes()
+        else:
+            typecode, itemsize, data = 'B', 1, bytes(data)
+        self.chunks.append(struct.pack('<cBQ', typecode.encode('ascii'), itemsize, len(data)))
+        self.chunks.append(data)
+
+
+class SnapshotReader:
+    def __init__(self, view: memoryview, swap: bool = False):
+        self.view = view
+        self.swap = swap
+        self.pos = 0
+
+    def _unpack(self, fmt: str) -> tuple:
+        values = struct.unpack_from(fmt, self.view, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return values
+
+    def u8(self) -> int:
+        return self._unpack('<B')[0]
+
+    def u32(self) -> int:
+        return self._unpack('<I')[0]
+
+    def u64(self) -> int:
+        return self._unpack('<Q')[0]
+
+    def raw(self, size: int) -> bytes:
+        data = bytes(self.view[self.pos:self.pos + size])
+        self.pos += size
+        return data
+
+    def text(self) -> str:
+        return self.raw(self.u32()).decode('utf-8')
+
+    def part(self, template: Any) -> Any:
+        typecode, itemsize, size = self._unpack('<cBQ')
+        data = self.view[self.pos:self.pos + size]
+        self.pos += size
+        try:
+            if isinstance(template, array):
+                return load_array(template.typecode, typecode.decode('ascii'), itemsize, data, self.swap)
+            return bytearray(data)
+        finally:
+            data.release()
+
+
+# Спільний для всіх таблиць і баз лічильник: версія однозначно визначає стан навіть після
+# видалення і повторного створення таблиці з тією самою назвою.
+VERSIONS = itertools.count(1)
+
+RETIRED_COLUMNS = itertools.count(1)
+COLUMN_IDS = itertools.count(1)
+
+CHANGE_JOURNAL_SIZE = 100000
+# Операції, після яких значення рядків змінюються без окремих записів про кожен рядок.
+JOURNAL_RESETS = {"reload", "restore_column", "change_column_type"}
+
 
-        self.values = demo_row.values
-        return True
+class ChangeJournal:
+    # Журнал змін рядків таблиці для поступової синхронізації. Для кожного рядка зберігається лише
+    # номер його останньої зміни: значення читаються з таблиці під час запиту, а відсутній рядок
+    # означає видалення. Курсор містить епоху журналу, тож після перезапуску процесу чи
+    # перезавантаження таблиці клієнт із давнім курсором отримує вимогу повної синхронізації.
+    def __init__(self, max_entries: int = CHANGE_JOURNAL_SIZE):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.floor = 0
+        self.max_entries = max_entries
+        self.entries: OrderedDict[uuid.UUID, int] = OrderedDict()
 
-    def validate_cell(self, value: Any, col_type: Type) -> Any:
-        def is_valid_time_format(time_str):
-            pattern = r'^\d{1,3}:\d{2}:\d{2}$'
-            match = re.match(pattern, time_str)
-            if not match:
-                raise ValueError
-            hours, minutes, seconds = map(int, time_str.split(':'))
-            if 0 <= minutes < 60 and 0 <= seconds < 60:
-                return value
-            raise ValueError
-
-        def time_to_seconds(time_str):
-            hours, minutes, seconds = map(int, time_str.split(':'))
-            return hours * 3600 + minutes * 60 + seconds
+    def touch(self, row_id: uuid.UUID) -> None:
+        self.seq += 1
+        self.entries.pop(row_id, None)
+        self.entries[row_id] = self.seq
+        if len(self.entries) > self.max_entries:
+            # Найдавніша зміна витісняється: курсори, старші за неї, вже не можуть бути продовжені.
+            self.floor = self.entries.popitem(last=False)[1]
 
-        if value is None:
-            return value
+    def advance(self) -> None:
+        self.seq += 1
 
-        if col_type == Type.integer:
-            return int(value)
-        elif col_type == Type.real:
-            return float(value)
-        elif col_type == Type.char:
-            if len(value) != 1:
-                raise ValueError
-        elif col_type == Type.time:
-            if not is_valid_time_format(value):
-                raise ValueError
-        elif col_type == Type.timeInvl:
-            value = str(value)
-            values = value.split('-')
-            if not is_valid_time_format(values[0]) or not is_valid_time_format(values[1]):
-                raise ValueError
-            time1_seconds = time_to_seconds(values[0])
-            time2_seconds = time_to_seconds(values[1])
-            sub = time2_seconds - time1_seconds
-            if sub < 0:
-                raise ValueError
-        elif col_type == Type.string:
-            value = str(value)
-        return value
+    def reset(self) -> None:
+        # Зміна, що зачіпає значення всіх рядків, не виражається змінами окремих рядків.
+        self.seq += 1
+        self.floor = self.seq
+        self.entries.clear()
 
-    def validate_row(self) -> List[str]:
-        invalid_col_values = []
-        for key, value in self.values.items():
-            col_type = self.column_types[key]
-            try:
-                converted_type_value = self.validate_cell(value, col_type)
-                self.values[key] = converted_type_value
-            except ValueError:
-                invalid_col_values.append(key)
-        return invalid_col_values
+    def cursor(self, seq: Optional[int] = None) -> str:
+        return f"{self.epoch}-{self.seq if seq is None else seq}"
+
+    def since(self, cursor: str) -> Optional[List[tuple[uuid.UUID, int]]]:
+        epoch, _, seq = cursor.rpartition('-')
+        try:
+            seq = int(seq)
+        except ValueError:
+            raise ValueError("Некоректний курсор змін.")
+        if epoch != self.epoch or not self.floor <= seq <= self.seq:
+            return None
+        changes = []
+        for row_id, changed in reversed(self.entries.items()):
+            if changed <= seq:
+                break
+            changes.append((row_id, changed))
+        changes.reverse()
+        return changes
+
+
+class RowOrder:
+    # Порядок вставки рядків для сторінок без сортування: позиція рядка дозволяє почати сторінку
+    # одразу після курсора, не перебираючи таблицю. Видалені рядки лишають порожні місця, які
+    # прибираються, коли їх стає більше за половину.
+    def __init__(self, row_ids: Iterable[uuid.UUID]):
+        self.row_ids: List[Optional[uuid.UUID]] = list(row_ids)
+        self.positions = {row_id: position for position, row_id in enumerate(self.row_ids)}
+        self.holes = 0
+
+    def append(self, row_id: uuid.UUID) -> None:
+        if row_id not in self.positions:
+            self.positions[row_id] = len(self.row_ids)
+            self.row_ids.append(row_id)
+
+    def remove(self, row_id: uuid.UUID) -> None:
+        position = self.positions.pop(row_id, None)
+        if position is None:
+            return
+        self.row_ids[position] = None
+        self.holes += 1
+        if self.holes > len(self.row_ids) // 2:
+            # Новий список замість стиснення на місці: сторінки, що вже читаються, дочитують старий.
+            self.row_ids = [row_id for row_id in self.row_ids if row_id is not None]
+            self.positions = {row_id: position for position, row_id in enumerate(self.row_ids)}
+            self.holes = 0
+
+    def after(self, row_id: Optional[uuid.UUID] = None) -> Iterator[uuid.UUID]:
+        row_ids = self.row_ids
+        position = 0 if row_id is None else self.positions[row_id] + 1
+        while position < len(row_ids):
+            if row_ids[position] is not None:
+                yield row_ids[position]
+            position += 1
 
 
 class Table:
-    def __init__(self, name: str):
+    def __init__(self, name: str, storage: Storage = Storage.row):
         self.name = name
+        self.storage = storage
+        self.version = next(VERSIONS)
         self.columns: dict[str, Type] = {}
-        self.rows: dict[uuid.UUID, Row] = {}
+        self.schema = Schema(self.columns)
+        self.rows: MutableMapping[uuid.UUID, Row] = {} if storage == Storage.row else ColumnStore(self.schema)
+        self.indexes: dict[str, dict[IndexKind, Any]] = {}
+        self.validators: dict[str, Callable[[Any], Any]] = {}
+        self.schema_version = 0
+        self.dropped: dict[str, Optional[ColumnBuffer]] = {}
+        # Новий ідентифікатор отримує кожна додана або відновлена колонка, тож фонове завдання
+        # помічає, що колонку з тією самою назвою видалили і створили знову.
+        self.column_ids: dict[str, int] = {}
+        self.needs_cleanup = False
+        self.watchers: List[set[uuid.UUID]] = []
+        self.on_change: Optional[Callable[[dict[str, Any]], None]] = None
+        self.on_schema_change: Optional[Callable[['Table'], None]] = None
+        self.journal = ChangeJournal()
+        # Будується під час першого запиту сторінки без сортування.
+        self.order: Optional[RowOrder] = None
+
+    def _log(self, entry: dict[str, Any], row_id: Optional[uuid.UUID] = None) -> None:
+        self.version = next(VERSIONS)
+        if row_id is not None:
+            self.journal.touch(row_id)
+        elif entry["op"] in JOURNAL_RESETS:
+            self.journal.reset()
+        else:
+            self.journal.advance()
+        if self.on_change is not None:
+            entry["table"] = self.name
+            self.on_change(entry)
 
-    def add_row(self, data: dict[str, Any]) -> bool:
-        new_row = Row()
-        new_row.column_types = self.columns
+    def add_row(self, data: dict[str, Any], row_id: Optional[uuid.UUID] = None) -> bool:
+        new_row = Row(self.schema, row_id=row_id)
         if not self.columns:
             raise AttributeError("Неможливо створити рядок. Будь ласка, створіть принаймні одну колонку.")
 
@@ -168,60 +1449,923 @@ class Table:
             raise ValueError("Усі поля порожні. Введіть, будь ласка, дані.")
 
         new_row.values = data
-        invalid_columns = new_row.validate_row()
+        invalid_columns = new_row.validate_row(self.validators)
+        ROWS_VALIDATED.inc(op="add_row")
         if invalid_columns:
             raise ValidError(invalid_columns)
         self.rows[new_row.id] = new_row
+        if self.order is not None:
+            self.order.append(new_row.id)
+        self._index_row(new_row.id, new_row)
+        for watcher in self.watchers:
+            watcher.add(new_row.id)
+        self._log({"op": "add_row", "row_id": str(new_row.id), "values": new_row.values}, new_row.id)
+        return True
+
+    def edit_row(self, row_id: uuid.UUID, data: dict[str, Any]) -> bool:
+        row = self.rows[row_id]
+        old_keys = self._index_keys(row)
+        ROWS_VALIDATED.inc(op="edit_row")
+        if not row.edit_row(data, self.validators):
+            return False
+        self._unindex_row(row_id, old_keys)
+        self._index_row(row_id, self.rows[row_id])
+        for watcher in self.watchers:
+            watcher.add(row_id)
+        self._log({"op": "edit_row", "row_id": str(row_id), "values": row.values}, row_id)
+        return True
+
+    def row_values(self, row: Row) -> dict[str, Any]:
+        return {col: row.value(col) for col in self.columns}
+
+    def memory_usage(self, sample_size: int = 64) -> int:
+        if isinstance(self.rows, ColumnStore):
+            return (self.rows.nbytes() + sys.getsizeof(self.rows.slots) + sys.getsizeof(self.rows.slot_ids)
+                    + 16 * len(self.rows.slots))
+        # Для рядкового сховища оцінка екстраполює розмір перших рядків на всю таблицю.
+        if not self.rows:
+            return sys.getsizeof(self.rows)
+        sample = list(itertools.islice(self.rows.values(), sample_size))
+        per_row = sum(sys.getsizeof(row) + sys.getsizeof(row.cells)
+                      + sum(sys.getsizeof(value) for value in row.cells if value is not None)
+                      for row in sample) / len(sample)
+        return sys.getsizeof(self.rows) + int(per_row * len(self.rows)) + 16 * len(self.rows)
+
+    def delete_row(self, row_id: uuid.UUID) -> bool:
+        self._unindex_row(row_id, self._index_keys(self.rows[row_id]))
+        del self.rows[row_id]
+        if self.order is not None:
+            self.order.remove(row_id)
+        self._log({"op": "delete_row", "row_id": str(row_id)}, row_id)
         return True
 
+    def row_state(self, row_id: uuid.UUID) -> Any:
+        # Комірки рядка разом зі значеннями видалених колонок, які ще не прибрано: за ними restore_row
+        # повертає рядок без перевірки значень, як під час скасування пакета.
+        if isinstance(self.rows, ColumnStore):
+            slot = self.rows.slots[row_id]
+            return slot, {name: buffer.key(slot) for name, buffer in self.rows.buffers.items()}
+        return self.rows[row_id].cells
+
+    def restore_row(self, row_id: uuid.UUID, state: Any) -> None:
+        existed = row_id in self.rows
+        if existed:
+            self._unindex_row(row_id, self._index_keys(self.rows[row_id]))
+        if isinstance(self.rows, ColumnStore):
+            self.rows.restore_slot(row_id, *state)
+        elif existed:
+            self.rows[row_id].cells = state
+        else:
+            self.rows[row_id] = Row(self.schema, state, row_id)
+        row = self.rows[row_id]
+        if not existed and self.order is not None:
+            self.order.append(row_id)
+        self._index_row(row_id, row)
+        for watcher in self.watchers:
+            watcher.add(row_id)
+        self._log({"op": "edit_row" if existed else "add_row", "row_id": str(row_id), "values": row.values}, row_id)
+
+    def import_rows(self, records: Iterable[tuple[int, Any]], batch_size: int = 10000,
+                    max_errors: int = 1000) -> tuple[int, int, List[dict[str, Any]]]:
+        if not self.columns:
+            raise AttributeError("Неможливо створити рядок. Будь ласка, створіть принаймні одну колонку.")
+        # Рядки не записуються в журнал: викликач зберігає знімок один раз після імпорту,
+        # а в журнал потрапляє лише позначка, за якою інші процеси й глядачі перечитують таблицю.
+        imported = 0
+        total = 0
+        errors = []
+        batch = []
+        for record in records:
+            batch.append(record)
+            total += 1
+            if len(batch) >= batch_size:
+                imported += self._import_batch(batch, errors, max_errors)
+                batch = []
+        if batch:
+            imported += self._import_batch(batch, errors, max_errors)
+        if imported:
+            self._log({"op": "reload"})
+        return imported, total - imported, errors
+
+    def _import_batch(self, batch: List[tuple[int, Any]], errors: List[dict[str, Any]], max_errors: int) -> int:
+        def report(line: int, detail: str) -> None:
+            if len(errors) < max_errors:
+                errors.append({"line": line, "detail": detail})
+
+        lines = []
+        records = []
+        for line, data in batch:
+            if not isinstance(data, dict):
+                report(line, "Некоректний формат рядка.")
+                continue
+            unknown = [key for key in data if key not in self.columns]
+            if unknown:
+                report(line, f"Колонка '{unknown[0]}' не знайдена у таблиці.")
+                continue
+            lines.append(line)
+            records.append(data)
+
+        converted = {col: convert_column([data.get(col) for data in records], col_type)
+                     for col, col_type in self.columns.items()}
+        ROWS_VALIDATED.inc(len(records), op="import")
+        imported = 0
+        for i, line in enumerate(lines):
+            values = {col: column[i] for col, column in converted.items()}
+            invalid_columns = [col for col, value in values.items() if value is INVALID]
+            if invalid_columns:
+                report(line, ValidError(invalid_columns).message)
+                continue
+            if all(value is None for value in values.values()):
+                report(line, "Усі поля порожні. Введіть, будь ласка, дані.")
+                continue
+            row = Row(self.schema)
+            row.values = values
+            try:
+                self.rows[row.id] = row
+            except ValidError as e:
+                report(line, e.message)
+                continue
+            if self.order is not None:
+                self.order.append(row.id)
+            self._index_row(row.id, row)
+            for watcher in self.watchers:
+                watcher.add(row.id)
+            imported += 1
+        return imported
+
     def add_column(self, column_name: str, column_type: Type) -> bool:
         if column_name is None or not column_name.strip():
             raise ValueError("Колонка повинна мати назву. Будь ласка, спробуйте ще раз.")
         if column_name not in self.columns:
+            if column_name in self.dropped:
+                self._retire_dropped(column_name)
+            # Рядки не змінюються: відсутнє значення нової колонки читається як None.
             self.columns[column_name] = column_type
-            for row in self.rows.values():
-                row.column_types[column_name] = column_type
-                row.values[column_name] = None
+            self.column_ids[column_name] = next(COLUMN_IDS)
+            self.schema.add(column_name)
+            if isinstance(self.rows, ColumnStore):
+                self.rows.add_column(column_name, column_type)
         else:
             raise ValueError("Колонка з такою назвою вже існує.")
+        self.validators = compile_validators(self.columns)
+        self.schema_version += 1
+        self._log({"op": "add_column", "column": column_name, "type": column_type.name})
         return True
 
     def delete_column(self, col_name: str) -> bool:
         if col_name in self.columns:
             del self.columns[col_name]
-            rows_to_delete = []
-
-            for row_id, row in self.rows.items():
-                if col_name in row.values:
-                    del row.values[col_name]
-                row.column_types = self.columns
-
-                if all(value is None for value in row.values.values()):
-                    rows_to_delete.append(row_id)
-
-            for row_id in rows_to_delete:
-                del self.rows[row_id]
+            self.column_ids.pop(col_name, None)
+            self.schema.drop(col_name)
+            self.validators = compile_validators(self.columns)
+            self.indexes.pop(col_name, None)
+            # Старі значення і рядки, що стали порожніми, прибирає фонове завдання (cleanup_rows).
+            self.dropped[col_name] = self.rows.delete_column(col_name) if isinstance(self.rows, ColumnStore) else None
+            self.needs_cleanup = True
+            self.schema_version += 1
+            self._log({"op": "delete_column", "column": col_name})
+            if self.on_schema_change is not None:
+                self.on_schema_change(self)
             return True
         else:
             print(f"Колонка '{col_name}' не знайдена.")
             return False
 
-    def table_difference(self, table2: 'Table') -> List[Row]:
+    def restore_column(self, column_name: str, column_type: Type, order: List[str]) -> None:
+        buffer = self.dropped.pop(column_name)
+        self.columns[column_name] = column_type
+        self.column_ids[column_name] = next(COLUMN_IDS)
+        self.schema.restore(column_name)
+        if isinstance(self.rows, ColumnStore):
+            self.rows.buffers[column_name] = buffer
+        self.reorder_columns(order)
+        self.schema_version += 1
+        self._log({"op": "restore_column", "column": column_name, "type": column_type.name, "order": order})
+
+    def _retire_dropped(self, column_name: str) -> None:
+        # Значення видаленої колонки, назву якої знову зайнято, лишаються під прихованим ім'ям, доки
+        # їх не прибере фонове завдання: скасування пакета може повернути їх (revive_dropped).
+        hidden = f"{column_name}\0{next(RETIRED_COLUMNS)}"
+        self.dropped[hidden] = self.dropped.pop(column_name)
+        self.schema.dropped[hidden] = self.schema.dropped.pop(column_name)
+
+    def revive_dropped(self, column_name: str) -> None:
+        prefix = column_name + "\0"
+        hidden = next((key for key in reversed(self.dropped) if key.startswith(prefix)), None)
+        if hidden is None:
+            return
+        self._retire_dropped(column_name)
+        self.dropped[column_name] = self.dropped.pop(hidden)
+        self.schema.dropped[column_name] = self.schema.dropped.pop(hidden)
+
+    def cleanup_rows(self, row_ids: Iterable[uuid.UUID]) -> int:
+        deleted = 0
+        for row_id in row_ids:
+            row = self.rows.get(row_id)
+            if row is None:
+                continue
+            if self.dropped and not isinstance(self.rows, ColumnStore):
+                for position in self.schema.dropped.values():
+                    row.set_cell(position, None)
+            if all(row.value(col) is None for col in self.columns):
+                self.delete_row(row_id)
+                deleted += 1
+        return deleted
+
+    def finish_cleanup(self) -> None:
+        for col_name in self.dropped:
+            self.schema.release(col_name)
+        self.dropped.clear()
+        self.needs_cleanup = False
+
+    def convert_values(self, column_name: str, column_type: Type,
+                       row_ids: Iterable[uuid.UUID], converted: dict[uuid.UUID, Any]) -> List[uuid.UUID]:
+        encoder = COLUMN_BUFFERS[column_type]() if isinstance(self.rows, ColumnStore) else None
+        invalid = []
+        for row_id in row_ids:
+            row = self.rows.get(row_id)
+            if row is None:
+                converted.pop(row_id, None)
+                continue
+            value = row.value(column_name)
+            if value is None:
+                converted.pop(row_id, None)
+                continue
+            try:
+                value = VALIDATORS[column_type](value if isinstance(value, str) else str(value))
+                if encoder is not None:
+                    encoder.encode(value)
+            except (ValueError, TypeError, OverflowError):
+                converted.pop(row_id, None)
+                invalid.append(row_id)
+                continue
+            converted[row_id] = value
+        return invalid
+
+    def change_column_type(self, column_name: str, column_type: Type,
+                           converted: Optional[dict[uuid.UUID, Any]] = None) -> bool:
+        if column_name not in self.columns:
+            raise ValueError(f"Колонка '{column_name}' не знайдена.")
+        if converted is None:
+            converted = {}
+            invalid = self.convert_values(column_name, column_type, list(self.rows), converted)
+            if invalid:
+                raise ValidError([column_name])
+
+        if isinstance(self.rows, ColumnStore):
+            buffer = COLUMN_BUFFERS[column_type]()
+            for row_id, value in converted.items():
+                slot = self.rows.slots.get(row_id)
+                if slot is not None:
+                    buffer.set(slot, buffer.encode(value))
+            self.rows.buffers[column_name] = buffer
+        else:
+            position = self.schema.positions[column_name]
+            for row_id, row in self.rows.items():
+                row.set_cell(position, converted.get(row_id))
+        self.columns[column_name] = column_type
+        self.validators = compile_validators(self.columns)
+        self.schema_version += 1
+        for kind in list(self.indexes.pop(column_name, {})):
+            if column_type in INDEX_COLUMN_TYPES[kind]:
+                self._build_index(column_name, kind)
+        self._log({"op": "change_column_type", "column": column_name, "type": column_type.name})
+        return True
+
+    def reorder_columns(self, order: List[str]) -> None:
+        columns = {col: self.columns[col] for col in order}
+        self.columns.clear()
+        self.columns.update(columns)
+        self.validators = compile_validators(self.columns)
+        if isinstance(self.rows, ColumnStore):
+            self.rows.buffers = {col: self.rows.buffers[col] for col in order}
+
+    def _index_keys(self, row: Row) -> dict[str, Any]:
+        return {col: row.key(col) for col in self.indexes}
+
+    def _index_row(self, row_id: uuid.UUID, row: Row) -> None:
+        for col, key in self._index_keys(row).items():
+            if key is not None:
+                for index in self.indexes[col].values():
+                    index.insert(row_id, key)
+
+    def _unindex_row(self, row_id: uuid.UUID, keys: dict[str, Any]) -> None:
+        for col, key in keys.items():
+            if key is not None:
+                for index in self.indexes[col].values():
+                    index.remove(row_id, key)
+
+    def create_index(self, column_name: str, kind: IndexKind) -> bool:
+        if column_name not in self.columns:
+            raise ValueError(f"Колонка '{column_name}' не знайдена.")
+        col_type = self.columns[column_name]
+        if col_type not in INDEX_COLUMN_TYPES[kind]:
+            raise ValueError(f"Індекс '{kind.value}' не підтримується для колонок типу '{col_type.value}'.")
+        if kind in self.indexes.get(column_name, {}):
+            raise ValueError("Такий індекс уже існує.")
+
+        self._build_index(column_name, kind)
+        self._log({"op": "create_index", "column": column_name, "index": kind.value})
+        return True
+
+    def _build_index(self, column_name: str, kind: IndexKind) -> None:
+        index = INDEX_CLASSES[kind]()
+        index.load((row_id, key) for row_id, row in self.rows.items() if (key := row.key(column_name)) is not None)
+        self.indexes.setdefault(column_name, {})[kind] = index
+
+    def drop_index(self, column_name: str, kind: IndexKind) -> bool:
+        if kind not in self.indexes.get(column_name, {}):
+            raise ValueError("Такого індексу не існує.")
+        del self.indexes[column_name][kind]
+        if not self.indexes[column_name]:
+            del self.indexes[column_name]
+        self._log({"op": "drop_index", "column": column_name, "index": kind.value})
+        return True
+
+    def _filter_key(self, value: Any, col_type: Type, op: FilterOp) -> Any:
+        if value is None or (isinstance(value, str) and not value.strip()):
+            raise ValueError("Вкажіть значення для фільтра.")
+        if isinstance(value, str):
+            value = value.strip()
+        if col_type == Type.timeInvl and op == FilterOp.contains and '-' not in str(value):
+            seconds = parse_time(value)
+            return seconds, seconds
+        return VALIDATORS[col_type](value)
+
+    def _filter_bounds(self, column_name: str, op: FilterOp, value: Any, value2: Any = None) -> tuple[Type, Any, Any]:
+        if column_name not in self.columns:
+            raise ValueError(f"Колонка '{column_name}' не знайдена.")
+        col_type = self.columns[column_name]
+        if op in (FilterOp.overlaps, FilterOp.contains) and col_type != Type.timeInvl:
+            raise ValueError("Умови overlaps та contains підтримуються лише для колонок типу timeInvl.")
+        low = self._filter_key(value, col_type, op)
+        high = self._filter_key(value2, col_type, op) if op == FilterOp.between else low
+        return col_type, low, high
+
+    def _index_candidates(self, column_name: str, op: FilterOp, low: Any, high: Any) -> Optional[Iterable[uuid.UUID]]:
+        indexes = self.indexes.get(column_name, {})
+        if op == FilterOp.eq and IndexKind.hash in indexes:
+            return indexes[IndexKind.hash].lookup(low)
+        if op in (FilterOp.eq, FilterOp.lt, FilterOp.le, FilterOp.gt, FilterOp.ge, FilterOp.between) \
+                and IndexKind.sorted in indexes:
+            sorted_index = indexes[IndexKind.sorted]
+            if op in (FilterOp.lt, FilterOp.le):
+                return sorted_index.range(high=low, high_inclusive=op == FilterOp.le)
+            if op in (FilterOp.gt, FilterOp.ge):
+                return sorted_index.range(low=low, low_inclusive=op == FilterOp.ge)
+            return sorted_index.range(low, high)
+        if op == FilterOp.overlaps and IndexKind.interval in indexes:
+            return indexes[IndexKind.interval].overlapping(low[0], high[1])
+        if op == FilterOp.contains and IndexKind.interval in indexes:
+            return indexes[IndexKind.interval].containing(low[0], high[1])
+        return None
+
+    def missing_interval_index(self, column_name: str, op: FilterOp) -> bool:
+        return op in (FilterOp.overlaps, FilterOp.contains) and self.columns.get(column_name) == Type.timeInvl \
+            and IndexKind.interval not in self.indexes.get(column_name, {})
+
+    def filter_rows(self, column_name: str, op: FilterOp, value: Any, value2: Any = None) -> Iterator[Row]:
+        col_type, low, high = self._filter_bounds(column_name, op, value, value2)
+        candidates = self._index_candidates(column_name, op, low, high)
+        predicate = FILTER_PREDICATES[op]
+        rows = self.iter_rows() if candidates is None else filter(None, map(self.rows.get, candidates))
+        return (row for row in rows
+                if (key := row.key(column_name)) is not None and predicate(key, low, high))
+
+    def iter_rows(self) -> Iterator[Row]:
+        for row_id in list(self.rows):
+            row = self.rows.get(row_id)
+            if row is not None:
+                yield row
+
+    def sort_key(self, row: Row, column_name: str) -> tuple:
+        key = row.key(column_name)
+        return key is None, key, row.id
+
+    def page_rows(self, limit: Optional[int] = None, after: Optional[uuid.UUID] = None,
+                  sort_by: Optional[str] = None) -> Iterator[Row]:
+        if sort_by is not None and sort_by not in self.columns:
+            raise ValueError(f"Колонка '{sort_by}' не знайдена.")
+        if after is not None and after not in self.rows:
+            raise KeyError(after)
+
+        if sort_by is None:
+            if self.order is None:
+                self.order = RowOrder(self.rows)
+            rows = map(self.rows.get, self.order.after(after))
+            return itertools.islice((row for row in rows if row is not None), limit)
+
+        cursor = self.sort_key(self.rows[after], sort_by) if after is not None else None
+        indexes = self.indexes.get(sort_by, {})
+        sorted_index = indexes.get(IndexKind.sorted, indexes.get(IndexKind.interval))
+        if sorted_index is None:
+            rows = (row for row in self.rows.values() if cursor is None or self.sort_key(row, sort_by) > cursor)
+            if limit is None:
+                return iter(sorted(rows, key=lambda row: self.sort_key(row, sort_by)))
+            return iter(heapq.nsmallest(limit, rows, key=lambda row: self.sort_key(row, sort_by)))
+
+        def indexed_rows() -> Iterator[Row]:
+            null_cursor = cursor
+            if cursor is None or not cursor[0]:
+                row_ids = sorted_index.after(cursor[1], cursor[2]) if cursor is not None else sorted_index.after()
+                for row_id in row_ids:
+                    row = self.rows.get(row_id)
+                    if row is not None:
+                        yield row
+                null_cursor = None
+            nulls = (row for row in self.iter_rows()
+                     if row.key(sort_by) is None and (null_cursor is None or row.id > null_cursor[2]))
+            yield from sorted(nulls, key=lambda row: row.id)
+
+        return itertools.islice(indexed_rows(), limit)
+
+    def row_key(self, row: Row, columns: List[str]) -> tuple:
+        return tuple(row.key(col) for col in columns)
+
+    def row_keys(self, columns: List[str]) -> set[tuple]:
+        return {self.row_key(row, columns) for row in self.rows.values()}
+
+    def _check_same_columns(self, table2: 'Table', same_table_message: str) -> List[str]:
         if self.columns != table2.columns:
             raise ValueError("Таблиці мають різні колонки. Оберіть інші таблиці.")
         if self.name == table2.name:
-            raise ValueError("Ви обрали одну таблицю. Будь ласка, оберіть різні, щоб отримати їх різницю.")
-
-        result_list = []
-        for id1, row1 in self.rows.items():
-            is_in_table = False
-            for id2, row2 in table2.rows.items():
-                if row1.values == row2.values:
-                    is_in_table = True
-                    break
-            if not is_in_table:
-                result_list.append(row1)
-        return result_list
+            raise ValueError(same_table_message)
+        return list(self.columns)
+
+    def table_difference(self, table2: 'Table') -> Iterator[Row]:
+        columns = self._check_same_columns(
+            table2, "Ви обрали одну таблицю. Будь ласка, оберіть різні, щоб отримати їх різницю.")
+        keys = table2.row_keys(columns)
+        return (row for row in self.iter_rows() if self.row_key(row, columns) not in keys)
+
+    def table_intersection(self, table2: 'Table') -> Iterator[Row]:
+        columns = self._check_same_columns(
+            table2, "Ви обрали одну таблицю. Будь ласка, оберіть різні, щоб отримати їх перетин.")
+        keys = table2.row_keys(columns)
+        return (row for row in self.iter_rows() if self.row_key(row, columns) in keys)
+
+    def table_union(self, table2: 'Table') -> Iterator[Row]:
+        columns = self._check_same_columns(
+            table2, "Ви обрали одну таблицю. Будь ласка, оберіть різні, щоб отримати їх об'єднання.")
+        return self._distinct(columns, self.iter_rows(), table2.iter_rows())
+
+    def distinct_rows(self) -> Iterator[Row]:
+        return self._distinct(list(self.columns), self.iter_rows())
+
+    def _distinct(self, columns: List[str], *row_sources) -> Iterator[Row]:
+        seen = set()
+        for rows in row_sources:
+            for row in rows:
+                key = self.row_key(row, columns)
+                if key not in seen:
+                    seen.add(key)
+                    yield row
+
+    def write_snapshot(self, writer: SnapshotWriter) -> None:
+        writer.text(self.name)
+        writer.u8(SNAPSHOT_STORAGES.index(self.storage) | (SNAPSHOT_NEEDS_CLEANUP if self.needs_cleanup else 0))
+        writer.u32(len(self.columns))
+        for col_name, col_type in self.columns.items():
+            writer.text(col_name)
+            writer.u8(SNAPSHOT_TYPES.index(col_type))
+        indexes = [(col_name, kind) for col_name, kinds in self.indexes.items() for kind in kinds]
+        writer.u32(len(indexes))
+        for col_name, kind in indexes:
+            writer.text(col_name)
+            writer.u8(SNAPSHOT_INDEX_KINDS.index(kind))
+        if isinstance(self.rows, ColumnStore):
+            self.rows.write_snapshot(writer)
+            return
+
+        rows = list(self.rows.values())
+        writer.u64(len(rows))
+        writer.raw(b''.join(row.id.bytes for row in rows))
+        for col_name, col_type in self.columns.items():
+            values = [row.key(col_name) for row in rows]
+            buffer = pack_column(values, col_type)
+            if buffer is None:
+                # Значення, які не вміщуються у типізований буфер без втрат
+                # (наприклад, цілі поза 64 бітами), зберігаються як JSON.
+                writer.u8(COLUMN_JSON)
+                writer.part(json.dumps(values).encode('utf-8'))
+            else:
+                writer.u8(COLUMN_BUFFERED)
+                buffer.write_snapshot(writer)
+
+    @classmethod
+    def read_snapshot(cls, reader: SnapshotReader) -> 'Table':
+        table_name = reader.text()
+        flags = reader.u8()
+        table = cls(table_name, SNAPSHOT_STORAGES[flags & ~SNAPSHOT_NEEDS_CLEANUP])
+        table.needs_cleanup = bool(flags & SNAPSHOT_NEEDS_CLEANUP)
+        for _ in range(reader.u32()):
+            col_name = reader.text()
+            table.columns[col_name] = SNAPSHOT_TYPES[reader.u8()]
+            table.schema.add(col_name)
+        table.validators = compile_validators(table.columns)
+        indexes = [(reader.text(), SNAPSHOT_INDEX_KINDS[reader.u8()]) for _ in range(reader.u32())]
+        size = reader.u64()
+        ids = reader.raw(16 * size)
+        slot_ids = [None if ids[i:i + 16] == NIL_UUID else uuid.UUID(bytes=ids[i:i + 16])
+                    for i in range(0, len(ids), 16)]
+        columns: dict[str, Any] = {}
+        for col_name, col_type in table.columns.items():
+            if reader.u8() == COLUMN_JSON:
+                columns[col_name] = json.loads(reader.part(bytearray()))
+            else:
+                columns[col_name] = COLUMN_BUFFERS[col_type]()
+                columns[col_name].read_snapshot(reader, size)
+
+        if isinstance(table.rows, ColumnStore):
+            table.rows.restore(slot_ids, columns)
+        else:
+            # Позиції колонок щойно створеної схеми збігаються з їхнім порядком, тож кортежі значень
+            # рядків збираються транспонуванням колонок без проміжних словників.
+            values = []
+            for col_name, column in columns.items():
+                if isinstance(column, list):
+                    # Знімки попередніх версій могли зберігати час та інтервали текстом у JSON.
+                    values.append([normalize_cell(value, table.columns[col_name]) for value in column])
+                else:
+                    values.append([column.key(slot) for slot in range(size)])
+            schema = table.schema
+            table.rows.update((row_id, Row(schema, cells, row_id))
+                              for row_id, cells in zip(slot_ids, zip(*values) if values else itertools.repeat(())))
+        for col_name, kind in indexes:
+            table.create_index(col_name, kind)
+        return table
+
+
+class Aggregate(Enum):
+    count = "count"
+    sum = "sum"
+    avg = "avg"
+    min = "min"
+    max = "max"
+
+
+def aggregate_value(key: Any, col_type: Type) -> Any:
+    # Час і інтервали агрегуються як тривалості в секундах.
+    if col_type == Type.timeInvl and key is not None:
+        return key[1] - key[0]
+    return key
+
+
+class Accumulator:
+    def __init__(self, func: Aggregate):
+        self.func = func
+        self.count = 0
+        self.total = 0
+        self.best = None
+
+    def add(self, value: Any) -> None:
+        if value is None:
+            return
+        self.count += 1
+        if self.func in (Aggregate.sum, Aggregate.avg):
+            self.total += value
+        elif self.func == Aggregate.min:
+            if self.best is None or value < self.best:
+                self.best = value
+        elif self.func == Aggregate.max:
+            if self.best is None or value > self.best:
+                self.best = value
+
+    def result(self) -> Any:
+        if self.func == Aggregate.count:
+            return self.count
+        if not self.count:
+            return None
+        if self.func == Aggregate.sum:
+            return self.total
+        if self.func == Aggregate.avg:
+            return self.total / self.count
+        return self.best
+
+
+class Descending:
+    __slots__ = ('key',)
+
+    def __init__(self, key: Any):
+        self.key = key
+
+    def __lt__(self, other: 'Descending') -> bool:
+        return other.key < self.key
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Descending) and self.key == other.key
+
+
+class Query:
+    def __init__(self, table: Table, where: Optional[dict[str, Any]] = None, select: Optional[List[str]] = None,
+                 group_by: Iterable[str] = (), aggregates: Iterable[dict[str, Any]] = (),
+                 order_by: Iterable[dict[str, Any]] = (), limit: Optional[int] = None):
+        self.table = table
+        if limit is not None and limit < 0:
+            raise ValueError("Параметр limit не може бути від'ємним.")
+        self.limit = limit
+        self.conditions = where
+        self.where = self._compile(where) if where else None
+        self.group_by = [self._column(col) for col in group_by]
+        self.aggregates = [self._aggregate(spec) for spec in aggregates]
+        self.grouped = bool(self.group_by or self.aggregates)
+
+        if self.grouped:
+            if select:
+                raise ValueError("Параметр select не використовується разом із групуванням; вкажіть group_by.")
+            self.columns = {col: table.columns[col] for col in self.group_by}
+            for name, func, col, result_type in self.aggregates:
+                if name in self.columns:
+                    raise ValueError(f"Колонка результату '{name}' повторюється.")
+                self.columns[name] = result_type
+        else:
+            self.select = [self._column(col) for col in select] if select else list(table.columns)
+            self.columns = {col: table.columns[col] for col in self.select}
+
+        sortable = self.columns if self.grouped else table.columns
+        self.order_by = []
+        for spec in order_by:
+            col = spec.get("column")
+            if col not in sortable:
+                raise ValueError(f"Колонка '{col}' не знайдена.")
+            self.order_by.append((col, bool(spec.get("desc", False))))
+
+    def _column(self, col: str) -> str:
+        if col not in self.table.columns:
+            raise ValueError(f"Колонка '{col}' не знайдена.")
+        return col
+
+    def _aggregate(self, spec: dict[str, Any]) -> tuple[str, Aggregate, Optional[str], Type]:
+        try:
+            func = Aggregate(spec.get("func"))
+        except ValueError:
+            raise ValueError(f"Невідома агрегатна функція: '{spec.get('func')}'.")
+        col = spec.get("column")
+        name = spec.get("name") or (f"{func.value}_{col}" if col else func.value)
+        if col is None:
+            if func != Aggregate.count:
+                raise ValueError(f"Агрегатна функція '{func.value}' потребує колонку.")
+            return name, func, None, Type.integer
+        col_type = self.table.columns[self._column(col)]
+        if func == Aggregate.count:
+            return name, func, col, Type.integer
+        if col_type in (Type.time, Type.timeInvl):
+            return name, func, col, Type.time
+        if func in (Aggregate.sum, Aggregate.avg):
+            if col_type not in (Type.integer, Type.real):
+                raise ValueError(f"Агрегатна функція '{func.value}' не підтримується для колонки '{col}' типу {col_type.value}.")
+            return name, func, col, Type.real if func == Aggregate.avg else col_type
+        return name, func, col, col_type
+
+    def _compile(self, node: Any) -> Callable[[Row], bool]:
+        if not isinstance(node, dict) or len(node) == 0:
+            raise ValueError("Некоректна умова запиту.")
+        if "and" in node or "or" in node:
+            combine = all if "and" in node else any
+            children = node.get("and", node.get("or"))
+            if len(node) != 1 or not isinstance(children, list) or not children:
+                raise ValueError("Некоректна умова запиту.")
+            predicates = [self._compile(child) for child in children]
+            return lambda row: combine(predicate(row) for predicate in predicates)
+        if "not" in node:
+            if len(node) != 1:
+                raise ValueError("Некоректна умова запиту.")
+            predicate = self._compile(node["not"])
+            return lambda row: not predicate(row)
+
+        op, col, low, high = self._condition(node)
+        test = FILTER_PREDICATES[op]
+        return lambda row: (key := row.key(col)) is not None and test(key, low, high)
+
+    def _condition(self, node: dict[str, Any]) -> tuple[FilterOp, str, Any, Any]:
+        try:
+            op = FilterOp(node.get("op"))
+        except ValueError:
+            raise ValueError(f"Невідома умова: '{node.get('op')}'.")
+        col = node.get("column")
+        col_type, low, high = self.table._filter_bounds(col, op, node.get("value"), node.get("value2"))
+        return op, col, low, high
+
+    def _source(self) -> Iterator[Row]:
+        # Якщо одна з умов верхнього рівня спирається на індекс, перебираються лише її кандидати;
+        # повний предикат все одно перевіряється для кожного рядка.
+        where = self.conditions
+        for node in (where.get("and", [where]) if where else []):
+            if isinstance(node, dict) and "column" in node:
+                op, col, low, high = self._condition(node)
+                candidates = self.table._index_candidates(col, op, low, high)
+                if candidates is not None:
+                    return filter(None, map(self.table.rows.get, candidates))
+        return self.table.iter_rows()
+
+    def _sort_key(self, values: List[Any]) -> tuple:
+        key = []
+        for value, (col, desc) in zip(values, self.order_by):
+            key.append(value is None)
+            key.append(Descending(value) if desc else value)
+        return tuple(key)
+
+    def _ordered(self, items: Iterable[Any], key: Callable[[Any], tuple]) -> Iterable[Any]:
+        if self.order_by:
+            if self.limit is not None:
+                return heapq.nsmallest(self.limit, items, key=key)
+            return sorted(items, key=key)
+        if self.limit is not None:
+            return itertools.islice(items, self.limit)
+        return items
+
+    def execute(self) -> Iterator[dict[str, Any]]:
+        rows = self._source()
+        if self.where is not None:
+            rows = filter(self.where, rows)
+        if self.grouped:
+            yield from self._execute_grouped(rows)
+            return
+
+        def row_key(row: Row) -> tuple:
+            values = [row.key(col) for col, desc in self.order_by]
+            return self._sort_key(values) + (row.id,)
+
+        for row in self._ordered(rows, row_key):
+            yield {"values": {col: row.value(col) for col in self.select}, "id": str(row.id)}
+
+    def _execute_grouped(self, rows: Iterable[Row]) -> Iterator[dict[str, Any]]:
+        types = self.table.columns
+        groups: dict[tuple, tuple[dict[str, Any], List[Accumulator]]] = {}
+        for row in rows:
+            key = tuple(row.key(col) for col in self.group_by)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = ({col: row.value(col) for col in self.group_by},
+                                       [Accumulator(func) for name, func, col, result_type in self.aggregates])
+            for accumulator, (name, func, col, result_type) in zip(group[1], self.aggregates):
+                accumulator.add(True if col is None else aggregate_value(row.key(col), types[col]))
+        if not groups and not self.group_by:
+            groups[()] = ({}, [Accumulator(func) for name, func, col, result_type in self.aggregates])
+
+        results = []
+        for position, (values, accumulators) in enumerate(groups.values()):
+            raw = dict(values)
+            for accumulator, (name, func, col, result_type) in zip(accumulators, self.aggregates):
+                raw[name] = accumulator.result()
+            results.append((position, raw))
+
+        def group_key(item: tuple[int, dict[str, Any]]) -> tuple:
+            position, raw = item
+            values = [normalize_cell(raw[col], types[col]) if col in self.group_by else raw[col]
+                      for col, desc in self.order_by]
+            return self._sort_key(values) + (position,)
+
+        for position, raw in self._ordered(iter(results), group_key):
+            for name, func, col, result_type in self.aggregates:
+                if result_type == Type.time and raw[name] is not None:
+                    raw[name] = seconds_to_time(round(raw[name]))
+            yield {"values": raw}
+
+
+SCHEMA_TASK_CHUNK = 5000
+MAX_FINISHED_TASKS = 100
+
+
+class SchemaTask:
+    kind = ""
+
+    def __init__(self, database: 'Database', table: Table):
+        self.id = str(uuid.uuid4())
+        self.database = database
+        self.table = table
+        self.status = "running"
+        self.error: Optional[str] = None
+        self.total = 0
+        self.done = 0
+
+    def progress(self) -> dict[str, Any]:
+        return {"id": self.id, "kind": self.kind, "table": self.table.name, "status": self.status,
+                "done": self.done, "total": self.total, "error": self.error}
+
+    def step(self) -> bool:
+        with self.database.lock.write():
+            if self.database.tables.get(self.table.name) is not self.table:
+                return self.finish("cancelled")
+            return self.run_step()
+
+    def run_step(self) -> bool:
+        raise NotImplementedError
+
+    def finish(self, status: str, error: Optional[str] = None) -> bool:
+        self.status = status
+        self.error = error
+        return True
+
+
+class CleanupTask(SchemaTask):
+    kind = "cleanup"
+
+    def __init__(self, database: 'Database', table: Table):
+        super().__init__(database, table)
+        self.row_ids: Optional[List[uuid.UUID]] = None
+        self.version = -1
+        self.deleted = 0
+
+    def progress(self) -> dict[str, Any]:
+        return {**super().progress(), "deleted": self.deleted}
+
+    def run_step(self) -> bool:
+        table = self.table
+        if self.row_ids is None:
+            self.version = table.schema_version
+            self.row_ids = list(table.rows)
+            self.total = len(self.row_ids)
+            self.done = 0
+        chunk = self.row_ids[self.done:self.done + SCHEMA_TASK_CHUNK]
+        self.deleted += table.cleanup_rows(chunk)
+        self.done += len(chunk)
+        if self.done < self.total:
+            return False
+        if table.schema_version != self.version:
+            # Схема змінилася під час проходу: уже переглянуті рядки могли отримати нові застарілі значення.
+            self.row_ids = None
+            return False
+        table.finish_cleanup()
+        return self.finish("done")
+
+
+class TypeChangeTask(SchemaTask):
+    kind = "change_column_type"
+
+    def __init__(self, database: 'Database', table: Table, column_name: str, column_type: Type):
+        super().__init__(database, table)
+        self.column_name = column_name
+        self.old_type = table.columns[column_name]
+        self.column_id = table.column_ids.get(column_name)
+        self.column_type = column_type
+        self.row_ids = list(table.rows)
+        self.total = len(self.row_ids)
+        self.converted: dict[uuid.UUID, Any] = {}
+        self.invalid: set[uuid.UUID] = set()
+        self.dirty: set[uuid.UUID] = set()
+        table.watchers.append(self.dirty)
+
+    def progress(self) -> dict[str, Any]:
+        return {**super().progress(), "column": self.column_name, "type": self.column_type.value,
+                "invalid": len(self.invalid)}
+
+    def finish(self, status: str, error: Optional[str] = None) -> bool:
+        if self.dirty in self.table.watchers:
+            self.table.watchers.remove(self.dirty)
+        self.converted = {}
+        return super().finish(status, error)
+
+    def _convert(self, row_ids: List[uuid.UUID]) -> None:
+        self.invalid.difference_update(row_ids)
+        self.invalid.update(self.table.convert_values(self.column_name, self.column_type, row_ids, self.converted))
+
+    def run_step(self) -> bool:
+        table = self.table
+        if table.columns.get(self.column_name) != self.old_type \
+                or table.column_ids.get(self.column_name) != self.column_id:
+            return self.finish("cancelled")
+        chunk = self.row_ids[self.done:self.done + SCHEMA_TASK_CHUNK]
+        self._convert(chunk)
+        self.done += len(chunk)
+        if self.done < self.total:
+            return False
+
+        # Рядки, змінені під час перетворення, перетворюються ще раз уже під блокуванням.
+        self._convert(list(self.dirty))
+        if self.invalid:
+            sample = ', '.join(str(row_id) for row_id in itertools.islice(self.invalid, 5))
+            return self.finish("failed", f"Не вдалося перетворити значення у {len(self.invalid)} рядках: {sample}.")
+        table.change_column_type(self.column_name, self.column_type, self.converted)
+        return self.finish("done")
+
+
+class TaskWorker:
+    def __init__(self):
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def submit(self, task: SchemaTask) -> None:
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name="schema-worker", daemon=True)
+                    self.thread.start()
+        self.queue.put(task)
+
+    def run(self) -> None:
+        while True:
+            task = self.queue.get()
+            try:
+                finished = task.step()
+            except Exception as e:
+                finished = task.finish("failed", str(e))
+            if not finished:
+                self.queue.put(task)
+
+
+SCHEMA_WORKER = TaskWorker()
 
 
 class Database:
@@ -230,47 +2374,557 @@ class Database:
             raise ValueError("База даних повинна мати назву. Будь ласка, спробуйте ще раз.")
         self.name = name
         self.tables: dict[str, Table] = {}
+        self.version = next(VERSIONS)
+        self.log: Optional[WriteAheadLog] = None
+        self.log_seq = 0
+        self.pending: Optional[List[dict[str, Any]]] = None
+        self.tasks: dict[str, SchemaTask] = {}
+        self.lock = ReadWriteLock()
+        self.checkpoint_lock = threading.Lock()
+        self.shared: Optional[SharedState] = None
+        self.subscribers: dict[str, List[Callable[[str], None]]] = {}
+        self.log_inode: Optional[int] = None
+        self.log_offset = 0
+        self.compacted_seq = 0
         if file:
             self.load_from_file(file)
 
-    def create_table(self, table_name: str) -> bool:
+    def _record(self, entry: dict[str, Any]) -> None:
+        if self.pending is not None:
+            self.pending.append(entry)
+            return
+        if self.log is not None:
+            self.log_seq = self.log.append(entry)
+        if self.subscribers:
+            self.publish(entry)
+
+    def subscribe(self, table_name: str, callback: Callable[[str], None]) -> None:
+        self.subscribers.setdefault(table_name, []).append(callback)
+
+    def unsubscribe(self, table_name: str, callback: Callable[[str], None]) -> None:
+        callbacks = self.subscribers.get(table_name, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            self.subscribers.pop(table_name, None)
+
+    def publish(self, entry: dict[str, Any]) -> None:
+        # Зміни пакета надсилаються окремими подіями лише після його успішного завершення.
+        if entry["op"] == "batch":
+            for nested in entry["entries"]:
+                self.publish(nested)
+            return
+        callbacks = list(self.subscribers.get(entry.get("table"), ()))
+        if not callbacks:
+            return
+        # Серіалізація відбувається одразу, під блокуванням бази, бо значення рядка можуть змінитися.
+        message = json.dumps(entry, ensure_ascii=False)
+        for callback in callbacks:
+            try:
+                callback(message)
+            except Exception as e:
+                print(f"Помилка при надсиланні змін таблиці '{entry.get('table')}': {e}")
+
+    def _attach_table(self, table: Table) -> None:
+        table.on_change = self._record
+        table.on_schema_change = self.schedule_cleanup
+        self.tables[table.name] = table
+        self.version = next(VERSIONS)
+
+    def start_task(self, task: SchemaTask) -> SchemaTask:
+        finished = [task_id for task_id, other in self.tasks.items() if other.status != "running"]
+        for task_id in finished[:max(0, len(finished) - MAX_FINISHED_TASKS)]:
+            del self.tasks[task_id]
+        self.tasks[task.id] = task
+        SCHEMA_WORKER.submit(task)
+        return task
+
+    def schedule_cleanup(self, table: Table) -> None:
+        # Завдання, що вже виконується, саме почне новий прохід, побачивши зміну версії схеми.
+        for task in self.tasks.values():
+            if isinstance(task, CleanupTask) and task.table is table and task.status == "running":
+                return
+        self.start_task(CleanupTask(self, table))
+
+    def change_column_type(self, table_name: str, column_name: str, column_type: Type) -> SchemaTask:
+        table = self.tables[table_name]
+        if column_name not in table.columns:
+            raise ValueError(f"Колонка '{column_name}' не знайдена.")
+        if table.columns[column_name] == column_type:
+            raise ValueError(f"Колонка '{column_name}' вже має тип {column_type.value}.")
+        for task in self.tasks.values():
+            if isinstance(task, TypeChangeTask) and task.table is table and task.column_name == column_name \
+                    and task.status == "running":
+                raise ValueError(f"Тип колонки '{column_name}' вже змінюється.")
+        return self.start_task(TypeChangeTask(self, table, column_name, column_type))
+
+    def create_table(self, table_name: str, storage: Storage = Storage.row) -> bool:
         if table_name is None or not table_name.strip():
             raise ValueError("Таблиця повинна мати назву. Будь ласка, спробуйте ще раз.")
         if table_name not in self.tables.keys():
-            table = Table(table_name)
-            self.tables[table_name] = table
+            table = Table(table_name, storage)
+            self._attach_table(table)
         else:
             raise ValueError("Таблиця з такою назвою вже існує.")
+        self._record({"op": "create_table", "table": table_name, "storage": storage.value})
+        return True
+
+    def delete_table(self, table_name: str) -> bool:
+        table = self.tables.pop(table_name)
+        table.on_change = None
+        self.version = next(VERSIONS)
+        self._record({"op": "delete_table", "table": table_name})
+        return True
+
+    def apply_entry(self, entry: dict[str, Any]) -> None:
+        op = entry["op"]
+        if op == "create_table":
+            self.create_table(entry["table"], Storage(entry.get("storage", Storage.row.value)))
+        elif op == "delete_table":
+            self.delete_table(entry["table"])
+        elif op == "batch":
+            for nested in entry["entries"]:
+                self.apply_entry(nested)
+        else:
+            table = self.tables[entry["table"]]
+            if op == "add_row":
+                table.add_row(entry["values"], uuid.UUID(entry["row_id"]))
+            elif op == "edit_row":
+                table.edit_row(uuid.UUID(entry["row_id"]), entry["values"])
+            elif op == "delete_row":
+                table.delete_row(uuid.UUID(entry["row_id"]))
+            elif op == "add_column":
+                table.add_column(entry["column"], Type[entry["type"]])
+            elif op == "delete_column":
+                table.delete_column(entry["column"])
+            elif op == "restore_column":
+                table.restore_column(entry["column"], Type[entry["type"]], entry["order"])
+            elif op == "change_column_type":
+                table.change_column_type(entry["column"], Type[entry["type"]])
+            elif op == "create_index":
+                table.create_index(entry["column"], IndexKind(entry["index"]))
+            elif op == "drop_index":
+                table.drop_index(entry["column"], IndexKind(entry["index"]))
+            elif op == "reload":
+                # Масові зміни без покрокового журналу вже містяться у знімку, записаному після них.
+                pass
+            else:
+                raise ValueError(f"Невідома операція журналу: '{op}'.")
+
+    def apply_batch(self, operations: List[dict[str, Any]]) -> List[Optional[str]]:
+        # Зміни пакета потрапляють у журнал одним записом лише після успіху всіх операцій;
+        # у разі помилки вже виконані операції скасовуються у зворотному порядку.
+        with self.lock.write():
+            self.pending = []
+            undo: List[Callable[[], Any]] = []
+            results: List[Optional[str]] = []
+            try:
+                for position, operation in enumerate(operations, start=1):
+                    try:
+                        action, result = self._apply_operation(dict(operation))
+                    except (ValueError, ValidError, AttributeError) as e:
+                        raise BatchError(position, e)
+                    undo.append(action)
+                    results.append(result)
+            except BaseException as error:
+                # Невдале скасування однієї операції не зупиняє решту; його помилки додаються
+                # до ланцюжка причин початкової помилки.
+                failures = []
+                try:
+                    for action in reversed(undo):
+                        try:
+                            action()
+                        except Exception as failure:
+                            failures.append(failure)
+                finally:
+                    self.pending = None
+                if failures:
+                    for failure, cause in zip(failures, failures[1:]):
+                        failure.__cause__ = cause
+                    raise error from failures[0]
+                raise
+            entries, self.pending = self.pending, None
+            if entries:
+                self._record({"op": "batch", "entries": entries})
+            return results
+
+    def _batch_table(self, entry: dict[str, Any]) -> Table:
+        table_name = entry.get("table")
+        if table_name not in self.tables:
+            raise ValueError(f"Таблиця '{table_name}' не знайдена.")
+        return self.tables[table_name]
+
+    def _batch_row(self, table: Table, entry: dict[str, Any]) -> uuid.UUID:
+        try:
+            row_id = uuid.UUID(str(entry.get("row_id")))
+        except ValueError:
+            raise ValueError("Некоректний ідентифікатор рядка.")
+        if row_id not in table.rows:
+            raise ValueError(f"Рядок '{row_id}' не знайдений.")
+        return row_id
+
+    def _batch_values(self, table: Table, entry: dict[str, Any]) -> dict[str, Any]:
+        values = entry.get("values")
+        if not isinstance(values, dict):
+            raise ValueError("Операція повинна містити значення рядка.")
+        for key in values:
+            if key not in table.columns:
+                raise ValueError(f"Колонка '{key}' не знайдена у таблиці.")
+        return dict(values)
+
+    def _apply_operation(self, entry: dict[str, Any]) -> tuple[Callable[[], Any], Optional[str]]:
+        op = entry.get("op")
+        if op == "create_table":
+            try:
+                storage = Storage(entry.get("storage", Storage.row.value))
+            except ValueError:
+                raise ValueError(f"Невідомий спосіб зберігання: '{entry.get('storage')}'.")
+            self.create_table(entry.get("table"), storage)
+            return lambda: self.delete_table(entry["table"]), None
+        table = self._batch_table(entry)
+        if op == "delete_table":
+            self.delete_table(table.name)
+            return lambda: self._attach_table(table), None
+
+        if op == "add_row":
+            values = self._batch_values(table, entry)
+            row_id = uuid.uuid4()
+            table.add_row(values, row_id)
+            return lambda: table.delete_row(row_id), str(row_id)
+        if op == "edit_row":
+            row_id = self._batch_row(table, entry)
+            values = self._batch_values(table, entry)
+            state = table.row_state(row_id)
+            table.edit_row(row_id, values)
+            return lambda: table.restore_row(row_id, state), str(row_id)
+        if op == "delete_row":
+            row_id = self._batch_row(table, entry)
+            state = table.row_state(row_id)
+            table.delete_row(row_id)
+            return lambda: table.restore_row(row_id, state), str(row_id)
+
+        if op == "add_column":
+            try:
+                column_type = Type(entry.get("type"))
+            except ValueError:
+                raise ValueError(f"Невідомий тип колонки: '{entry.get('type')}'.")
+            column_name = entry.get("column")
+            table.add_column(column_name, column_type)
+
+            def remove_column() -> None:
+                table.delete_column(column_name)
+                table.revive_dropped(column_name)
+            return remove_column, None
+        if op == "delete_column":
+            column_name = entry.get("column")
+            if column_name not in table.columns:
+                raise ValueError(f"Колонка '{column_name}' не знайдена.")
+            column_type = table.columns[column_name]
+            order = list(table.columns)
+            kinds = list(table.indexes.get(column_name, {}))
+            table.delete_column(column_name)
+
+            def restore_column() -> None:
+                table.restore_column(column_name, column_type, order)
+                for kind in kinds:
+                    table.create_index(column_name, kind)
+            return restore_column, None
+        if op == "change_column_type":
+            try:
+                column_type = Type(entry.get("type"))
+            except ValueError:
+                raise ValueError(f"Невідомий тип колонки: '{entry.get('type')}'.")
+            column_name = entry.get("column")
+            if column_name not in table.columns:
+                raise ValueError(f"Колонка '{column_name}' не знайдена.")
+            old_type = table.columns[column_name]
+            old_values = {row_id: row.key(column_name) for row_id, row in table.rows.items()}
+            table.change_column_type(column_name, column_type)
+
+            def restore_type() -> None:
+                table.change_column_type(column_name, old_type,
+                                         {row_id: value for row_id, value in old_values.items() if value is not None})
+            return restore_type, None
+
+        if op in ("create_index", "drop_index"):
+            try:
+                kind = IndexKind(entry.get("index"))
+            except ValueError:
+                raise ValueError(f"Невідомий тип індексу: '{entry.get('index')}'.")
+            if op == "create_index":
+                table.create_index(entry.get("column"), kind)
+                return lambda: table.drop_index(entry["column"], kind), None
+            table.drop_index(entry.get("column"), kind)
+            return lambda: table.create_index(entry["column"], kind), None
+        raise ValueError(f"Невідома операція: '{op}'.")
+
+    def replay_log(self, log_path: str) -> int:
+        log, self.log = self.log, None
+        replayed = 0
+        try:
+            for entry in WriteAheadLog.read(log_path):
+                if entry["seq"] <= self.log_seq:
+                    continue
+                self.apply_entry(entry)
+                self.log_seq = entry["seq"]
+                replayed += 1
+        finally:
+            self.log = log
+        return replayed
+
+    def attach_log(self, log_path: str, sync: bool = False) -> None:
+        if self.log is not None:
+            self.log.close()
+        self.log = WriteAheadLog(log_path, seq=self.log_seq, sync=sync)
+
+    def check_writable(self) -> None:
+        if self.log is not None and self.log.error is not None:
+            raise self.log.error
+
+    def detach_log(self) -> None:
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    def share(self, state: SharedState) -> None:
+        # Викликається до того, як базою почнуть користуватися інші потоки.
+        self.shared = state
+        self.lock = SharedLock(self)
+
+    def refresh(self) -> None:
+        if self.shared is None or self.shared.read_version()[1] == self.log_seq:
+            return
+        with self.lock.local_write():
+            if self.catch_up():
+                return
+        # Журнал стиснено далі, ніж цей процес встиг прочитати: потрібне повне перезавантаження.
+        with self.lock.write():
+            pass
+
+    def catch_up(self) -> bool:
+        if self.log is None:
+            return True
+        base, published = self.shared.read_version()
+        if base > self.log_seq:
+            return False
+        try:
+            f = open(self.log.file_path, 'rb')
+        except FileNotFoundError:
+            return True
+        with f:
+            inode = os.fstat(f.fileno()).st_ino
+            offset = self.log_offset if inode == self.log_inode else 0
+            tail = self._read_log_tail(f, offset, published)
+            if tail is None and offset:
+                # Файл, створений під час стиснення журналу, може отримати номер inode старого:
+                # тоді збережене зміщення до нього не стосується, і журнал читається з початку.
+                offset = 0
+                tail = self._read_log_tail(f, offset, published)
+        if tail is None:
+            return False
+        entries, end = tail
+        log, self.log = self.log, None
+        try:
+            for entry in entries:
+                if entry["seq"] != self.log_seq + 1 or entry["op"] == "reload":
+                    return False
+                self.apply_entry(entry)
+                self.log_seq = entry["seq"]
+        finally:
+            self.log = log
+            log.seq = self.log_seq
+        self.log_inode, self.log_offset = inode, offset + end
         return True
 
-    def load_from_file(self, file_path: str):
+    def _read_log_tail(self, f: Any, offset: int, published: int) -> Optional[tuple[List[dict[str, Any]], int]]:
+        f.seek(offset)
+        data = f.read()
+        # Останній рядок може бути ще не дописаний іншим процесом.
+        end = data.rfind(b'\n') + 1
+        try:
+            entries = [entry for entry in (json.loads(line) for line in data[:end].splitlines() if line.strip())
+                       if entry["seq"] > self.log_seq]
+        except (ValueError, TypeError, KeyError):
+            return None
+        if entries and entries[0]["seq"] != self.log_seq + 1:
+            return None
+        if (entries[-1]["seq"] if entries else self.log_seq) < published:
+            return None
+        return entries, end
+
+    def _reload(self) -> None:
+        log, self.log = self.log, None
+        self.tables = {}
+        self.log_seq = 0
+        try:
+            self.load_from_file(self.shared.file_path)
+        finally:
+            self.log = log
+        if log is not None:
+            log.seq = self.log_seq
+            stat = os.stat(log.file_path)
+            self.log_inode, self.log_offset = stat.st_ino, stat.st_size
+        for table_name in list(self.subscribers):
+            self.publish({"op": "reload", "table": table_name})
+
+    def enter_shared_write(self) -> None:
+        self.shared.acquire()
+        try:
+            if not self.catch_up():
+                self._reload()
+            if self.log is not None and os.fstat(self.log.file.fileno()).st_ino != self.log_inode:
+                # Інший процес стиснув журнал, замінивши файл.
+                self.log.reopen()
+        except BaseException:
+            self.shared.release()
+            raise
+
+    def exit_shared_write(self) -> None:
+        try:
+            if self.log is not None:
+                self.log.flush()
+                stat = os.fstat(self.log.file.fileno())
+                self.log_inode, self.log_offset = stat.st_ino, stat.st_size
+                base, _ = self.shared.read_version()
+                self.shared.write_version(max(base, self.compacted_seq), self.log_seq)
+        finally:
+            self.shared.release()
+
+    def checkpoint(self, file_path: str, compress: bool = False) -> None:
+        if self.shared is not None:
+            # Інші процеси не повинні дописувати журнал між записом знімка і стисненням журналу,
+            # тому в спільному режимі знімок пишеться під блокуванням на запис.
+            with self.lock.write():
+                self.save_to_file(file_path, compress)
+                if self.log is not None:
+                    self.log.truncate(self.log_seq)
+                    self.compacted_seq = self.log_seq
+            return
+        # Блокування читання тримається лише під час серіалізації: стиснення і запис
+        # на диск відбуваються без нього, тож запити не чекають на I/O. Черговий знімок чекає
+        # на попередній до блокування читання, щоб не затримувати записи, поки стоїть у черзі.
+        with self.checkpoint_lock:
+            with self.lock.read():
+                seq = self.log_seq
+                start = time.perf_counter()
+                chunks = self._snapshot_chunks(file_path)
+                SNAPSHOT_DURATION.observe(time.perf_counter() - start, phase="serialize")
+            self._write_snapshot(file_path, chunks, compress)
+            if self.log is not None:
+                self.log.truncate(seq)
+
+    def load_from_file(self, file_path: str, prepared: Optional[bytes] = None):
+        # Фонові завдання, заплановані під час відтворення журналу, чекають на це блокування.
+        with self.lock.write():
+            if prepared is not None or is_binary_snapshot(file_path):
+                self._load_binary(file_path, prepared)
+            else:
+                self._load_json(file_path)
+            self.replay_log(log_path_for(file_path))
+            for table in self.tables.values():
+                if table.needs_cleanup:
+                    self.schedule_cleanup(table)
+
+    def _load_json(self, file_path: str) -> None:
         with open(file_path, 'r') as f:
-            data = json.load(f)
+            self._read_json(json.load(f))
 
+    def _read_json(self, data: dict[str, Any]) -> None:
         self.name = data["name"]
+        self.log_seq = data.get("log_seq", 0)
         for table_name, table_data in data["tables"].items():
-            table = Table(table_name)
-            table.columns = {col_name: Type[col_type] for col_name, col_type in table_data["columns"].items()}
+            table = Table(table_name, Storage(table_data.get("storage", Storage.row.value)))
+            table.needs_cleanup = table_data.get("needs_cleanup", False)
+            for col_name, col_type in table_data["columns"].items():
+                table.add_column(col_name, Type[col_type])
             for row_id_str, row_data in table_data["rows"].items():
-                row = Row()
-                row.id = uuid.UUID(row_id_str)
-                row.values = row_data["values"]
-                row.column_types = {col_name: Type[col_type] for col_name, col_type in row_data["column_types"].items()}
+                row = Row(table.schema, row_id=uuid.UUID(row_id_str))
+                row.values = {col_name: value for col_name, value in row_data["values"].items()
+                              if col_name in table.columns}
 
-                if not row.validate_row():
+                if not row.validate_row(table.validators):
                     table.rows[row.id] = row
-            self.tables[table_name] = table
+            ROWS_VALIDATED.inc(len(table_data["rows"]), op="load")
+            for col_name, kinds in table_data.get("indexes", {}).items():
+                for kind in kinds:
+                    table.create_index(col_name, IndexKind(kind))
+            self._attach_table(table)
+
+    def _load_binary(self, file_path: str, prepared: Optional[bytes] = None) -> None:
+        if prepared is not None:
+            self._read_binary(file_path, prepared)
+            return
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            self._read_binary(file_path, mapped)
 
-    def save_to_file(self, file_path: str) -> None:
+    def _read_binary(self, file_path: str, data: Any) -> None:
+        magic, version, flags = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"Файл '{file_path}' не є знімком бази даних підтримуваної версії.")
+        view = memoryview(data)[SNAPSHOT_HEADER.size:]
+        try:
+            body = memoryview(zlib.decompress(view)) if flags & SNAPSHOT_COMPRESSED else view
+            reader = SnapshotReader(body, bool(flags & SNAPSHOT_BIG_ENDIAN) != (sys.byteorder == 'big'))
+            self.name = reader.text()
+            self.log_seq = reader.u64()
+            for _ in range(reader.u32()):
+                self._attach_table(Table.read_snapshot(reader))
+        finally:
+            view.release()
+
+    def save_to_file(self, file_path: str, compress: bool = False) -> None:
+        start = time.perf_counter()
+        chunks = self._snapshot_chunks(file_path)
+        SNAPSHOT_DURATION.observe(time.perf_counter() - start, phase="serialize")
+        self._write_snapshot(file_path, chunks, compress)
+
+    def _snapshot_chunks(self, file_path: str) -> List[bytes]:
+        if is_binary_snapshot(file_path):
+            return self.snapshot_binary()
+        return [self.snapshot().encode('utf-8')]
+
+    def _write_snapshot(self, file_path: str, chunks: Iterable[bytes], compress: bool = False) -> None:
+        start = time.perf_counter()
+        tmp_path = file_path + ".tmp"
+        binary = is_binary_snapshot(file_path)
+        with open(tmp_path, 'wb') as f:
+            if binary:
+                flags = (SNAPSHOT_COMPRESSED if compress else 0) | (SNAPSHOT_BIG_ENDIAN if sys.byteorder == 'big' else 0)
+                f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, flags))
+                if compress:
+                    compressor = zlib.compressobj()
+                    for chunk in chunks:
+                        f.write(compressor.compress(chunk))
+                    chunks = [compressor.flush()]
+            f.writelines(chunks)
+            written = f.tell()
+        os.replace(tmp_path, file_path)
+        SNAPSHOT_BYTES.inc(written, format=("binary_zlib" if compress else "binary") if binary else "json")
+        SNAPSHOT_DURATION.observe(time.perf_counter() - start, phase="write")
+
+    def snapshot_binary(self) -> List[bytes]:
+        writer = SnapshotWriter()
+        writer.text(self.name)
+        writer.u64(self.log_seq)
+        writer.u32(len(self.tables))
+        for table in self.tables.values():
+            table.write_snapshot(writer)
+        return writer.chunks
+
+    def snapshot(self) -> str:
         data = {
             "name": self.name,
+            "log_seq": self.log_seq,
             "tables": {
                 table_name: {
+                    "storage": table.storage.value,
+                    "needs_cleanup": table.needs_cleanup,
                     "columns": {col_name: col_type.name for col_name, col_type in table.columns.items()},
+                    "indexes": {col_name: [kind.value for kind in kinds] for col_name, kinds in table.indexes.items()},
                     "rows": {
                         str(row_id): {
-                            "values": row.values,
-                            "column_types": {col_name: col_type.name for col_name, col_type in row.column_types.items()}
+                            "values": table.row_values(row),
+                            "column_types": {col_name: col_type.name for col_name, col_type in table.columns.items()}
                         }
                         for row_id, row in table.rows.items()
                     }
@@ -278,5 +2932,281 @@ class Database:
                 for table_name, table in self.tables.items()
             }
         }
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        return json.dumps(data, indent=4)
+
+
+def file_identity(file: Any) -> tuple[int, int, int]:
+    stat = os.stat(file)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def prepare_snapshot(file_path: str) -> tuple[tuple[int, int, int], Optional[bytes]]:
+    # Виконується в пулі процесів під час попереднього завантаження. Стиснений знімок розпаковується,
+    # а знімок JSON розбирається і перевіряється, і обидва повертаються як нестиснений двійковий
+    # знімок. Нестиснений двійковий знімок відображається в пам'ять напряму, тож його не передаємо.
+    with open(file_path, 'rb') as f:
+        identity = file_identity(f.fileno())
+        if not is_binary_snapshot(file_path):
+            database = Database(os.path.splitext(os.path.basename(file_path))[0])
+            database._read_json(json.load(f))
+            chunks = database.snapshot_binary()
+            flags = SNAPSHOT_BIG_ENDIAN if sys.byteorder == 'big' else 0
+            return identity, SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, flags) + b''.join(chunks)
+        header = f.read(SNAPSHOT_HEADER.size)
+        magic, version, flags = SNAPSHOT_HEADER.unpack(header)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or not flags & SNAPSHOT_COMPRESSED:
+            return identity, None
+        return identity, (SNAPSHOT_HEADER.pack(magic, version, flags & ~SNAPSHOT_COMPRESSED)
+                          + zlib.decompress(f.read()))
+
+
+class DatabaseRegistry(MutableMapping):
+    def __init__(self, folder: str, max_loaded: int = 0, max_bytes: int = 0, compress: bool = False,
+                 shared: bool = False):
+        self.folder = folder
+        self.max_loaded = max_loaded
+        self.max_bytes = max_bytes
+        self.compress = compress
+        # У спільному режимі ту саму теку обслуговують кілька процесів, тож перелік баз
+        # і їхній вміст звіряються з диском під час звернень.
+        self.shared = shared
+        self.names: dict[str, None] = {}
+        self.loaded: OrderedDict[str, Database] = OrderedDict()
+        self.evicted: weakref.WeakValueDictionary[str, Database] = weakref.WeakValueDictionary()
+        # Бази, які саме читаються з диска: наступні запити до них чекають на той самий Future.
+        self.loading: dict[str, Future] = {}
+        self.lock = threading.RLock()
+
+    def snapshot_path(self, name: str) -> str:
+        return os.path.join(self.folder, f"{name}{SNAPSHOT_SUFFIX}")
+
+    def legacy_path(self, name: str) -> str:
+        return os.path.join(self.folder, f"{name}.json")
+
+    def remove_files(self, name: str) -> None:
+        file_path = self.snapshot_path(name)
+        base = os.path.splitext(file_path)[0]
+        for path in (file_path, self.legacy_path(name), log_path_for(file_path), base + ".ver", base + ".lock"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def exists_on_disk(self, name: str) -> bool:
+        return os.path.exists(self.snapshot_path(name)) or os.path.exists(self.legacy_path(name))
+
+    def scan(self) -> None:
+        found = {}
+        for file_name in sorted(os.listdir(self.folder)):
+            name, suffix = os.path.splitext(file_name)
+            if suffix in (SNAPSHOT_SUFFIX, '.json') and os.path.isfile(os.path.join(self.folder, file_name)):
+                found[name] = None
+        with self.lock:
+            if self.shared:
+                for name in [name for name in self.names if name not in found]:
+                    self.pop(name)
+            self.names.update(found)
+
+    def _sync_name(self, name: str) -> None:
+        exists = self.exists_on_disk(name)
+        with self.lock:
+            if exists:
+                self.names.setdefault(name, None)
+            elif name in self.names:
+                # Базу видалив інший процес.
+                self.pop(name)
+
+    def __contains__(self, name: object) -> bool:
+        if self.shared and isinstance(name, str):
+            self._sync_name(name)
+        return name in self.names
+
+    def __iter__(self) -> Iterator[str]:
+        if self.shared:
+            self.scan()
+        return iter(list(self.names))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, name: str) -> Database:
+        database = self._get(name)
+        if self.shared:
+            database.refresh()
+        return database
+
+    def _get(self, name: str) -> Database:
+        with self.lock:
+            if name not in self.names:
+                raise KeyError(name)
+            database = self.loaded.get(name)
+            if database is not None:
+                self.loaded.move_to_end(name)
+                return database
+            database = self.evicted.pop(name, None)
+            if database is not None:
+                self.loaded[name] = database
+                victims = self._evict()
+            else:
+                future = self.loading.get(name)
+                loader = future is None
+                if loader:
+                    future = self.loading[name] = Future()
+        if database is not None:
+            self._retire(victims)
+            return database
+        if not loader:
+            return future.result()
+        return self._load_unlocked(name, future)
+
+    def _load_unlocked(self, name: str, future: Future,
+                       prepared: Optional[tuple[tuple[int, int, int], Optional[bytes]]] = None) -> Database:
+        # Знімок читається і журнал відтворюється без блокування реєстру: завантаження однієї бази
+        # не затримує звернень до інших, а запити до цієї ж бази чекають на future.
+        try:
+            database = self._load(name, prepared)
+        except BaseException as e:
+            with self.lock:
+                del self.loading[name]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            del self.loading[name]
+            deleted = name not in self.names
+            if not deleted:
+                self.loaded[name] = database
+                victims = self._evict()
+        if deleted:
+            # Базу видалили, поки вона завантажувалася.
+            database.detach_log()
+            error = KeyError(name)
+            future.set_exception(error)
+            raise error
+        future.set_result(database)
+        self._retire(victims)
+        return database
+
+    def __setitem__(self, name: str, database: Database) -> None:
+        if self.shared and database.shared is None:
+            database.share(SharedState(self.snapshot_path(name)))
+            # Захоплення публікує версію бази і запам'ятовує позицію в журналі.
+            with database.lock.write():
+                pass
+        with self.lock:
+            self.names[name] = None
+            self.loaded[name] = database
+            self.loaded.move_to_end(name)
+            victims = self._evict()
+        self._retire(victims)
+
+    def __delitem__(self, name: str) -> None:
+        if name not in self.names:
+            raise KeyError(name)
+        self.pop(name)
+
+    def pop(self, name: str, default: Any = None) -> Optional[Database]:
+        with self.lock:
+            self.names.pop(name, None)
+            database = self.loaded.pop(name, None)
+            if database is None:
+                database = self.evicted.pop(name, None)
+            return database if database is not None else default
+
+    def loaded_items(self) -> List[tuple[str, Database]]:
+        with self.lock:
+            return list(self.loaded.items())
+
+    def source_path(self, name: str) -> str:
+        file_path = self.snapshot_path(name)
+        legacy_path = self.legacy_path(name)
+        return legacy_path if not os.path.exists(file_path) and os.path.exists(legacy_path) else file_path
+
+    def _load(self, name: str, prepared: Optional[tuple[tuple[int, int, int], Optional[bytes]]] = None) -> Database:
+        file_path = self.snapshot_path(name)
+        database = Database(name)
+        if self.shared:
+            database.share(SharedState(file_path))
+        with database.lock.write():
+            source_path = self.source_path(name)
+            data = None
+            if prepared is not None and prepared[0] == file_identity(source_path):
+                data = prepared[1]
+            if source_path != file_path:
+                # Знімок у старому форматі JSON переписується у двійковий один раз, при першому завантаженні.
+                database.load_from_file(source_path, data)
+                database.checkpoint(file_path, self.compress)
+                os.remove(source_path)
+            else:
+                database.load_from_file(file_path, data)
+            database.attach_log(log_path_for(file_path))
+        return database
+
+    def preload(self, executor: Optional[Executor] = None) -> List[str]:
+        # Завантажує бази, яких ще немає в пам'яті, у межах обмежень реєстру. Розпакування і розбір
+        # знімків виконуються паралельно в executor (пулі процесів), а в цьому процесі лишається
+        # побудова таблиць і відтворення журналу. Якщо файл змінився після підготовки, знімок
+        # читається заново.
+        with self.lock:
+            names = [name for name in self.names
+                     if name not in self.loaded and name not in self.evicted and name not in self.loading]
+            if self.max_loaded:
+                names = names[:max(0, self.max_loaded - len(self.loaded))]
+        futures = {}
+        if executor is not None:
+            futures = {name: executor.submit(prepare_snapshot, self.source_path(name)) for name in names}
+        loaded = []
+        for name in names:
+            try:
+                prepared = futures[name].result() if name in futures else None
+            except Exception as e:
+                print(f"Помилка при підготовці знімка бази '{name}': {e}")
+                prepared = None
+            with self.lock:
+                if name not in self.names or name in self.loaded or name in self.evicted or name in self.loading:
+                    continue
+                if self.max_bytes and sum(map(self._disk_size, [*self.loaded, name])) > self.max_bytes:
+                    break
+                future = self.loading[name] = Future()
+            try:
+                self._load_unlocked(name, future, prepared)
+            except Exception as e:
+                print(f"Помилка при завантаженні бази '{name}': {e}")
+                continue
+            loaded.append(name)
+        return loaded
+
+    def _disk_size(self, name: str) -> int:
+        size = 0
+        file_path = self.snapshot_path(name)
+        for path in (file_path, self.legacy_path(name), log_path_for(file_path)):
+            if os.path.exists(path):
+                size += os.path.getsize(path)
+        return size
+
+    def _over_budget(self) -> bool:
+        if self.max_loaded and len(self.loaded) > self.max_loaded:
+            return True
+        return bool(self.max_bytes) and sum(self._disk_size(name) for name in self.loaded) > self.max_bytes
+
+    def _evict(self) -> List[tuple[str, Database]]:
+        # Викликається під блокуванням реєстру; знімки витіснених баз пише _retire вже без нього.
+        victims = []
+        while len(self.loaded) > 1 and self._over_budget():
+            name, database = self.loaded.popitem(last=False)
+            self.evicted[name] = database
+            victims.append((name, database))
+        return victims
+
+    def _retire(self, victims: List[tuple[str, Database]]) -> None:
+        for name, database in victims:
+            with self.lock:
+                if name not in self.names:
+                    continue
+            database.checkpoint(self.snapshot_path(name), self.compress)
+            with self.lock:
+                if name not in self.names:
+                    # Базу видалили, поки писався знімок.
+                    self.remove_files(name)
+                    continue
+            # Об'єкт лишається живим, поки на нього посилаються запити, що виконуються, і їхні зміни
+            # мають потрапити в журнал, тому журнал закривається, щойно об'єкт звільнять.
+            if database.log is not None:
+                weakref.finalize(database, database.log.close)
@@ -1,70 +1,424 @@
+import asyncio
+import csv
+import functools
+import io
+import itertools
+import json
+import multiprocessing
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from enum import Enum
 from pathlib import Path
+from typing import AsyncIterator
+from urllib.parse import quote
 
-from fastapi import FastAPI, HTTPException
+import anyio.to_thread
+from fastapi import FastAPI, HTTPException, Request, UploadFile, WebSocket
 from pydantic import BaseModel
-from starlette.responses import HTMLResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from starlette.staticfiles import StaticFiles
 
 from dbclasses import *
+from metrics import (LOADED_DATABASES, RESPONSE_CACHE, TABLE_MEMORY, TABLE_ROWS, MetricsMiddleware,
+                     SlowRequestProfiler, render_metrics)
 
 app = FastAPI()
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 DATABASE_FOLDER = Path.cwd() / "databases"
+STATIC_FOLDER = Path("static")
+CHECKPOINT_INTERVAL = 30
+CHECKPOINT_MIN_ENTRIES = 1
+STREAM_CHUNK_ROWS = 1000
+IMPORT_BATCH_ROWS = 10000
+MAX_IMPORT_ERRORS = 1000
+MAX_LOADED_DATABASES = int(os.environ.get("WEBDBMS_MAX_LOADED_DATABASES", 0))
+MAX_LOADED_BYTES = int(os.environ.get("WEBDBMS_MAX_LOADED_BYTES", 0))
+SNAPSHOT_COMPRESSION = os.environ.get("WEBDBMS_SNAPSHOT_COMPRESSION", "0") not in ("", "0")
+# Увімкніть, якщо застосунок запущено кількома воркерами (uvicorn --workers N) над однією текою баз.
+SHARED_STORAGE = os.environ.get("WEBDBMS_SHARED_STORAGE", "0") not in ("", "0")
+TIMING_HEADER = os.environ.get("WEBDBMS_TIMING_HEADER", "0") not in ("", "0")
+PROFILE_SLOW_MS = float(os.environ.get("WEBDBMS_PROFILE_SLOW_MS", 0))
+RESPONSE_CACHE_BYTES = int(os.environ.get("WEBDBMS_RESPONSE_CACHE_BYTES", 64 * 1024 * 1024))
+# Синхронні обробники виконуються в пулі потоків anyio (типово 40 потоків), що обмежує
+# кількість одночасних запитів; запис на диск має власний пул і не займає цих потоків.
+THREADPOOL_SIZE = int(os.environ.get("WEBDBMS_THREADPOOL_SIZE", 100))
+PERSISTENCE_THREADS = int(os.environ.get("WEBDBMS_PERSISTENCE_THREADS", 2))
+# Попереднє завантаження всіх баз під час запуску: розпакування стиснених знімків і розбір знімків
+# JSON розподіляються між LOAD_PROCESSES процесами.
+PRELOAD = os.environ.get("WEBDBMS_PRELOAD", "0") not in ("", "0")
+LOAD_PROCESSES = int(os.environ.get("WEBDBMS_LOAD_PROCESSES", os.cpu_count() or 1))
+# Знімки кількох баз пишуться паралельно: стиснення zlib і запис на диск відпускають GIL.
+SNAPSHOT_THREADS = int(os.environ.get("WEBDBMS_SNAPSHOT_THREADS", os.cpu_count() or 1))
+LIVE_MAX_PENDING = 1000
+LIVE_REFRESH_INTERVAL = 0.5
+# Входить до ETag, щоб після перезапуску сервера лічильник версій не збігся зі старими значеннями.
+BOOT_ID = uuid.uuid4().hex[:8]
+
+profiler = SlowRequestProfiler(PROFILE_SLOW_MS / 1000) if PROFILE_SLOW_MS > 0 else None
+app.add_middleware(MetricsMiddleware, timing_header=TIMING_HEADER, profiler=profiler)
+
+
+@app.exception_handler(LogWriteError)
+async def log_write_failed(request: Request, error: LogWriteError):
+    return JSONResponse(status_code=503, content={"detail": str(error)})
 
 
 class RowModel(BaseModel):
     values: dict[str, Any]
 
 
-databases = {}
+class AggregateModel(BaseModel):
+    func: str
+    column: Optional[str] = None
+    name: Optional[str] = None
 
 
-def save_database_to_file(db_name: str):
-    db_file_path = DATABASE_FOLDER / f"{db_name}.json"
+class OrderModel(BaseModel):
+    column: str
+    desc: bool = False
 
+
+class BatchModel(BaseModel):
+    operations: List[dict[str, Any]]
+
+
+class QueryModel(BaseModel):
+    where: Optional[dict[str, Any]] = None
+    select: Optional[List[str]] = None
+    group_by: List[str] = []
+    aggregates: List[AggregateModel] = []
+    order_by: List[OrderModel] = []
+    limit: Optional[int] = None
+
+
+databases = DatabaseRegistry(str(DATABASE_FOLDER), MAX_LOADED_DATABASES, MAX_LOADED_BYTES, SNAPSHOT_COMPRESSION,
+                             SHARED_STORAGE)
+checkpoint_stop = threading.Event()
+persistence_executor = ThreadPoolExecutor(PERSISTENCE_THREADS, thread_name_prefix="persistence")
+
+
+def read_pages() -> dict[str, bytes]:
+    pages = {}
+    for name in ("main_page.html", "database_page.html"):
+        path = STATIC_FOLDER / name
+        if path.is_file():
+            pages[name] = path.read_bytes()
+    return pages
+
+
+PAGES = read_pages()
+
+
+def page_response(name: str) -> HTMLResponse:
+    page = PAGES.get(name)
+    if page is None:
+        raise HTTPException(status_code=500, detail="Сторінка не знайдена")
+    return HTMLResponse(page)
+
+
+async def in_persistence(func: Callable[..., Any], *args: Any) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(persistence_executor, functools.partial(func, *args))
+
+
+async def database_exists(db_name: str) -> bool:
+    # У спільному режимі перевірка звертається до диска, тож не виконується в циклі подій.
+    if databases.shared:
+        return await run_in_threadpool(databases.__contains__, db_name)
+    return db_name in databases
+
+
+def table_stats() -> Iterator[tuple[str, str, Table]]:
+    for db_name, database in databases.loaded_items():
+        with database.lock.read():
+            for table_name, table in list(database.tables.items()):
+                yield db_name, table_name, table
+
+
+LOADED_DATABASES.set_function(lambda: [({}, len(databases.loaded_items()))])
+TABLE_ROWS.set_function(lambda: [({"database": db_name, "table": table_name}, len(table.rows))
+                                 for db_name, table_name, table in table_stats()])
+TABLE_MEMORY.set_function(lambda: [({"database": db_name, "table": table_name}, table.memory_usage())
+                                   for db_name, table_name, table in table_stats()])
+
+
+def save_database_to_file(db_name: str, database: Database):
     try:
-        database = databases[db_name]
-        database.save_to_file(str(db_file_path))
+        database.checkpoint(databases.snapshot_path(db_name), SNAPSHOT_COMPRESSION)
         return {"message": f"База даних '{db_name}' успішно збережена у файл."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Помилка при збереженні: {str(e)}")
 
 
-def load_database_from_file(db_name: str):
-    db_file_path = DATABASE_FOLDER / f"{db_name}.json"
+@contextmanager
+def database_for_write(database: Database) -> Iterator[Database]:
+    # Після невдалого запису журналу зміни не приймаються: їх не вдалося б відновити після перезапуску.
+    with database.lock.write():
+        database.check_writable()
+        yield database
+
+
+@contextmanager
+def table_for_write(database: Database, table_name: str) -> Iterator[Table]:
+    # У спільному режимі блокування на запис може перечитати базу з диска і замінити об'єкти таблиць,
+    # тому таблиця береться вже під блокуванням: інакше зміна потрапила б у застарілий об'єкт.
+    with database_for_write(database):
+        table = database.tables.get(table_name)
+        if table is None:
+            raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
+        yield table
+
+
+def save_databases(items: List[tuple[str, Database]]) -> None:
+    def save(item: tuple[str, Database]) -> None:
+        try:
+            save_database_to_file(*item)
+        except HTTPException as e:
+            print(e.detail)
+
+    if len(items) < 2 or SNAPSHOT_THREADS < 2:
+        for item in items:
+            save(item)
+        return
+    with ThreadPoolExecutor(min(SNAPSHOT_THREADS, len(items)), thread_name_prefix="snapshot") as executor:
+        list(executor.map(save, items))
+
+
+def checkpoint_databases():
+    while not checkpoint_stop.wait(CHECKPOINT_INTERVAL):
+        save_databases([(db_name, database) for db_name, database in databases.loaded_items()
+                        if database.log is not None and database.log.entries >= CHECKPOINT_MIN_ENTRIES])
+
+
+def stream_rows(rows: Iterator[dict[str, Any]], lock: ReadWriteLock, head: dict[str, Any],
+                tail: Callable[[], dict[str, Any]] = dict, ndjson: bool = False) -> StreamingResponse:
+    def chunks():
+        while True:
+            with lock.read():
+                chunk = [json.dumps(row) for row in itertools.islice(rows, STREAM_CHUNK_ROWS)]
+            if not chunk:
+                return
+            yield chunk
+
+    def generate_json():
+        yield '{' + json.dumps(head)[1:-1] + ', "rows": ['
+        separator = ''
+        for chunk in chunks():
+            yield separator + ', '.join(chunk)
+            separator = ', '
+        fields = tail()
+        yield ']' + (', ' + json.dumps(fields)[1:-1] if fields else '') + '}'
+
+    def generate_ndjson():
+        yield json.dumps(head) + '\n'
+        for chunk in chunks():
+            yield '\n'.join(chunk) + '\n'
+        fields = tail()
+        if fields:
+            yield json.dumps(fields) + '\n'
+
+    if ndjson:
+        return StreamingResponse(generate_ndjson(), media_type="application/x-ndjson")
+    return StreamingResponse(generate_json(), media_type="application/json")
+
+
+def stream_values(rows: Iterator[Row], lock: ReadWriteLock, columns: dict[str, Type],
+                  format: str) -> StreamingResponse:
+    if format not in ("json", "ndjson"):
+        raise ValueError(f"Невідомий формат відповіді: '{format}'.")
+    return stream_rows(({col: row.value(col) for col in columns} for row in rows), lock,
+                       {"columns": {col: col_type.value for col, col_type in columns.items()}},
+                       ndjson=format == "ndjson")
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 8
+        self.entries: OrderedDict[tuple, tuple[bytes, str]] = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[tuple[bytes, str]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, body: bytes, media_type: str) -> None:
+        if len(body) > self.max_entry_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+            self.entries[key] = (body, media_type)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_BYTES)
+
+
+def cached_response(request: Request, key: tuple, versions: Callable[[], tuple[int, ...]],
+                    render: Callable[[], Response]) -> Response:
+    # Версії змінюються з кожною мутацією, тому відповідь для тих самих версій завжди однакова.
+    current = versions()
+    etag = f'"{BOOT_ID}-' + '-'.join(map(str, current)) + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        RESPONSE_CACHE.inc(result="not_modified")
+        return Response(status_code=304, headers=headers)
+
+    key = key + current
+    entry = response_cache.get(key)
+    if entry is not None:
+        RESPONSE_CACHE.inc(result="hit")
+        return Response(entry[0], media_type=entry[1], headers=headers)
+
+    RESPONSE_CACHE.inc(result="miss")
+    response = render()
+    response.headers.update(headers)
+    if isinstance(response, StreamingResponse):
+        response.body_iterator = cache_stream(response.body_iterator, key, current, versions, response.media_type)
+    elif versions() == current:
+        response_cache.put(key, response.body, response.media_type)
+    return response
+
+
+async def cache_stream(chunks: AsyncIterator[Any], key: tuple, current: tuple[int, ...],
+                       versions: Callable[[], tuple[int, ...]], media_type: str) -> AsyncIterator[Any]:
+    parts: Optional[List[bytes]] = []
+    size = 0
+    async for chunk in chunks:
+        if parts is not None:
+            data = chunk if isinstance(chunk, bytes) else chunk.encode('utf-8')
+            size += len(data)
+            if size > response_cache.max_entry_bytes:
+                parts = None
+            else:
+                parts.append(data)
+        yield chunk
+    # Якщо таблиці змінилися під час передачі, тіло не відповідає жодній версії і не кешується.
+    if parts is not None and versions() == current:
+        response_cache.put(key, b''.join(parts), media_type)
+
+
+class LiveChannel:
+    def __init__(self, loop: asyncio.AbstractEventLoop, table_name: str):
+        self.loop = loop
+        self.table_name = table_name
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def push(self, message: str) -> None:
+        # Викликається з потоку, що змінює таблицю, тому повідомлення передається в цикл подій.
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            pass
+
+    def _put(self, message: str) -> None:
+        if self.queue.qsize() >= LIVE_MAX_PENDING:
+            # Глядач не встигає отримувати зміни: замість них він перечитає таблицю повністю.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = json.dumps({"op": "reload", "table": self.table_name}, ensure_ascii=False)
+        self.queue.put_nowait(message)
+
+
+async def send_changes(websocket: WebSocket, channel: LiveChannel, database: Database) -> None:
+    while True:
+        try:
+            message = await asyncio.wait_for(channel.queue.get(), LIVE_REFRESH_INTERVAL if databases.shared else None)
+        except asyncio.TimeoutError:
+            # Зміни інших воркерів надходять, лише коли цей процес дочитує журнал.
+            await run_in_threadpool(database.refresh)
+            continue
+        await websocket.send_text(message)
+
+
+def read_import_records(file: UploadFile, format: str) -> Iterator[tuple[int, Any]]:
+    text = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    if format == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            if isinstance(record, dict) and isinstance(record.get("values"), dict):
+                record = record["values"]
+            yield line_number, record
 
-    if not db_file_path.exists():
-        raise HTTPException(status_code=404, detail="Файл бази даних не знайдений.")
 
-    try:
-        database = Database(db_name)
-        database.load_from_file(str(db_file_path))
-        databases[db_name] = database
-        return {"message": f"База даних '{db_name}' успішно завантажена з файлу."}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Помилка при завантаженні: {str(e)}")
+@app.on_event("startup")
+async def configure_threadpool():
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+
+def preload_databases():
+    if LOAD_PROCESSES < 2:
+        databases.preload()
+        return
+    # Процеси запускаються через spawn: fork копіював би стан блокувань потоків сервера.
+    with ProcessPoolExecutor(LOAD_PROCESSES, mp_context=multiprocessing.get_context("spawn")) as executor:
+        databases.preload(executor)
 
 
 @app.on_event("startup")
 def load_databases():
     DATABASE_FOLDER.mkdir(exist_ok=True)
-    for file_path in DATABASE_FOLDER.iterdir():
-        if file_path.is_file() and file_path.suffix == '.json':
-            load_database_from_file(file_path.stem)
+    databases.scan()
+    checkpoint_stop.clear()
+    threading.Thread(target=checkpoint_databases, name="checkpoint", daemon=True).start()
+    if PRELOAD:
+        threading.Thread(target=preload_databases, name="preload", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def close_databases():
+    checkpoint_stop.set()
+    items = databases.loaded_items()
+    save_databases(items)
+    for db_name, database in items:
+        database.detach_log()
+
+
+def create_database_files(db_name: str) -> None:
+    database = Database(db_name)
+    save_database_to_file(db_name, database)
+    database.attach_log(log_path_for(databases.snapshot_path(db_name)))
+    databases[db_name] = database
+
+
+def remove_database_files(db_name: str) -> None:
+    database = databases.pop(db_name)
+    if database is not None:
+        with database.lock.write():
+            database.detach_log()
+    databases.remove_files(db_name)
 
 
 @app.post("/{db_name}/create")
-def create_database(db_name: str):
-    if db_name in databases:
+async def create_database(db_name: str):
+    if await database_exists(db_name):
         raise HTTPException(status_code=400, detail="База даних з такою назвою вже існує.")
     try:
-        database = Database(db_name)
-        databases[db_name] = database
-        save_database_to_file(db_name)
+        await in_persistence(create_database_files, db_name)
         return {"message": f"База даних '{db_name}' успішно створена."}
     except (ValueError, ValidError) as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -75,20 +429,54 @@ def list_databases():
     return {"databases": list(databases.keys())}
 
 
+@app.get("/metrics")
+def get_metrics():
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/metrics/slow_requests")
+def get_slow_requests():
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Профілювання повільних запитів вимкнене.")
+    return {"threshold_ms": PROFILE_SLOW_MS, "requests": list(profiler.reports)}
+
+
 @app.delete("/{db_name}/delete")
-def delete_database(db_name: str):
-    if db_name not in databases:
+async def delete_database(db_name: str):
+    if not await database_exists(db_name):
         raise HTTPException(status_code=404, detail="База даних не знайдена.")
 
-    del databases[db_name]
-    db_file_path = DATABASE_FOLDER / f"{db_name}.json"
-    db_file_path.unlink(missing_ok=True)
-    save_database_to_file(db_name)
+    await in_persistence(remove_database_files, db_name)
     return {"message": f"База даних '{db_name}' успішно видалена."}
 
 
+@app.post("/{db_name}/batch")
+def apply_batch(db_name: str, batch: BatchModel):
+    if db_name not in databases:
+        raise HTTPException(status_code=404, detail="База даних не знайдена.")
+
+    database = databases[db_name]
+    try:
+        with database_for_write(database):
+            results = database.apply_batch(batch.operations)
+        return {"message": f"Виконано операцій: {len(results)}.", "results": results}
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/{db_name}/export")
+def export_database(db_name: str):
+    if db_name not in databases:
+        raise HTTPException(status_code=404, detail="База даних не знайдена.")
+    database = databases[db_name]
+    with database.lock.read():
+        text = database.snapshot()
+    return Response(content=text, media_type="application/json",
+                    headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(db_name)}.json"})
+
+
 @app.post("/{db_name}/{table_name}/create")
-def create_table(db_name: str, table_name: str):
+def create_table(db_name: str, table_name: str, storage: str = Storage.row.value):
     if db_name not in databases:
         raise HTTPException(status_code=404, detail="База даних не знайдена.")
 
@@ -97,9 +485,8 @@ def create_table(db_name: str, table_name: str):
         if table_name in database.tables:
             raise HTTPException(status_code=400, detail="Таблиця з такою назвою вже існує.")
 
-        new_table = Table(table_name)
-        database.tables[table_name] = new_table
-        save_database_to_file(db_name)
+        with database_for_write(database):
+            database.create_table(table_name, Storage(storage))
         return {"message": f"Таблиця '{table_name}' успішно створена у базі '{db_name}'."}
 
     except (ValueError, ValidError) as e:
@@ -116,26 +503,39 @@ def delete_table(db_name: str, table_name: str):
     if table_name not in database.tables:
         raise HTTPException(status_code=404, detail="Table not found.")
 
-    del database.tables[table_name]
-    save_database_to_file(db_name)
+    with database_for_write(database):
+        database.delete_table(table_name)
     return {"detail": f"Таблиця '{table_name}' успішно видалена."}
 
 
 @app.get("/{db_name}/tables")
-def list_tables(db_name: str):
+def list_tables(db_name: str, request: Request):
     if db_name not in databases:
         raise HTTPException(status_code=404, detail="База даних не знайдена.")
     database = databases[db_name]
-    return {"tables": list(database.tables.keys())}
+
+    def render():
+        with database.lock.read():
+            return Response(json.dumps({"tables": list(database.tables.keys())}), media_type="application/json")
+
+    return cached_response(request, ("tables", db_name), lambda: (database.version,), render)
 
 
 @app.get("/{db_name}/{table_name}/get_columns")
-def get_columns(db_name: str, table_name: str):
+def get_columns(db_name: str, table_name: str, request: Request):
     if db_name not in databases:
         raise HTTPException(status_code=404, detail="База даних не знайдена.")
     database = databases[db_name]
+    if table_name not in database.tables:
+        raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
     table = database.tables[table_name]
-    return table.columns
+
+    def render():
+        with database.lock.read():
+            columns = {col: col_type.value for col, col_type in table.columns.items()}
+        return Response(json.dumps(columns), media_type="application/json")
+
+    return cached_response(request, ("get_columns", db_name, table_name), lambda: (table.version,), render)
 
 
 @app.post("/{db_name}/{table_name}/add_column")
@@ -147,10 +547,9 @@ def add_column(db_name: str, table_name: str, column_name: str, column_type: str
     if table_name not in database.tables:
         raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
 
-    table = database.tables[table_name]
     try:
-        table.add_column(column_name, Type[column_type])
-        save_database_to_file(db_name)
+        with table_for_write(database, table_name) as table:
+            table.add_column(column_name, Type[column_type])
         return {"message": f"Колонка '{column_name}' додана до таблиці '{table_name}'."}
     except (ValueError, ValidError) as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -165,15 +564,161 @@ def delete_column(db_name: str, table_name: str, column_name: str):
     if table_name not in database.tables:
         raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
 
-    table = database.tables[table_name]
     try:
-        table.delete_column(column_name)
-        save_database_to_file(db_name)
+        with table_for_write(database, table_name) as table:
+            table.delete_column(column_name)
         return {"message": f"Колонка '{column_name}' успішно видалена з таблиці '{table_name}'."}
     except (ValueError, ValidError) as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/{db_name}/{table_name}/change_column_type")
+def change_column_type(db_name: str, table_name: str, column_name: str, column_type: str):
+    if db_name not in databases:
+        raise HTTPException(status_code=404, detail="База даних не знайдена.")
+
+    database = databases[db_name]
+    if table_name not in database.tables:
+        raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
+
+    try:
+        with database_for_write(database):
+            task = database.change_column_type(table_name, column_name, Type(column_type))
+        return {"message": f"Зміну типу колонки '{column_name}' розпочато.", "task": task.progress()}
+    except (ValueError, ValidError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/{db_name}/tasks")
+def list_tasks(db_name: str, task_id: Optional[str] = None):
+    if db_name not in databases:
+        raise HTTPException(status_code=404, detail="База даних не знайдена.")
+    database = databases[db_name]
+    if task_id is None:
+        return {"tasks": [task.progress() for task in list(database.tasks.values())]}
+    if task_id not in database.tasks:
+        raise HTTPException(status_code=404, detail="Завдання не знайдене.")
+    return database.tasks[task_id].progress()
+
+
+@app.post("/{db_name}/{table_name}/create_index")
+def create_index(db_name: str, table_name: str, column_name: str, index_type: str):
+    if db_name not in databases:
+        raise HTTPException(status_code=404, detail="База даних не знайдена.")
+
+    database = databases[db_name]
+    if table_name not in database.tables:
+        raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
+
+    try:
+        with table_for_write(database, table_name) as table:
+            table.create_index(column_name, IndexKind(index_type))
+        return {"message": f"Індекс '{index_type}' на колонці '{column_name}' успішно створений."}
+    except (ValueError, ValidError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.delete("/{db_name}/{table_name}/drop_index")
+def drop_index(db_name: str, table_name: str, column_name: str, index_type: str):
+    if db_name not in databases:
+        raise HTTPException(status_code=404, detail="База даних не знайдена.")
+
+    database = databases[db_name]
+    if table_name not in database.tables:
+        raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
+
+    try:
+        with table_for_write(database, table_name) as table:
+            table.drop_index(column_name, IndexKind(index_type))
+        return {"message": f"Індекс '{index_type}' на колонці '{column_name}' успішно видалений."}
+    except (ValueError, ValidError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/{db_name}/{table_name}/indexes")
+def list_indexes(db_name: str, table_name: str):
+    if db_name not in databases:
+        raise HTTPException(status_code=404, detail="База даних не знайдена.")
+
+    database = databases[db_name]
+    if table_name not in database.tables:
+        raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
+
+    table = database.tables[table_name]
+    with database.lock.read():
+        return {"indexes": {col: [kind.value for kind in kinds] for col, kinds in table.indexes.items()}}
+
+
+def ensure_interval_indexes(database: Database, table_name: str, conditions: List[tuple[str, FilterOp]]) -> None:
+    # Умови overlaps і contains без інтервального індексу перебирають усю таблицю, тому індекс
+    # будується під час першого такого запиту і далі підтримується так само, як створений вручну.
+    with database.lock.read():
+        table = database.tables[table_name]
+        if not any(table.missing_interval_index(column_name, op) for column_name, op in conditions):
+            return
+    with table_for_write(database, table_name) as table:
+        for column_name, op in conditions:
+            if table.missing_interval_index(column_name, op):
+                table.create_index(column_name, IndexKind.interval)
+
+
+def interval_conditions(where: Optional[dict[str, Any]]) -> List[tuple[str, FilterOp]]:
+    # Індекси використовуються лише для умов верхнього рівня (Query._source).
+    nodes = where.get("and", [where]) if where else []
+    if not isinstance(nodes, list):
+        return []
+    ops = {FilterOp.overlaps.value, FilterOp.contains.value}
+    return [(node["column"], FilterOp(node["op"])) for node in nodes
+            if isinstance(node, dict) and node.get("op") in ops and isinstance(node.get("column"), str)]
+
+
+@app.get("/{db_name}/{table_name}/filter")
+def filter_rows(db_name: str, table_name: str, column_name: str, op: str, value: str, value2: Optional[str] = None):
+    if db_name not in databases:
+        raise HTTPException(status_code=404, detail="База даних не знайдена.")
+
+    database = databases[db_name]
+    if table_name not in database.tables:
+        raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
+
+    try:
+        ensure_interval_indexes(database, table_name, [(column_name, FilterOp(op))])
+        with database.lock.read():
+            table = database.tables[table_name]
+            rows = table.filter_rows(column_name, FilterOp(op), value, value2)
+            return {"rows": [{"values": table.row_values(row),
+                              "id": row.id} for row in rows],
+                    "columns": list(table.columns.keys())}
+    except (ValueError, ValidError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/{db_name}/{table_name}/query")
+def query_rows(db_name: str, table_name: str, query: QueryModel, format: str = "json"):
+    if db_name not in databases:
+        raise HTTPException(status_code=404, detail="База даних не знайдена.")
+
+    database = databases[db_name]
+    if table_name not in database.tables:
+        raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail=f"Невідомий формат відповіді: '{format}'.")
+
+    try:
+        ensure_interval_indexes(database, table_name, interval_conditions(query.where))
+        with database.lock.read():
+            table = database.tables[table_name]
+            compiled = Query(table, query.where, query.select, query.group_by,
+                             [aggregate.model_dump() for aggregate in query.aggregates],
+                             [order.model_dump() for order in query.order_by], query.limit)
+    except (ValueError, ValidError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return stream_rows(compiled.execute(), database.lock,
+                       {"columns": {col: col_type.value for col, col_type in compiled.columns.items()}},
+                       ndjson=format == "ndjson")
+
+
 @app.post("/{db_name}/{table_name}/add_row")
 def add_row(db_name: str, table_name: str, row_data: RowModel):
     if db_name not in databases:
@@ -183,18 +728,16 @@ def add_row(db_name: str, table_name: str, row_data: RowModel):
     if table_name not in database.tables:
         raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
 
-    table = database.tables[table_name]
     try:
-        table.add_row(row_data.values)
-        save_database_to_file(db_name)
+        with table_for_write(database, table_name) as table:
+            table.add_row(row_data.values)
         return {"message": "Рядок успішно доданий до таблиці."}
 
     except (ValueError, AttributeError, ValidError) as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/{db_name}/{table1_name}/compare/{table2_name}")
-def compare_tables(db_name: str, table1_name: str, table2_name: str):
+def get_table_pair(db_name: str, table1_name: str, table2_name: str) -> tuple[Database, Table, Table]:
     if db_name not in databases:
         raise HTTPException(status_code=404, detail="База даних не знайдена.")
 
@@ -202,31 +745,188 @@ def compare_tables(db_name: str, table1_name: str, table2_name: str):
     if table1_name not in database.tables or table2_name not in database.tables:
         raise HTTPException(status_code=404, detail="Одна або обидві таблиці не знайдені.")
 
-    table1 = database.tables[table1_name]
-    table2 = database.tables[table2_name]
+    return database, database.tables[table1_name], database.tables[table2_name]
+
+
+def import_file(db_name: str, database: Database, table_name: str, file: UploadFile,
+                format: str) -> tuple[int, int, List[dict[str, Any]]]:
+    with table_for_write(database, table_name) as table:
+        imported, failed, errors = table.import_rows(read_import_records(file, format),
+                                                     IMPORT_BATCH_ROWS, MAX_IMPORT_ERRORS)
+        # У спільному режимі знімок пишеться під тим самим блокуванням, що й імпорт: інші процеси
+        # перечитують базу зі знімка, щойно побачать позначку імпорту в журналі.
+        if imported and database.shared is not None:
+            save_database_to_file(db_name, database)
+    if imported and database.shared is None:
+        save_database_to_file(db_name, database)
+    return imported, failed, errors
+
+
+@app.post("/{db_name}/{table_name}/import")
+async def import_rows(db_name: str, table_name: str, file: UploadFile, format: str = "csv"):
+    if not await database_exists(db_name):
+        raise HTTPException(status_code=404, detail="База даних не знайдена.")
+
+    database = await in_persistence(databases.__getitem__, db_name)
+    if table_name not in database.tables:
+        raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail=f"Невідомий формат файлу: '{format}'.")
 
     try:
-        result = table1.table_difference(table2)
-        return {"rows": [row.values for row in result],
-                "columns": table1.columns}
+        imported, failed, errors = await in_persistence(import_file, db_name, database, table_name, file, format)
+        return {"message": f"Імпортовано рядків: {imported}.",
+                "imported": imported,
+                "failed": failed,
+                "errors": errors}
+    except (ValueError, AttributeError, ValidError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/{db_name}/{table1_name}/compare/{table2_name}")
+def compare_tables(db_name: str, table1_name: str, table2_name: str, request: Request, format: str = "json"):
+    database, table1, table2 = get_table_pair(db_name, table1_name, table2_name)
+
+    def render():
+        with database.lock.read():
+            rows = table1.table_difference(table2)
+        return stream_values(rows, database.lock, table1.columns, format)
 
+    try:
+        return cached_response(request, ("compare", db_name, table1_name, table2_name, format),
+                               lambda: (table1.version, table2.version), render)
     except (ValueError, ValidError) as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.get("/{db_name}/{table1_name}/intersect/{table2_name}")
+def intersect_tables(db_name: str, table1_name: str, table2_name: str, request: Request, format: str = "json"):
+    database, table1, table2 = get_table_pair(db_name, table1_name, table2_name)
+
+    def render():
+        with database.lock.read():
+            rows = table1.table_intersection(table2)
+        return stream_values(rows, database.lock, table1.columns, format)
+
+    try:
+        return cached_response(request, ("intersect", db_name, table1_name, table2_name, format),
+                               lambda: (table1.version, table2.version), render)
+    except (ValueError, ValidError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/{db_name}/{table1_name}/union/{table2_name}")
+def union_tables(db_name: str, table1_name: str, table2_name: str, request: Request, format: str = "json"):
+    database, table1, table2 = get_table_pair(db_name, table1_name, table2_name)
+
+    def render():
+        with database.lock.read():
+            rows = table1.table_union(table2)
+        return stream_values(rows, database.lock, table1.columns, format)
+
+    try:
+        return cached_response(request, ("union", db_name, table1_name, table2_name, format),
+                               lambda: (table1.version, table2.version), render)
+    except (ValueError, ValidError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/{db_name}/{table_name}/distinct")
+def distinct_rows(db_name: str, table_name: str, request: Request, format: str = "json"):
+    if db_name not in databases:
+        raise HTTPException(status_code=404, detail="База даних не знайдена.")
+
+    database = databases[db_name]
+    if table_name not in database.tables:
+        raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
+
+    table = database.tables[table_name]
+    try:
+        return cached_response(request, ("distinct", db_name, table_name, format), lambda: (table.version,),
+                               lambda: stream_values(table.distinct_rows(), database.lock, table.columns, format))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.get("/{db_name}/{table_name}/rows")
-def get_all_rows(db_name: str, table_name: str):
+def get_all_rows(db_name: str, table_name: str, request: Request, limit: Optional[int] = None,
+                 after: Optional[str] = None, sort_by: Optional[str] = None, format: str = "json"):
     if db_name not in databases:
         raise HTTPException(status_code=404, detail="База даних не знайдена.")
 
     database = databases[db_name]
     if table_name not in database.tables:
         raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="Параметр limit повинен бути додатним.")
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail=f"Невідомий формат відповіді: '{format}'.")
 
     table = database.tables[table_name]
-    return {"rows": [{"values": row.values,
-                     "id": row.id} for row in table.rows.values()],
-            "columns": list(table.columns.keys())}
+
+    def render():
+        with database.lock.read():
+            # Рядок понад limit лише показує, що наступна сторінка не порожня.
+            rows = table.page_rows(limit + 1 if limit is not None else None,
+                                   uuid.UUID(after) if after else None, sort_by)
+        page = {"next": None}
+
+        def items():
+            last = None
+            for count, row in enumerate(rows, start=1):
+                if limit is not None and count > limit:
+                    page["next"] = last
+                    return
+                last = str(row.id)
+                yield {"values": table.row_values(row), "id": last}
+
+        return stream_rows(items(), database.lock, {"columns": list(table.columns.keys())}, lambda: page,
+                           format == "ndjson")
+
+    try:
+        return cached_response(request, ("rows", db_name, table_name, limit, after, sort_by, format),
+                               lambda: (table.version,), render)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Рядок не знайдений.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/{db_name}/{table_name}/changes")
+def get_changes(db_name: str, table_name: str, since: Optional[str] = None, limit: Optional[int] = None):
+    # Без курсора або з курсором, якого журнал уже не може продовжити, відповідь вимагає повної
+    # синхронізації: клієнт зберігає отриманий курсор, перечитує /rows і далі запитує лише зміни.
+    if db_name not in databases:
+        raise HTTPException(status_code=404, detail="База даних не знайдена.")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="Параметр limit повинен бути додатним.")
+
+    database = databases[db_name]
+    try:
+        with database.lock.read():
+            # Таблиця шукається під блокуванням: перезавантаження бази замінює таблиці разом з їхніми журналами.
+            if table_name not in database.tables:
+                raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
+            table = database.tables[table_name]
+            journal = table.journal
+            changed = journal.since(since) if since is not None else None
+            if changed is None:
+                return {"resync": True, "cursor": journal.cursor(), "columns": list(table.columns.keys()),
+                        "changes": [], "more": False}
+            more = limit is not None and len(changed) > limit
+            if more:
+                changed = changed[:limit]
+            changes = []
+            for row_id, seq in changed:
+                row = table.rows.get(row_id)
+                if row is None:
+                    changes.append({"op": "delete", "id": str(row_id)})
+                else:
+                    changes.append({"op": "upsert", "id": str(row_id), "values": table.row_values(row)})
+            return {"resync": False, "cursor": journal.cursor(changed[-1][1] if more else None),
+                    "columns": list(table.columns.keys()), "changes": changes, "more": more}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/{db_name}/{table_name}/row/{row_id}")
@@ -241,11 +941,10 @@ def get_row(db_name: str, table_name: str, row_id: str):
     table = database.tables[table_name]
     row_uuid = uuid.UUID(row_id)
 
-    if row_uuid not in table.rows:
-        raise HTTPException(status_code=404, detail="Рядок не знайдений.")
-
-    row = table.rows[row_uuid]
-    return row.values
+    with database.lock.read():
+        if row_uuid not in table.rows:
+            raise HTTPException(status_code=404, detail="Рядок не знайдений.")
+        return table.row_values(table.rows[row_uuid])
 
 
 @app.put("/{db_name}/{table_name}/row/{row_id}/edit")
@@ -257,16 +956,13 @@ def edit_row(db_name: str, table_name: str, row_id: str, row_data: RowModel):
     if table_name not in database.tables:
         raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
 
-    table = database.tables[table_name]
     row_uuid = uuid.UUID(row_id)
 
-    if row_uuid not in table.rows:
-        raise HTTPException(status_code=404, detail="Рядок не знайдений.")
-
-    row = table.rows[row_uuid]
     try:
-        row.edit_row(row_data.values)
-        save_database_to_file(db_name)
+        with table_for_write(database, table_name) as table:
+            if row_uuid not in table.rows:
+                raise HTTPException(status_code=404, detail="Рядок не знайдений.")
+            table.edit_row(row_uuid, row_data.values)
         return {"message": "Рядок успішно відредагований."}
 
     except (ValueError, AttributeError, ValidError) as e:
@@ -282,32 +978,41 @@ def delete_row(db_name: str, table_name: str, row_id: str):
     if table_name not in database.tables:
         raise HTTPException(status_code=404, detail="Таблиця не знайдена.")
 
-    table = database.tables[table_name]
     row_uuid = uuid.UUID(row_id)
 
-    if row_uuid not in table.rows:
-        raise HTTPException(status_code=404, detail="Рядок не знайдений.")
-
-    del table.rows[row_uuid]
-    save_database_to_file(db_name)
+    with table_for_write(database, table_name) as table:
+        if row_uuid not in table.rows:
+            raise HTTPException(status_code=404, detail="Рядок не знайдений.")
+        table.delete_row(row_uuid)
     return {"message": "Рядок успішно видалений."}
 
 
+@app.websocket("/{db_name}/{table_name}/live")
+async def live_table(websocket: WebSocket, db_name: str, table_name: str):
+    if not await database_exists(db_name):
+        await websocket.close(code=4404)
+        return
+    database = await in_persistence(databases.__getitem__, db_name)
+    await websocket.accept()
+
+    channel = LiveChannel(asyncio.get_running_loop(), table_name)
+    database.subscribe(table_name, channel.push)
+    sender = asyncio.create_task(send_changes(websocket, channel, database))
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        database.unsubscribe(table_name, channel.push)
+        sender.cancel()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def root():
-    try:
-        with open("static/main_page.html") as f:
-            return f.read()
-    except FileNotFoundError:
-        raise HTTPException(status_code=500, detail="Сторінка не знайдена")
+    return page_response("main_page.html")
 
 
 @app.get("/{db_name}", response_class=HTMLResponse)
 async def get_database_page(db_name: str):
-    if db_name not in databases:
+    if not await database_exists(db_name):
         raise HTTPException(status_code=404, detail="База даних не знайдена")
-    try:
-        with open("static/database_page.html") as f:
-            return f.read()
-    except FileNotFoundError:
-        raise HTTPException(status_code=500, detail="Сторінка не знайдена")
+    return page_response("database_page.html")
@@ -0,0 +1,238 @@
+import bisect
+import collections
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Deque, Iterable, List, Optional
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SOURCE_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def format_labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict[str, Any]) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels: Any) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            values = list(self.values.items())
+        return [f"{self.name}{format_labels(dict(zip(self.label_names, key)))} {format_value(value)}"
+                for key, value in values]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+        self.values: dict[tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                # Лічильники кошиків, сума і загальна кількість спостережень.
+                state = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[position] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            values = [(key, list(state)) for key, state in self.values.items()]
+        lines = []
+        for key, state in values:
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels({**labels, 'le': format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {format_value(state[-2])}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {state[-1]}")
+        return lines
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self.function: Optional[Callable[[], Iterable[tuple[dict[str, Any], float]]]] = None
+
+    def set_function(self, function: Callable[[], Iterable[tuple[dict[str, Any], float]]]) -> None:
+        self.function = function
+
+    def samples(self) -> List[str]:
+        if self.function is None:
+            return []
+        return [f"{self.name}{format_labels(labels)} {format_value(value)}" for labels, value in self.function()]
+
+
+REGISTRY: List[Metric] = []
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            lines.append(f"# Помилка при зборі метрики {metric.name}: {e}")
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_DURATION = Histogram("webdbms_http_request_duration_seconds",
+                             "Час обробки HTTP-запиту до надсилання заголовків відповіді.",
+                             ("method", "route", "status"))
+ROWS_VALIDATED = Counter("webdbms_rows_validated_total", "Кількість рядків, що пройшли перевірку типів.", ("op",))
+SNAPSHOT_BYTES = Counter("webdbms_snapshot_bytes_written_total", "Байти, записані у файли знімків.", ("format",))
+SNAPSHOT_DURATION = Histogram("webdbms_snapshot_duration_seconds",
+                              "Тривалість створення знімка: серіалізація під блокуванням і запис на диск.",
+                              ("phase",))
+LOG_BYTES = Counter("webdbms_wal_bytes_written_total", "Байти, дописані у журнали змін.")
+RESPONSE_CACHE = Counter("webdbms_response_cache_requests_total",
+                         "Звернення до кешу відповідей: hit, miss або not_modified (відповідь 304).", ("result",))
+LOADED_DATABASES = Gauge("webdbms_loaded_databases", "Кількість баз даних, завантажених у пам'ять.")
+TABLE_ROWS = Gauge("webdbms_table_rows", "Кількість рядків у таблиці.", ("database", "table"))
+TABLE_MEMORY = Gauge("webdbms_table_memory_bytes", "Оцінка пам'яті, яку займає таблиця.", ("database", "table"))
+
+
+class SlowRequestProfiler:
+    def __init__(self, threshold: float, interval: float = 0.005, max_reports: int = 50, depth: int = 25):
+        self.threshold = threshold
+        self.interval = interval
+        self.depth = depth
+        self.reports: Deque[dict[str, Any]] = collections.deque(maxlen=max_reports)
+        self.active: dict[int, collections.Counter] = {}
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.tokens = iter(range(1, sys.maxsize))
+
+    def start(self) -> int:
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name="slow-request-profiler", daemon=True)
+                    self.thread.start()
+        with self.lock:
+            token = next(self.tokens)
+            self.active[token] = collections.Counter()
+        return token
+
+    def stop(self, token: int, duration: float, label: str) -> None:
+        with self.lock:
+            samples = self.active.pop(token)
+        if duration < self.threshold:
+            return
+        self.reports.append({
+            "request": label,
+            "duration_ms": round(duration * 1000, 3),
+            "samples": sum(samples.values()),
+            "stacks": [{"count": count, "stack": list(stack)} for stack, count in samples.most_common(10)],
+        })
+
+    def _stack(self, frame: Any) -> tuple:
+        stack = []
+        while frame is not None and len(stack) < self.depth:
+            code = frame.f_code
+            if code.co_filename.startswith(SOURCE_ROOT):
+                stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def run(self) -> None:
+        # Вибірка охоплює всі потоки процесу: за паралельних запитів стеки приписуються кожному з них.
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            if not self.active:
+                continue
+            stacks = [self._stack(frame) for ident, frame in sys._current_frames().items() if ident != me]
+            stacks = [stack for stack in stacks if stack]
+            with self.lock:
+                for samples in self.active.values():
+                    samples.update(stacks)
+
+
+class MetricsMiddleware:
+    def __init__(self, app: Any, timing_header: bool = False, profiler: Optional[SlowRequestProfiler] = None):
+        self.app = app
+        self.timing_header = timing_header
+        self.profiler = profiler
+
+    async def __call__(self, scope: dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        token = self.profiler.start() if self.profiler is not None else None
+        status = [500]
+
+        async def send_with_timing(message: dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                elapsed = time.perf_counter() - start
+                route = scope.get("route")
+                REQUEST_DURATION.observe(elapsed, method=scope["method"],
+                                         route=route.path if route is not None else "<unmatched>",
+                                         status=status[0])
+                if self.timing_header:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"server-timing", f"app;dur={elapsed * 1000:.3f}".encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if token is not None:
+                self.profiler.stop(token, time.perf_counter() - start, f"{scope['method']} {scope['path']}")
@@ -8,6 +8,16 @@ const addColumnBtn = document.getElementById('add-column-btn');
 const addColumnForm = document.getElementById('add-column-form');
 const addRowBtn = document.getElementById('add-row-btn');
 const addRowForm = document.getElementById('add-row-form');
+const PAGE_SIZE = 500;
+const LIVE_RECONNECT_DELAY = 2000;
+
+let liveSocket = null;
+let liveTable = null;
+let currentColumns = [];
+let rowElements = new Map();
+let pendingChanges = null;
+let loadGeneration = 0;
+let activeFilter = null;
 
 
 function addTableToSelector(tableName) {
@@ -20,8 +30,9 @@ function addTableToSelector(tableName) {
 document.addEventListener('DOMContentLoaded', () => {
     confirmCreateTableBtn.addEventListener('click', () => {
         const tableName = document.getElementById('table-name').value;
+        const storage = document.getElementById('table-storage').value;
         if (tableName) {
-            createTable(dbName, tableName);
+            createTable(dbName, tableName, storage);
             createTableContainer.style.display = 'none';
         } else {
             alert('Please enter a table name.');
@@ -41,8 +52,8 @@ document.addEventListener('DOMContentLoaded', () => {
         $('#addColumnModal').modal('hide');
     });
 
-    async function createTable(dbName, tableName) {
-        const response = await fetch(`/${dbName}/${tableName}/create`, {
+    async function createTable(dbName, tableName, storage) {
+        const response = await fetch(`/${dbName}/${tableName}/create?storage=${encodeURIComponent(storage)}`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -57,29 +68,205 @@ document.addEventListener('DOMContentLoaded', () => {
         loadTableData(tableName);
     }
 
-    function loadTableData(tableName) {
+    async function loadTableData(tableName) {
         if (!tableName) {
             clearTableData();
             return;
         }
 
-        fetch(`/${dbName}/${tableName}/rows`)
-            .then(response => {
+        connectLive(tableName);
+        const generation = ++loadGeneration;
+        pendingChanges = [];
+        try {
+            let after = null;
+            let firstPage = true;
+            do {
+                // Відфільтровані рядки приходять однією відповіддю без курсора наступної сторінки.
+                const filter = activeFilter;
+                const params = new URLSearchParams(filter || {limit: PAGE_SIZE});
+                if (after) {
+                    params.append('after', after);
+                }
+                const response = await fetch(`/${dbName}/${tableName}/${filter ? 'filter' : 'rows'}?${params}`);
+                if (filter && response.status === 400) {
+                    const error = await response.json();
+                    if (generation === loadGeneration) {
+                        pendingChanges = null;
+                        activeFilter = null;
+                        alert(error.detail);
+                    }
+                    return;
+                }
                 if (!response.ok) {
                     throw new Error('Network response was not ok');
                 }
-                return response.json();
-            })
-            .then(data => {
-                console.log(data)
-                populateTable(data.rows, data.columns);
-            })
-            .catch(error => {
-                console.error('Error fetching table data:', error);
+                const data = await response.json();
+                if (generation !== loadGeneration) {
+                    return;
+                }
+                if (firstPage) {
+                    populateTable(data.rows, data.columns);
+                    firstPage = false;
+                    applyPendingChanges(tableName);
+                } else {
+                    appendRows(data.rows, currentColumns);
+                }
+                after = data.next;
+            } while (after && tableSelect.value === tableName);
+        } catch (error) {
+            console.error('Error fetching table data:', error);
+            if (generation === loadGeneration) {
+                pendingChanges = null;
                 clearTableData();
-            });
+            }
+        }
+    }
+
+    function connectLive(tableName) {
+        if (liveSocket && liveTable === tableName && liveSocket.readyState <= WebSocket.OPEN) {
+            return;
+        }
+        if (liveSocket) {
+            liveSocket.onclose = null;
+            liveSocket.close();
+        }
+        liveTable = tableName;
+        const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        const socket = new WebSocket(`${protocol}://${window.location.host}/${dbName}/${tableName}/live`);
+        socket.onmessage = (event) => applyChange(tableName, JSON.parse(event.data));
+        socket.onclose = () => {
+            // Поки з'єднання було розірване, зміни могли загубитися, тому таблиця перечитується.
+            setTimeout(() => {
+                if (liveSocket === socket && tableSelect.value === tableName) {
+                    loadTableData(tableName);
+                }
+            }, LIVE_RECONNECT_DELAY);
+        };
+        liveSocket = socket;
+    }
+
+    function refreshUnlessLive(tableName) {
+        if (!liveSocket || liveTable !== tableName || liveSocket.readyState !== WebSocket.OPEN) {
+            loadTableData(tableName);
+        }
+    }
+
+    function applyPendingChanges(tableName) {
+        const changes = pendingChanges || [];
+        pendingChanges = null;
+        changes.forEach(change => applyChange(tableName, change));
+    }
+
+    function applyChange(tableName, change) {
+        if (tableName !== tableSelect.value) {
+            return;
+        }
+        if (pendingChanges !== null) {
+            pendingChanges.push(change);
+            return;
+        }
+        if (activeFilter && (change.op === 'add_row' || change.op === 'edit_row')) {
+            // Чи підпадає змінений рядок під фільтр, вирішує сервер.
+            loadTableData(tableName);
+            return;
+        }
+        switch (change.op) {
+            case 'add_row':
+            case 'edit_row':
+                appendRows([{id: change.row_id, values: change.values}], currentColumns);
+                break;
+            case 'delete_row':
+                removeRow(change.row_id);
+                break;
+            case 'add_column':
+                addColumnCells(change.column);
+                break;
+            case 'delete_column':
+                removeColumnCells(change.column);
+                break;
+            case 'delete_table':
+                removeTableFromSelector(tableName);
+                addDefaultSelectOption();
+                clearTableData();
+                break;
+            case 'create_index':
+            case 'drop_index':
+                break;
+            default:
+                loadTableData(tableName);
+        }
+    }
+
+    function createHeaderCell(col) {
+        const th = document.createElement('th');
+        th.textContent = col;
+        th.style.cursor = 'pointer';
+
+        th.addEventListener('click', () => {
+            const confirmDelete = confirm(`Ви дійсно хочете видалити колонку "${col}"?`);
+            if (confirmDelete) {
+                deleteColumn(col);
+            }
+        });
+        return th;
+    }
+
+    function fillRow(tr, values, columns) {
+        tr.innerHTML = '';
+        columns.forEach(col => {
+            const td = document.createElement('td');
+            td.textContent = values[col] === null || values[col] === undefined ? '' : values[col];
+            tr.appendChild(td);
+        });
+    }
+
+    function removeRow(rowId) {
+        const elements = rowElements.get(rowId);
+        if (elements) {
+            elements.tr.remove();
+            elements.actionDiv.remove();
+            rowElements.delete(rowId);
+        }
+    }
+
+    function addColumnCells(col) {
+        if (currentColumns.includes(col)) {
+            return;
+        }
+        currentColumns.push(col);
+        document.getElementById('table-header').appendChild(createHeaderCell(col));
+        rowElements.forEach(({tr}) => tr.appendChild(document.createElement('td')));
     }
 
+    function removeColumnCells(col) {
+        const index = currentColumns.indexOf(col);
+        if (index === -1) {
+            return;
+        }
+        currentColumns.splice(index, 1);
+        document.getElementById('table-header').children[index].remove();
+        rowElements.forEach(({tr}) => tr.children[index]?.remove());
+    }
+
+    document.getElementById('filter-btn').addEventListener('click', () => {
+        const params = {
+            column_name: document.getElementById('filter-column').value,
+            op: document.getElementById('filter-op').value,
+            value: document.getElementById('filter-value').value,
+        };
+        const value2 = document.getElementById('filter-value2').value;
+        if (value2) {
+            params.value2 = value2;
+        }
+        activeFilter = params;
+        loadTableData(tableSelect.value);
+    });
+
+    document.getElementById('filter-reset-btn').addEventListener('click', () => {
+        activeFilter = null;
+        loadTableData(tableSelect.value);
+    });
+
     function populateTable(data, columns) {
         const tableHeader = document.getElementById('table-header');
         const tableBody = document.getElementById('table-body');
@@ -88,23 +275,19 @@ document.addEventListener('DOMContentLoaded', () => {
         rowActions.innerHTML = '';
         tableHeader.innerHTML = '';
         tableBody.innerHTML = '';
+        rowElements = new Map();
+        currentColumns = columns.slice();
 
-        columns.forEach(col => {
-            const th = document.createElement('th');
-            th.textContent = col;
-            th.style.cursor = 'pointer';
+        currentColumns.forEach(col => tableHeader.appendChild(createHeaderCell(col)));
 
-            th.addEventListener('click', () => {
-                const confirmDelete = confirm(`Ви дійсно хочете видалити колонку "${col}"?`);
-                if (confirmDelete) {
-                    deleteColumn(col);
-                }
-            });
-            tableHeader.appendChild(th);
-        });
+        appendRows(data, currentColumns);
+    }
 
-        if (data.length > 0) {
+    function appendRows(data, columns) {
+        const tableBody = document.getElementById('table-body');
+        const rowActions = document.getElementById('row-actions');
 
+        if (data.length > 0 && rowActions.childElementCount === 0) {
             const actionDiv = document.createElement('div');
             actionDiv.setAttribute('data-row-id', "");
             actionDiv.style.display = 'flex';
@@ -113,47 +296,49 @@ document.addEventListener('DOMContentLoaded', () => {
             actionDiv.style.marginBottom = '2px';
 
             rowActions.appendChild(actionDiv);
+        }
 
-            data.forEach(row => {
-                const tr = document.createElement('tr');
-                tr.setAttribute('data-row-id', row.id);
+        data.forEach(row => {
+            const existing = rowElements.get(row.id);
+            if (existing) {
+                fillRow(existing.tr, row.values, columns);
+                return;
+            }
 
-                columns.forEach(col => {
-                    const td = document.createElement('td');
-                    td.textContent = row.values[col] === null ? '' : row.values[col];
-                    tr.appendChild(td);
-                });
+            const tr = document.createElement('tr');
+            tr.setAttribute('data-row-id', row.id);
+            fillRow(tr, row.values, columns);
 
-                tableBody.appendChild(tr);
-
-                const actionDiv = document.createElement('div');
-                actionDiv.setAttribute('data-row-id', row.id);
-                actionDiv.style.display = 'flex';
-                actionDiv.style.alignItems = 'center';
-                actionDiv.style.height = `${tr.offsetHeight}px`;
-                actionDiv.style.marginBottom = '2px';
-
-                const deleteBtn = document.createElement('button');
-                deleteBtn.textContent = 'D';
-                deleteBtn.className = 'action-btn';
-                deleteBtn.addEventListener('click', () => {
-                    const confirmDelete = confirm(`Ви дійсно хочете видалити цей рядок?`);
-                    if (confirmDelete) {
-                        deleteRow(row.id);
-                    }
-                });
+            tableBody.appendChild(tr);
 
-                const editBtn = document.createElement('button');
-                editBtn.textContent = 'E';
-                editBtn.className = 'action-btn';
-                editBtn.addEventListener('click', () => {
-                    editRow(row.id);
-                });
-                actionDiv.appendChild(deleteBtn);
-                actionDiv.appendChild(editBtn);
-                rowActions.appendChild(actionDiv);
+            const actionDiv = document.createElement('div');
+            actionDiv.setAttribute('data-row-id', row.id);
+            actionDiv.style.display = 'flex';
+            actionDiv.style.alignItems = 'center';
+            actionDiv.style.height = `${tr.offsetHeight}px`;
+            actionDiv.style.marginBottom = '2px';
+
+            const deleteBtn = document.createElement('button');
+            deleteBtn.textContent = 'D';
+            deleteBtn.className = 'action-btn';
+            deleteBtn.addEventListener('click', () => {
+                const confirmDelete = confirm(`Ви дійсно хочете видалити цей рядок?`);
+                if (confirmDelete) {
+                    deleteRow(row.id);
+                }
             });
-        }
+
+            const editBtn = document.createElement('button');
+            editBtn.textContent = 'E';
+            editBtn.className = 'action-btn';
+            editBtn.addEventListener('click', () => {
+                editRow(row.id);
+            });
+            actionDiv.appendChild(deleteBtn);
+            actionDiv.appendChild(editBtn);
+            rowActions.appendChild(actionDiv);
+            rowElements.set(row.id, {tr, actionDiv});
+        });
     }
 
 
@@ -185,6 +370,7 @@ document.addEventListener('DOMContentLoaded', () => {
             createTableContainer.style.display = 'block';
         } else if (selectedTable) {
             createTableContainer.style.display = 'none';
+            activeFilter = null;
             loadTableData(selectedTable);
         }
         removeDefaultOption();
@@ -203,16 +389,7 @@ document.addEventListener('DOMContentLoaded', () => {
             });
 
             if (response.ok) {
-                const th = document.createElement('th');
-                th.textContent = columnName;
-                document.getElementById('table-header').appendChild(th);
-
-                const tableRows = document.querySelectorAll('#table-body tr');
-                tableRows.forEach(row => {
-                    const td = document.createElement('td');
-                    td.textContent = '';
-                    row.appendChild(td);
-                });
+                addColumnCells(columnName);
             } else {
                 const errorData = await response.json();
                 alert(`Не вдалося додати колонку: ${errorData.detail}`);
@@ -303,7 +480,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
                 if (response.ok) {
                     $('#addRowModal').modal('hide');
-                    loadTableData(tableSelect.value);
+                    refreshUnlessLive(tableSelect.value);
                 } else {
                     const error = await response.json();
                     alert(error.detail)
@@ -316,12 +493,54 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    const importRowsFile = document.getElementById('import-rows-file');
+
+    document.getElementById('import-rows-btn').addEventListener('click', () => {
+        importRowsFile.value = '';
+        importRowsFile.click();
+    });
+
+    importRowsFile.addEventListener('change', async () => {
+        const file = importRowsFile.files[0];
+        if (!file) {
+            return;
+        }
+        const format = file.name.toLowerCase().endsWith('.csv') ? 'csv' : 'ndjson';
+        const formData = new FormData();
+        formData.append('file', file);
+
+        try {
+            const response = await fetch(`/${dbName}/${tableSelect.value}/import?format=${format}`, {
+                method: 'POST',
+                body: formData,
+            });
+            const result = await response.json();
+            if (!response.ok) {
+                alert(result.detail);
+                return;
+            }
+            let message = `Імпортовано рядків: ${result.imported}, з помилками: ${result.failed}.`;
+            if (result.errors.length) {
+                message += '\n' + result.errors.map(error => `Рядок ${error.line}: ${error.detail}`).join('\n');
+            }
+            if (result.failed > result.errors.length) {
+                message += `\n…та ще ${result.failed - result.errors.length}.`;
+            }
+            alert(message);
+            if (result.imported) {
+                refreshUnlessLive(tableSelect.value);
+            }
+        } catch (error) {
+            console.error('Error importing rows:', error);
+        }
+    });
+
     async function deleteColumn(columnName) {
         const response = await fetch(`/${dbName}/${tableSelect.value}/delete_column?column_name=${columnName}`, {
             method: 'DELETE'
         });
         if (response.ok) {
-            loadTableData(tableSelect.value);
+            refreshUnlessLive(tableSelect.value);
         }
     }
 
@@ -330,7 +549,7 @@ document.addEventListener('DOMContentLoaded', () => {
             method: 'DELETE'
         });
         if (response.ok) {
-            loadTableData(tableSelect.value);
+            refreshUnlessLive(tableSelect.value);
         }
     }
 
@@ -419,7 +638,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
             if (response.ok) {
                 $('#addRowModal').modal('hide');
-                loadTableData(tableSelect.value);
+                refreshUnlessLive(tableSelect.value);
             } else {
                 const error = await response.json();
                 alert(error.detail);
@@ -474,6 +693,9 @@ function clearTableData() {
     const tableBody = document.getElementById('table-body');
     tableHeader.innerHTML = '';
     tableBody.innerHTML = '';
+    document.getElementById('row-actions').innerHTML = '';
+    rowElements = new Map();
+    currentColumns = [];
 }
 
 function removeTableFromSelector(tableName) {
@@ -0,0 +1,38 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbclasses import BatchError, Database, Storage, Type
+
+import pytest
+
+
+@pytest.mark.parametrize("storage", list(Storage))
+def test_failed_undo_does_not_stop_rollback(storage, monkeypatch):
+    database = Database("test")
+    database.create_table("t", storage)
+    table = database.tables["t"]
+    table.add_column("a", Type.string)
+    published = []
+    database.subscribe("t", published.append)
+
+    delete_row = table.delete_row
+    failure = RuntimeError("undo failed")
+
+    def failing_delete_row(row_id):
+        if table.rows[row_id].value("a") == "first":
+            raise failure
+        return delete_row(row_id)
+
+    monkeypatch.setattr(table, "delete_row", failing_delete_row)
+    with pytest.raises(BatchError) as caught:
+        database.apply_batch([{"op": "add_row", "table": "t", "values": {"a": "first"}},
+                              {"op": "add_row", "table": "t", "values": {"a": "second"}},
+                              {"op": "bogus", "table": "t"}])
+    assert caught.value.__cause__ is failure
+    assert database.pending is None
+    assert [table.row_values(row) for row in table.rows.values()] == [{"a": "first"}]
+
+    table.add_row({"a": "after"})
+    assert len(published) == 1
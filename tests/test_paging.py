@@ -0,0 +1,70 @@
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dbclasses import DatabaseRegistry, Storage, Table, Type
+
+import pytest
+
+
+def walk(table, limit):
+    row_ids = []
+    after = None
+    while True:
+        page = [row.id for row in table.page_rows(limit, after)]
+        row_ids += page
+        if len(page) < limit:
+            return row_ids
+        after = page[-1]
+
+
+@pytest.mark.parametrize("storage", list(Storage))
+def test_unsorted_pages_follow_table_order_after_changes(storage):
+    rng = random.Random(0)
+    table = Table("t", storage)
+    table.add_column("n", Type.integer)
+    for i in range(200):
+        table.add_row({"n": str(i)})
+    assert walk(table, 7) == list(table.rows)
+
+    deleted = []
+    for row_id in rng.sample(list(table.rows), 150):
+        table.delete_row(row_id)
+        deleted.append(row_id)
+    for i in range(30):
+        table.add_row({"n": str(1000 + i)})
+    table.add_row({"n": "-1"}, deleted[0])
+    assert walk(table, 7) == list(table.rows)
+    assert walk(table, 1000) == list(table.rows)
+
+
+@pytest.mark.parametrize("sort_by", [None, "n"])
+def test_rows_endpoint_has_no_cursor_after_the_last_full_page(tmp_path, monkeypatch, sort_by):
+    monkeypatch.chdir(ROOT)
+    import main
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "databases", DatabaseRegistry(str(tmp_path)))
+    client = TestClient(main.app)
+    assert client.post("/db/create").status_code == 200
+    assert client.post("/db/t/create").status_code == 200
+    client.post("/db/t/add_column", params={"column_name": "n", "column_type": "integer"})
+    for i in range(6):
+        client.post("/db/t/add_row", json={"values": {"n": str(i)}})
+
+    row_ids = []
+    params = {"limit": 3} if sort_by is None else {"limit": 3, "sort_by": sort_by}
+    pages = 0
+    while True:
+        page = client.get("/db/t/rows", params=params).json()
+        pages += 1
+        row_ids += [row["id"] for row in page["rows"]]
+        assert page["rows"]
+        if page["next"] is None:
+            break
+        params["after"] = page["next"]
+    assert pages == 2
+    assert len(set(row_ids)) == 6
@@ -0,0 +1,60 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbclasses import Database, DatabaseRegistry
+
+import pytest
+
+
+def make_registry(folder, names):
+    registry = DatabaseRegistry(str(folder))
+    for name in names:
+        Database(name).checkpoint(registry.snapshot_path(name))
+    registry.scan()
+    return registry
+
+
+def test_loading_one_database_does_not_block_others(tmp_path, monkeypatch):
+    registry = make_registry(tmp_path, ["fast", "slow"])
+    fast = registry["fast"]
+
+    started = threading.Event()
+    release = threading.Event()
+    load = registry._load
+
+    def slow_load(name, prepared=None):
+        if name == "slow":
+            started.set()
+            assert release.wait(5)
+        return load(name, prepared)
+
+    monkeypatch.setattr(registry, "_load", slow_load)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry["slow"])) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(5)
+
+    assert registry["fast"] is fast
+    assert "slow" in registry.loading
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(results) == 2 and results[0] is results[1]
+    assert registry.loaded["slow"] is results[0]
+    assert not registry.loading
+
+
+def test_failed_load_is_reported_to_every_caller(tmp_path, monkeypatch):
+    registry = make_registry(tmp_path, ["broken"])
+
+    def failing_load(name, prepared=None):
+        raise OSError("disk")
+
+    monkeypatch.setattr(registry, "_load", failing_load)
+    with pytest.raises(OSError):
+        registry["broken"]
+    assert not registry.loading and "broken" not in registry.loaded
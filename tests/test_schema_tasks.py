@@ -0,0 +1,88 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dbclasses
+from dbclasses import BatchError, CleanupTask, Database, Storage, Type, TypeChangeTask
+
+import pytest
+
+
+def make_table(storage):
+    database = Database("test")
+    database.create_table("t", storage)
+    table = database.tables["t"]
+    table.add_column("a", Type.string)
+    table.add_column("b", Type.string)
+    for i in range(3):
+        table.add_row({"a": str(i), "b": f"row-{i}"})
+    return database, table
+
+
+def run(task):
+    while not task.step():
+        pass
+    return task
+
+
+@pytest.mark.parametrize("storage", list(Storage))
+def test_import_during_type_change_keeps_imported_rows(storage):
+    database, table = make_table(storage)
+    task = TypeChangeTask(database, table, "a", Type.integer)
+    imported, failed, errors = table.import_rows(enumerate([{"a": "10", "b": "new"}], start=1))
+    assert (imported, failed, errors) == (1, 0, [])
+
+    assert run(task).status == "done"
+    assert table.columns["a"] == Type.integer
+    values = sorted((table.row_values(row) for row in table.rows.values()), key=lambda values: values["a"])
+    assert values[-1] == {"a": 10, "b": "new"}
+    assert [values["a"] for values in values] == [0, 1, 2, 10]
+
+
+@pytest.mark.parametrize("storage", list(Storage))
+def test_batch_rollback_restores_column_replaced_in_same_batch(storage):
+    database, table = make_table(storage)
+    with pytest.raises(BatchError):
+        database.apply_batch([{"op": "delete_column", "table": "t", "column": "a"},
+                              {"op": "add_column", "table": "t", "column": "a", "type": "integer"},
+                              {"op": "add_row", "table": "t", "values": {"missing": "1"}}])
+
+    assert table.columns == {"a": Type.string, "b": Type.string}
+    expected = [{"a": str(i), "b": f"row-{i}"} for i in range(3)]
+    assert sorted((table.row_values(row) for row in table.rows.values()), key=lambda values: values["a"]) == expected
+
+    assert run(CleanupTask(database, table)).status == "done"
+    assert not table.dropped and not table.schema.dropped
+    assert sorted((table.row_values(row) for row in table.rows.values()), key=lambda values: values["a"]) == expected
+
+
+@pytest.mark.parametrize("storage", list(Storage))
+@pytest.mark.parametrize("row_op", [{"op": "delete_row"}, {"op": "edit_row", "values": {"b": "changed"}}])
+def test_batch_rollback_restores_row_changed_after_column_drop(storage, row_op):
+    database, table = make_table(storage)
+    table.add_row({"a": "only-a"})
+    row_id = next(row.id for row in table.rows.values() if row.value("b") is None)
+    with pytest.raises(BatchError):
+        database.apply_batch([{"op": "delete_column", "table": "t", "column": "a"},
+                              dict(row_op, table="t", row_id=str(row_id)),
+                              {"op": "bogus", "table": "t"}])
+
+    assert database.pending is None
+    assert table.columns == {"a": Type.string, "b": Type.string}
+    assert table.row_values(table.rows[row_id]) == {"a": "only-a", "b": None}
+    assert len(table.rows) == 4
+
+
+@pytest.mark.parametrize("storage", list(Storage))
+def test_type_change_cancelled_when_column_is_recreated(storage, monkeypatch):
+    monkeypatch.setattr(dbclasses, "SCHEMA_TASK_CHUNK", 1)
+    database, table = make_table(storage)
+    task = TypeChangeTask(database, table, "a", Type.integer)
+    assert not task.step()
+    table.delete_column("a")
+    table.add_column("a", Type.string)
+
+    assert run(task).status == "cancelled"
+    assert table.columns["a"] == Type.string
+    assert all(table.row_values(row)["a"] is None for row in table.rows.values())
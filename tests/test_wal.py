@@ -0,0 +1,44 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbclasses import Database, LogWriteError, Storage, Type
+
+import pytest
+
+
+class FullDisk:
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, data):
+        raise OSError(28, "No space left on device")
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+def test_failed_log_write_makes_database_read_only(tmp_path):
+    database = Database("test")
+    database.create_table("t", Storage.row)
+    database.tables["t"].add_column("a", Type.string)
+    database.attach_log(str(tmp_path / "test.wal"))
+    log = database.log
+
+    database.tables["t"].add_row({"a": "1"})
+    log.flush()
+    database.check_writable()
+
+    log.file = FullDisk(log.file)
+    database.tables["t"].add_row({"a": "2"})
+    with pytest.raises(LogWriteError):
+        log.flush()
+    with pytest.raises(LogWriteError):
+        database.check_writable()
+    with pytest.raises(LogWriteError):
+        database.tables["t"].add_row({"a": "3"})
+
+    log.file = log.file.file
+    database.detach_log()
+    assert [entry["values"] for entry in log.read(log.file_path)] == [{"a": "1"}]